@@ -0,0 +1,79 @@
+"""HTMLの解析エンジンのベンチマーク
+
+data/input の問題を繰り返して大きな問題集（既定で2000問）のHTMLを作り、
+エンジンごとの解析速度（MB/秒、問/秒）を測る。
+
+使用方法:
+    python bench_html_parser.py [問題数]
+"""
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core.html_parser import PARSER_ENGINES, HTMLParser
+
+INPUT_FOLDER = Path(__file__).parent / 'data' / 'input'
+PROBLEMS = 2000
+REPEAT = 3
+
+_BODY = re.compile(r'<body[^>]*>(.*)</body>', re.DOTALL)
+
+def build_problem_bank(count: int) -> str:
+    """入力フォルダの問題を繰り返してcount問のHTMLを作る"""
+    parser = HTMLParser('html.parser')
+    bodies = []
+    for html_file in sorted(INPUT_FOLDER.glob('*.html')):
+        with open(html_file, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        match = _BODY.search(html_content)
+        bodies.append((match.group(1) if match else html_content,
+                       len(parser.parse(html_content))))
+
+    pieces = []
+    total = 0
+    while total < count:
+        for body, problems in bodies:
+            pieces.append(body)
+            total += problems
+            if total >= count:
+                break
+    return ('<!DOCTYPE html>\n<html lang="ja">\n<head><meta charset="UTF-8"></head>\n'
+            f'<body>{"".join(pieces)}</body>\n</html>')
+
+def bench_engine(html_content: str, engine: str) -> tuple:
+    """解析時間（秒、繰り返しのうち最短）と問題数"""
+    parser = HTMLParser(engine)
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        problems = parser.parse(html_content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(problems)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else PROBLEMS
+
+    print("="*60)
+    print("HTML解析エンジンのベンチマーク")
+    print("="*60)
+
+    html_content = build_problem_bank(count)
+    size = len(html_content.encode('utf-8'))
+    print(f"\n問題集: {count}問 / {size / 1024 / 1024:.2f} MB（{REPEAT}回のうち最短）")
+
+    baseline = None
+    for engine in PARSER_ENGINES:
+        elapsed, problems = bench_engine(html_content, engine)
+        baseline = baseline or elapsed
+        print(f"  {engine:12s} {elapsed:7.3f} 秒  {size / elapsed / 1024 / 1024:6.2f} MB/秒"
+              f"  {problems / elapsed:8.0f} 問/秒  (x{baseline / elapsed:.1f})")
+
+    print("="*60)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
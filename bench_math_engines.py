@@ -0,0 +1,70 @@
+"""数式描画エンジンのベンチマーク"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from matplotlib.mathtext import MathTextParser
+
+from core import STYLE_CONFIG, MathConverter
+from test_math_final import TEST_CASES
+
+ENGINES = ['figure', 'trim', 'mathtext']
+# まとめて描画（render_many）も測るエンジン
+BATCH_ENGINES = ['trim']
+REPEAT = 5
+
+# (dpi, フォントサイズ): 現在の設定と、表示サイズ相当の小さな設定
+SETTINGS = [
+    (STYLE_CONFIG['math_dpi'], STYLE_CONFIG['math_font_size']),
+    (300, 12),
+]
+
+def bench_engine(engine: str, dpi: int, font_size: int, batch: bool = False) -> float:
+    """1数式あたりの平均描画時間（ミリ秒）"""
+    config = dict(STYLE_CONFIG, math_engine=engine, math_dpi=dpi,
+                  math_font_size=font_size, math_cache_max_bytes=0,
+                  math_store_path=None, math_bundle_path=None)
+    converter = MathConverter(config)
+
+    # フォント読み込みなどの初回コストを除く
+    converter._render_png('x')
+
+    elapsed = 0.0
+    for _ in range(REPEAT):
+        # matplotlib内部の解析結果キャッシュを毎回捨てる
+        MathTextParser._parse_cached.cache_clear()
+        formulas = [converter._preprocess_latex(latex) for latex, _ in TEST_CASES]
+        start = time.perf_counter()
+        if batch:
+            converter._render_many_png(formulas)
+        else:
+            for latex_str in formulas:
+                converter._render_png(latex_str)
+        elapsed += time.perf_counter() - start
+
+    return elapsed / (REPEAT * len(TEST_CASES)) * 1000
+
+def main():
+    print("="*60)
+    print("数式描画エンジンのベンチマーク")
+    print("="*60)
+    print(f"\n数式: {len(TEST_CASES)}個 × {REPEAT}回")
+
+    for dpi, font_size in SETTINGS:
+        print(f"\n設定: dpi={dpi}, フォント={font_size}pt")
+
+        results = {engine: bench_engine(engine, dpi, font_size) for engine in ENGINES}
+        for engine in BATCH_ENGINES:
+            results[f'{engine}(一括)'] = bench_engine(engine, dpi, font_size, batch=True)
+        baseline = results[ENGINES[0]]
+
+        for engine, ms in results.items():
+            print(f"  {engine:12s} {ms:8.1f} ms/数式  (×{baseline / ms:.2f})")
+
+    print("="*60)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
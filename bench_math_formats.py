@@ -0,0 +1,71 @@
+"""数式の埋め込み形式（PNG / SVG / Wordの数式）のベンチマーク
+
+data/input の問題からWord文書を作り、生成時間と文書サイズを比べる。
+"""
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core import STYLE_CONFIG, HTMLParser, MathConverter, WordGenerator
+from core.math_cache import MathImageCache
+
+INPUT_FOLDER = Path(__file__).parent / 'data' / 'input'
+
+# (名前, 設定の上書き)
+VARIANTS = [
+    ('png', {'math_format': 'png'}),
+    ('png(images)', {'math_format': 'png', 'math_plain_text': False}),
+    ('png(rgba)', {'math_format': 'png', 'math_png_encoding': 'rgba', 'math_plain_text': False}),
+    ('svg', {'math_format': 'svg'}),
+    ('omml', {'math_mode': 'omml'}),
+]
+
+def load_problems() -> list:
+    """入力フォルダのすべての問題"""
+    parser = HTMLParser()
+    problems = []
+    for html_file in sorted(INPUT_FOLDER.glob('*.html')):
+        with open(html_file, 'r', encoding='utf-8') as f:
+            problems.extend(parser.parse(f.read()))
+    return problems
+
+def bench_variant(problems: list, overrides: dict):
+    """文書の生成時間（秒）と保存後のサイズ（バイト）"""
+    config = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None,
+                  math_prefetch=False, **overrides)
+    # 描画から測るため、キャッシュは毎回新しくする
+    generator = WordGenerator(config, MathConverter(config, cache=MathImageCache()))
+
+    start = time.perf_counter()
+    doc = generator.create_document(problems)
+    buf = io.BytesIO()
+    doc.save(buf)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, len(buf.getvalue())
+
+def main():
+    print("="*60)
+    print("数式埋め込み形式のベンチマーク")
+    print("="*60)
+
+    problems = load_problems()
+    print(f"\n問題: {len(problems)}問")
+
+    # フォント読み込みなどの初回コストを除く
+    bench_variant(problems[:1], {})
+
+    for target_ppi in [STYLE_CONFIG['math_target_ppi'], None]:
+        print(f"\n設定: math_target_ppi={target_ppi}")
+        for name, overrides in VARIANTS:
+            elapsed, size = bench_variant(problems, dict(overrides, math_target_ppi=target_ppi))
+            print(f"  {name:12s} {elapsed:6.2f} 秒  {size / 1024:8.0f} KB")
+
+    print("="*60)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""デスクトップアプリの起動時間のベンチマーク
+
+アプリを計測用の環境変数 MATHCONVERTER_STARTUP_PROBE 付きで起動し
+（ウィンドウを作り、数式を1つ描画して終了）、
+初回起動（cold）と2回目以降の起動（warm）の時間を測る。
+初回起動は毎回新しいホームディレクトリで起動し、matplotlibの設定ディレクトリや
+フォント一覧がない状態にする。OSのファイルキャッシュは消さない。
+
+使用方法:
+    python bench_startup.py                      # dist/MathConverter（なければソースから起動）
+    python bench_startup.py dist/MathConverter
+    python bench_startup.py dist/MathConverter.app/Contents/MacOS/MathConverter
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+DEFAULT_EXECUTABLE = ROOT / 'dist' / ('MathConverter.exe' if os.name == 'nt' else 'MathConverter')
+SOURCE_COMMAND = [sys.executable, str(ROOT / 'src' / 'unified_gui.py')]
+REPEAT = 5
+TIMEOUT = 300
+
+def probe_env(home: str) -> dict:
+    """ホームディレクトリを差し替えた起動用の環境変数"""
+    env = dict(os.environ, HOME=home, USERPROFILE=home, QT_QPA_PLATFORM='offscreen',
+               MATHCONVERTER_STARTUP_PROBE='1')
+    for name in ('MPLCONFIGDIR', 'XDG_CONFIG_HOME', 'XDG_CACHE_HOME'):
+        env.pop(name, None)
+    return env
+
+def run_probe(command: list, home: str) -> float:
+    """1回起動して終了までの時間（秒）"""
+    start = time.perf_counter()
+    result = subprocess.run(command, env=probe_env(home),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=TIMEOUT)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf-8', 'replace')[-2000:])
+    return elapsed
+
+def bench_startup(command: list, repeat: int = REPEAT) -> dict:
+    """
+    初回起動と2回目以降の起動の時間を測る
+
+    Returns:
+        dict: 'cold', 'warm' -> 起動時間（秒）のリスト
+    """
+    cold = []
+    for _ in range(repeat):
+        home = tempfile.mkdtemp(prefix='mathconverter_cold_')
+        try:
+            cold.append(run_probe(command, home))
+        finally:
+            shutil.rmtree(home, ignore_errors=True)
+
+    home = tempfile.mkdtemp(prefix='mathconverter_warm_')
+    try:
+        # 1回目で設定ディレクトリとフォント一覧を作る
+        run_probe(command, home)
+        warm = [run_probe(command, home) for _ in range(repeat)]
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    return {'cold': cold, 'warm': warm}
+
+def main():
+    if len(sys.argv) > 1:
+        command = sys.argv[1:]
+    elif DEFAULT_EXECUTABLE.exists():
+        command = [str(DEFAULT_EXECUTABLE)]
+    else:
+        command = SOURCE_COMMAND
+
+    print("="*60)
+    print("起動時間のベンチマーク")
+    print("="*60)
+    print(f"\nコマンド: {' '.join(command)}")
+
+    try:
+        results = bench_startup(command)
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        print(f"エラー: 起動に失敗しました\n{e}")
+        return 1
+
+    for name, label in [('cold', '初回起動'), ('warm', '2回目以降')]:
+        times = results[name]
+        print(f"  {label:8s} 中央値 {statistics.median(times):6.2f} 秒"
+              f"  最短 {min(times):6.2f} 秒  ({len(times)}回)")
+
+    print("="*60)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
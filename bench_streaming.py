@@ -0,0 +1,85 @@
+"""問題集を少しずつ解析したときのメモリ使用量のベンチマーク
+
+大きさの異なる問題集のHTMLを作り、parse（全体を読み込む）と
+iter_problems（少しずつ読む）で解析したときの最大メモリ使用量（RSS）と時間を、
+解析エンジンごとに別のプロセスで測る。
+lxmlのメモリはtracemallocでは測れないため、プロセスのRSSを使う（Linux, macOS）。
+
+使用方法:
+    python bench_streaming.py [問題数 ...]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from bench_html_parser import build_problem_bank
+from core.html_parser import PARSER_ENGINES
+
+SIZES = (2000, 8000)
+MODES = ('parse', 'iter_problems')
+
+def run_child(engine: str, mode: str, path: str):
+    """子プロセス: 解析して問題数・時間・最大RSS（MB）を出力する"""
+    import resource
+    from core.html_parser import HTMLParser
+
+    parser = HTMLParser(engine)
+    start = time.perf_counter()
+    if mode == 'parse':
+        with open(path, 'r', encoding='utf-8') as f:
+            count = len(parser.parse(f.read()))
+    else:
+        count = sum(1 for _ in parser.iter_problems(path))
+    elapsed = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # LinuxはKB、macOSはバイト
+    peak_mb = peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    print(count, elapsed, peak_mb)
+
+def measure(engine: str, mode: str, path: str) -> tuple:
+    result = subprocess.run([sys.executable, __file__, '--child', engine, mode, path],
+                            capture_output=True, text=True, check=True)
+    count, elapsed, peak_mb = result.stdout.split()[-3:]
+    return int(count), float(elapsed), float(peak_mb)
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3], sys.argv[4])
+        return 0
+    if os.name == 'nt':
+        print("エラー: Windowsでは最大メモリ使用量を測れません")
+        return 1
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+
+    print("="*60)
+    print("少しずつ解析したときのメモリ使用量")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f'bank_{size}.html')
+            html_content = build_problem_bank(size)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(html_content)
+            megabytes = len(html_content.encode('utf-8')) / 1024 / 1024
+            del html_content
+
+            print(f"\n問題集: {size}問 / {megabytes:.2f} MB")
+            for engine in PARSER_ENGINES:
+                for mode in MODES:
+                    count, elapsed, peak_mb = measure(engine, mode, path)
+                    print(f"  {engine:12s} {mode:14s} {count:6d}問  {elapsed:7.3f} 秒"
+                          f"  最大 {peak_mb:7.1f} MB")
+
+    print("="*60)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,56 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+import os
+
 block_cipher = None
 
+# 事前レンダリング済みの数式バンドル（build_local.shで生成）
+bundle_datas = []
+if os.path.exists('build/formula_bundle.zip'):
+    bundle_datas.append(('build/formula_bundle.zip', '.'))
+
+# matplotlibのフォントキャッシュ（build_local.shで生成、frozen_env.pyが初回起動時に複製）
+if os.path.exists('build/mpl_cache'):
+    bundle_datas.append(('build/mpl_cache', 'mpl_cache'))
+
+# 使わないモジュール（matplotlibはAgg/SVG以外の描画バックエンドを除く）
+excludes = [
+    'tkinter',
+    'IPython',
+    'matplotlib.backends.backend_tkagg',
+    'matplotlib.backends.backend_tkcairo',
+    'matplotlib.backends.backend_qtagg',
+    'matplotlib.backends.backend_qtcairo',
+    'matplotlib.backends.backend_qt',
+    'matplotlib.backends.backend_qt5agg',
+    'matplotlib.backends.backend_qt5cairo',
+    'matplotlib.backends.backend_qt5',
+    'matplotlib.backends.backend_gtk3agg',
+    'matplotlib.backends.backend_gtk3cairo',
+    'matplotlib.backends.backend_gtk4agg',
+    'matplotlib.backends.backend_gtk4cairo',
+    'matplotlib.backends.backend_wxagg',
+    'matplotlib.backends.backend_wxcairo',
+    'matplotlib.backends.backend_wx',
+    'matplotlib.backends.backend_webagg',
+    'matplotlib.backends.backend_webagg_core',
+    'matplotlib.backends.backend_nbagg',
+    'matplotlib.backends.backend_macosx',
+    'matplotlib.backends.backend_cairo',
+    'matplotlib.backends.backend_pdf',
+    'matplotlib.backends.backend_pgf',
+    'matplotlib.backends.backend_ps',
+    'matplotlib.sphinxext',
+]
+
+# 使わないmatplotlibのデータ（サンプル、ツールバー画像、PDF/PS用フォント）
+MPL_DATA_EXCLUDES = (
+    'mpl-data/sample_data',
+    'mpl-data/images',
+    'mpl-data/fonts/afm',
+    'mpl-data/fonts/pdfcorefonts',
+)
+
 a = Analysis(
     ['src/unified_gui.py'],
     pathex=[],
@@ -11,7 +60,7 @@ a = Analysis(
         ('src/batch/*.py', 'src/batch'),
         ('src/validators/*.py', 'src/validators'),
         ('src/prompts/*.py', 'src/prompts'),
-    ],
+    ] + bundle_datas,
     hiddenimports=[
         'PySide6',
         'pyperclip',
@@ -24,13 +73,16 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=excludes,
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
     noarchive=False,
 )
 
+a.datas = [entry for entry in a.datas
+           if not any(part in entry[0].replace(os.sep, '/') for part in MPL_DATA_EXCLUDES)]
+
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
 exe = EXE(
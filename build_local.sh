@@ -17,6 +17,16 @@ pip install --upgrade pip
 pip install -r requirements.txt
 pip install pyinstaller
 
+# 数式バンドルを事前生成（初回変換の高速化）
+echo ""
+echo "数式バンドルを生成中..."
+python src/batch/warm_cache.py data/input --bundle build/formula_bundle.zip
+
+# matplotlibのフォントキャッシュを事前生成（初回起動の高速化）
+echo ""
+echo "フォントキャッシュを生成中..."
+python src/batch/build_font_cache.py build/mpl_cache
+
 # ビルド実行
 echo ""
 echo "PyInstallerでビルド中..."
@@ -35,12 +45,18 @@ if [ $? -eq 0 ]; then
         echo ""
         echo "起動:"
         echo "  open dist/MathConverter.app"
+        echo ""
+        echo "起動時間の計測:"
+        echo "  python bench_startup.py dist/MathConverter.app/Contents/MacOS/MathConverter"
     else
         echo "実行ファイル:"
         echo "  dist/MathConverter"
         echo ""
         echo "起動:"
         echo "  ./dist/MathConverter"
+        echo ""
+        echo "起動時間の計測:"
+        echo "  python bench_startup.py dist/MathConverter"
     fi
 else
     echo ""
@@ -0,0 +1,26 @@
+"""pytestの共通設定
+
+テストではホームディレクトリの数式ストア（~/.mathconverter）と既定の場所の
+バンドルを使わない。以前の実行や別の版のコードが保存した画像が返されたり、
+テストがユーザーのストアに書き込んだりしないようにする。
+STYLE_CONFIGをそのまま使うテストやモジュールの読み込み時に変換するテストもあるため、
+テストを集める前にSTYLE_CONFIG自体を書き換える。
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core.style_config import STYLE_CONFIG
+
+# テスト中に無効にする設定
+_TEST_OVERRIDES = {'math_store_path': None, 'math_bundle_path': None}
+
+_saved_config = {}
+
+def pytest_configure(config):
+    _saved_config.update({key: STYLE_CONFIG[key] for key in _TEST_OVERRIDES})
+    STYLE_CONFIG.update(_TEST_OVERRIDES)
+
+def pytest_unconfigure(config):
+    STYLE_CONFIG.update(_saved_config)
@@ -1,4 +1,5 @@
 """バッチ変換モジュール"""
+import itertools
 import os
 from pathlib import Path
 from typing import List, Optional
@@ -9,7 +10,8 @@ from datetime import datetime
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
-from core import STYLE_CONFIG, HTMLParser, MathConverter, WordGenerator
+# 重い依存（matplotlib, python-docx など）は使うときに読み込む
+from core import STYLE_CONFIG
 
 class BatchConverter:
     """複数のHTMLファイルを一括変換するクラス"""
@@ -21,14 +23,23 @@ class BatchConverter:
         Args:
             style_config (dict, optional): スタイル設定
         """
+        from core import HTMLParser, MathConverter, WordGenerator
+        
         self.config = style_config or STYLE_CONFIG
         self.parser = HTMLParser()
         self.math_converter = MathConverter(self.config)
         self.generator = WordGenerator(self.config, self.math_converter)
         
+        # 変換したファイル全体での数式の書き込み方ごとの件数
+        self._math_counts = {'text': 0, 'omml': 0, 'image': 0}
+        
         # ログ設定
         self.logger = self._setup_logger()
     
+    def close(self):
+        """プリフェッチ用のワーカーを終了"""
+        self.generator.close()
+    
     def _setup_logger(self):
         """ロガーを設定"""
         logger = logging.getLogger('BatchConverter')
@@ -86,6 +97,7 @@ class BatchConverter:
             return {'total': 0, 'success': 0, 'failed': 0}
         
         self.logger.info(f"変換開始: {total}個のファイル")
+        self._math_counts = {'text': 0, 'omml': 0, 'image': 0}
         
         # 統計情報
         stats = {
@@ -127,6 +139,8 @@ class BatchConverter:
         
         # 結果サマリー
         self.logger.info(f"\n変換完了: 成功 {stats['success']}/{total}, 失敗 {stats['failed']}/{total}")
+        self._log_math_stats()
+        self._log_render_stats(stats)
         
         return stats
     
@@ -142,21 +156,20 @@ class BatchConverter:
             bool: 成功時True
         """
         try:
-            # HTMLを読み込み
-            with open(input_file, 'r', encoding='utf-8') as f:
-                html_content = f.read()
+            # HTMLを少しずつ読みながら解析する
+            problems = self.parser.iter_problems(input_file)
+            first_problem = next(problems, None)
             
-            # 解析
-            problems = self.parser.parse(html_content)
-            
-            if not problems:
+            if first_problem is None:
                 self.logger.warning(f"  問題が検出されませんでした: {input_file.name}")
                 return False
             
-            self.logger.debug(f"  {len(problems)}個の問題を検出")
-            
-            # Word文書生成
-            doc = self.generator.create_document(problems)
+            # Word文書生成（解析した問題から順に書き込む）
+            doc = self.generator.create_document(itertools.chain([first_problem], problems))
+            self.logger.debug(f"  {self.generator.problem_counter}個の問題を変換")
+            math_stats = self.generator.math_stats()
+            for key in self._math_counts:
+                self._math_counts[key] += math_stats[key]
             
             # 保存
             doc.save(str(output_file))
@@ -184,6 +197,7 @@ class BatchConverter:
         
         total = len(input_files)
         self.logger.info(f"変換開始: {total}個のファイル")
+        self._math_counts = {'text': 0, 'omml': 0, 'image': 0}
         
         stats = {
             'total': total,
@@ -220,8 +234,34 @@ class BatchConverter:
                 self.logger.error(f"  ✗ エラー: {str(e)}")
         
         self.logger.info(f"\n変換完了: 成功 {stats['success']}/{total}, 失敗 {stats['failed']}/{total}")
+        self._log_math_stats()
+        self._log_render_stats(stats)
         
         return stats
+    
+    def _log_math_stats(self):
+        """変換したファイル全体での数式の書き込み方ごとの件数を記録"""
+        counts = self._math_counts
+        total = sum(counts.values())
+        text_rate = counts['text'] / total if total else 0.0
+        self.logger.info(
+            f"数式: 文字 {counts['text']}件, Wordの数式 {counts['omml']}件, "
+            f"画像 {counts['image']}件（文字化 {text_rate:.0%}）"
+        )
+
+    def _log_render_stats(self, stats: dict):
+        """隔離描画で制限を超えた数式を記録し、統計情報に加える"""
+        render_stats = self.math_converter.render_stats()
+        if not render_stats:
+            return
+        stats['render'] = render_stats
+        self.logger.info(
+            f"隔離描画: 描画 {render_stats['rendered']}件, 時間超過 {render_stats['timeout']}件, "
+            f"メモリ超過 {render_stats['memory']}件, 異常終了 {render_stats['crash']}件, "
+            f"ワーカー再起動 {render_stats['restarts']}回"
+        )
+        for failure in render_stats['failures']:
+            self.logger.warning(f"  描画を打ち切った数式（{failure['reason']}）: {failure['latex'][:50]}")
 
 def main():
     """コマンドライン実行"""
@@ -237,13 +277,16 @@ def main():
     converter = BatchConverter()
     
     input_path = Path(args.input)
-    if input_path.is_dir():
-        stats = converter.convert_folder(args.input, args.output, args.pattern)
-    elif input_path.is_file():
-        stats = converter.convert_multiple_files([args.input], args.output)
-    else:
-        print(f"エラー: {args.input} が見つかりません")
-        return 1
+    try:
+        if input_path.is_dir():
+            stats = converter.convert_folder(args.input, args.output, args.pattern)
+        elif input_path.is_file():
+            stats = converter.convert_multiple_files([args.input], args.output)
+        else:
+            print(f"エラー: {args.input} が見つかりません")
+            return 1
+    finally:
+        converter.close()
     
     return 0 if stats['failed'] == 0 else 1
 
@@ -0,0 +1,159 @@
+"""描画バックエンドのベンチマーク（bench-renderers）
+
+フォルダ内の問題HTMLの数式を各バックエンドで描画して時間を測り、
+数式の長さ（トークン数）に対する描画時間の係数を求める。
+結果をJSONに書き出し、設定の math_backend_costs に指定すると
+'auto'のエンジン選択に使われる。
+
+使用方法:
+    python src/batch/bench_renderers.py data/input --output build/backend_costs.json
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+# 親ディレクトリのモジュールをインポート
+sys.path.append(str(Path(__file__).parent.parent))
+
+import matplotlib
+import numpy as np
+from matplotlib.mathtext import MathTextParser
+
+from core import STYLE_CONFIG, HTMLParser, MathConverter
+from core.formula_collector import iter_formulas_with_context
+from core.latex_normalizer import canonicalize_latex, tokenize_latex
+from core.render_backends import AutoBackend, backend_names, get_backend
+
+def collect_formulas(input_folder: str, pattern: str = '*.html') -> list:
+    """フォルダ内の異なる数式（正規化済みLaTeX, 文脈）を集める"""
+    parser = HTMLParser()
+    formulas = {}
+    for html_file in sorted(Path(input_folder).rglob(pattern)):
+        with open(html_file, 'r', encoding='utf-8') as f:
+            problems = parser.parse(f.read())
+        for latex_str, context in iter_formulas_with_context(problems):
+            formulas.setdefault((canonicalize_latex(latex_str), context), None)
+    return [(latex_str, context) for latex_str, context in formulas if latex_str]
+
+def time_backend(backend, formulas: list, converter: MathConverter, repeat: int) -> list:
+    """
+    バックエンドで描画できる数式の描画時間を測る
+
+    Returns:
+        list: (トークン数, ミリ秒)のリスト（繰り返しのうち最短）
+    """
+    samples = []
+    for latex_str, context in formulas:
+        if not backend.supports(latex_str):
+            continue
+        args = (latex_str, converter.font_size, converter.color, converter.dpi,
+                converter._target(context), converter.png_encoding)
+        best = None
+        for _ in range(repeat):
+            # matplotlib内部の解析結果キャッシュを毎回捨てる
+            MathTextParser._parse_cached.cache_clear()
+            start = time.perf_counter()
+            try:
+                backend.render_png(*args)
+            except Exception:
+                best = None
+                break
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        if best is not None:
+            samples.append((len(tokenize_latex(latex_str)), best))
+    return samples
+
+def fit_cost(samples: list) -> tuple:
+    """描画時間を 1数式あたり + 1トークンあたり × トークン数 で近似（負にはしない）"""
+    tokens = np.array([count for count, _ in samples], float)
+    times = np.array([ms for _, ms in samples], float)
+    if len(samples) < 2 or np.ptp(tokens) == 0:
+        return (float(times.mean()), 0.0)
+    per_token, per_formula = np.polyfit(tokens, times, 1)
+    if per_token < 0:
+        return (float(times.mean()), 0.0)
+    return (max(0.0, float(per_formula)), float(per_token))
+
+def bench_renderers(input_folder: str, names: list = None, config: dict = None,
+                    repeat: int = 3, pattern: str = '*.html') -> dict:
+    """
+    各バックエンドの描画時間を測る
+
+    Returns:
+        dict: 数式数と、バックエンドごとの描画できた数式数・平均時間・係数
+    """
+    config = config or STYLE_CONFIG
+    converter = MathConverter(dict(config, math_cache_max_bytes=0, math_store_path=None,
+                                   math_bundle_path=None, math_isolation=False))
+    formulas = collect_formulas(input_folder, pattern)
+
+    results = {}
+    for name in names or backend_names():
+        backend = get_backend(name)
+        # フォント読み込みなどの初回コストを除く
+        backend.render_png('x', converter.font_size, converter.color, converter.dpi)
+        samples = time_backend(backend, formulas, converter, repeat)
+        if not samples:
+            continue
+        results[name] = {
+            'formulas': len(samples),
+            'mean_ms': sum(ms for _, ms in samples) / len(samples),
+            'cost': fit_cost(samples),
+        }
+
+    # 測った係数で'auto'がどのバックエンドを選ぶか
+    auto = AutoBackend([get_backend(name) for name in results],
+                       {name: result['cost'] for name, result in results.items()})
+    chosen = {name: 0 for name in results}
+    for latex_str, _ in formulas:
+        try:
+            chosen[auto.choose(latex_str).name] += 1
+        except ValueError:
+            pass
+
+    return {'formulas': len(formulas), 'backends': results, 'chosen': chosen}
+
+def main():
+    """コマンドライン実行"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='描画バックエンドの描画時間を測る')
+    parser.add_argument('input', help='問題HTMLのフォルダ')
+    parser.add_argument('--output', help='計測結果（math_backend_costsに指定するJSON）の出力先')
+    parser.add_argument('--engines', nargs='+', choices=backend_names(),
+                        help='測るバックエンド（既定はすべて）')
+    parser.add_argument('--repeat', type=int, default=3, help='繰り返し回数')
+    parser.add_argument('--pattern', default='*.html', help='ファイルパターン')
+
+    args = parser.parse_args()
+
+    if not Path(args.input).is_dir():
+        print(f"エラー: {args.input} が見つかりません")
+        return 1
+
+    report = bench_renderers(args.input, args.engines, repeat=args.repeat,
+                             pattern=args.pattern)
+
+    print(f"数式: {report['formulas']}種類 × {args.repeat}回")
+    for name, result in report['backends'].items():
+        per_formula, per_token = result['cost']
+        print(f"  {name:10s} {result['formulas']:5d}種類 {result['mean_ms']:8.1f} ms/数式"
+              f"  (係数 {per_formula:.2f} + {per_token:.3f}×トークン数)"
+              f"  auto選択 {report['chosen'][name]}種類")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'matplotlib': matplotlib.__version__,
+                'costs': {name: result['cost'] for name, result in report['backends'].items()},
+            }, f, ensure_ascii=False, indent=2)
+        print(f"計測結果: {output}")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""matplotlibのフォントキャッシュの事前生成
+
+凍結アプリに同梱するフォント一覧（fontlist-v*.json）を作る。
+配布先にないビルド環境のシステムフォントは含めず、matplotlib同梱の
+フォント（パスはデータディレクトリからの相対で保存される）だけにする。
+AFMフォント（PDF/PS用）は凍結アプリに同梱しない（specファイルで除外）ため含めない。
+あわせて、数式の描画に使うフォントが見つかることを確認する。
+
+使用方法:
+    python src/batch/build_font_cache.py build/mpl_cache
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+# 親ディレクトリのモジュールをインポート
+sys.path.append(str(Path(__file__).parent.parent))
+
+# 数式の描画に必要なフォント: (ファミリー, スタイル)
+REQUIRED_FONTS = [
+    ('cmr10', 'normal'),
+    ('cmmi10', 'normal'),
+    ('cmsy10', 'normal'),
+    ('cmex10', 'normal'),
+    ('DejaVu Sans', 'normal'),
+    ('STIXGeneral', 'normal'),
+    ('STIXGeneral', 'italic'),
+]
+
+def build_font_cache(output_dir: str) -> Path:
+    """
+    フォントキャッシュを生成
+
+    matplotlibを読み込む前に呼ぶ（設定ディレクトリを出力先にするため）。
+
+    Returns:
+        Path: 生成したキャッシュファイル
+    """
+    output = Path(output_dir).resolve()
+    output.mkdir(parents=True, exist_ok=True)
+    for old in output.glob('fontlist-v*.json'):
+        old.unlink()
+    os.environ['MPLCONFIGDIR'] = str(output)
+
+    import matplotlib
+    from matplotlib import font_manager
+    from matplotlib.font_manager import FontManager, FontProperties
+
+    data_path = Path(matplotlib.get_data_path()).resolve()
+
+    def bundled(entry) -> bool:
+        try:
+            Path(entry.fname).resolve().relative_to(data_path)
+            return True
+        except ValueError:
+            return False
+
+    manager = FontManager()
+    manager.ttflist = [entry for entry in manager.ttflist if bundled(entry)]
+    manager.afmlist = []
+
+    for family, style in REQUIRED_FONTS:
+        manager.findfont(FontProperties(family=family, style=style),
+                         fallback_to_default=False, rebuild_if_missing=False)
+
+    path = output / f'fontlist-v{FontManager.__version__}.json'
+    font_manager.json_dump(manager, path)
+    # ビルド中にできたフォント以外のキャッシュは同梱しない
+    for other in output.iterdir():
+        if other != path:
+            if other.is_file():
+                other.unlink()
+    return path
+
+def main():
+    """コマンドライン実行"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='matplotlibのフォントキャッシュを事前に生成')
+    parser.add_argument('output', nargs='?', default='build/mpl_cache', help='出力フォルダ')
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        path = build_font_cache(args.output)
+    except ValueError as e:
+        print(f"エラー: 数式に使うフォントが見つかりません: {e}")
+        return 1
+    print(f"フォントキャッシュ: {path}")
+    print(f"所要時間: {time.perf_counter() - start:.1f}秒")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
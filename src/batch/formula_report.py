@@ -0,0 +1,105 @@
+"""数式の正規化効果レポート
+
+フォルダ内のHTMLから数式を集め、正規化によって
+描画が必要な数式の種類がどれだけ減るかを集計する。
+あわせて、画像にせず文字で書ける単純なインライン数式の数も数える。
+"""
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+# 親ディレクトリのモジュールをインポート
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core import STYLE_CONFIG, HTMLParser
+from core.formula_collector import iter_formulas_with_context
+from core.latex_normalizer import canonicalize_latex
+from core.plain_math import DEFAULT_PLAIN_COMMANDS, PlainMathConverter
+
+def legacy_key(latex_str: str) -> str:
+    """従来の前処理（$記号の除去と\\text{}の変換のみ）によるキー"""
+    latex_str = latex_str.strip()
+    latex_str = re.sub(r'^\$+|\$+$', '', latex_str)
+    return re.sub(r'\\text\{([^}]+)\}', r'\\mathrm{\1}', latex_str)
+
+def build_report(input_folder: str, pattern: str = '*.html') -> dict:
+    """
+    フォルダ内の数式を集計
+
+    Args:
+        input_folder (str): 入力フォルダ
+        pattern (str): ファイルパターン
+
+    Returns:
+        dict: 集計結果
+    """
+    parser = HTMLParser()
+    html_files = sorted(Path(input_folder).rglob(pattern))
+
+    plain = PlainMathConverter(STYLE_CONFIG.get('math_plain_commands') or DEFAULT_PLAIN_COMMANDS)
+
+    formulas = Counter()
+    inline = 0
+    plain_text = 0
+    for html_file in html_files:
+        with open(html_file, 'r', encoding='utf-8') as f:
+            problems = parser.parse(f.read())
+        for latex, context in iter_formulas_with_context(problems):
+            formulas[latex] += 1
+            # 文字にするのはインライン数式と選択肢内の数式だけ
+            if context != 'display':
+                inline += 1
+                if plain.convert(latex) is not None:
+                    plain_text += 1
+
+    legacy = {legacy_key(latex) for latex in formulas}
+    canonical = Counter()
+    for latex, count in formulas.items():
+        canonical[canonicalize_latex(latex)] += count
+
+    return {
+        'files': len(html_files),
+        'formulas': sum(formulas.values()),
+        'distinct_raw': len(formulas),
+        'distinct_legacy': len(legacy),
+        'distinct_canonical': len(canonical),
+        'saved_renders': len(legacy) - len(canonical),
+        'inline': inline,
+        'plain_text': plain_text,
+        'top': canonical.most_common(10),
+    }
+
+def main():
+    """コマンドライン実行"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='数式の正規化効果を集計')
+    parser.add_argument('input', help='入力フォルダ')
+    parser.add_argument('--pattern', default='*.html', help='ファイルパターン')
+
+    args = parser.parse_args()
+
+    if not Path(args.input).is_dir():
+        print(f"エラー: {args.input} が見つかりません")
+        return 1
+
+    report = build_report(args.input, args.pattern)
+
+    print(f"ファイル数: {report['files']}")
+    print(f"数式の出現数: {report['formulas']}")
+    print(f"異なる数式（そのまま）: {report['distinct_raw']}")
+    print(f"異なる数式（従来の前処理）: {report['distinct_legacy']}")
+    print(f"異なる数式（正規化後）: {report['distinct_canonical']}")
+    print(f"削減できる描画回数: {report['saved_renders']}")
+    print(f"文字で書けるインライン数式: {report['plain_text']}/{report['inline']}")
+
+    if report['top']:
+        print("\n出現回数の多い数式:")
+        for latex, count in report['top']:
+            print(f"  {count:5d}  {latex}")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
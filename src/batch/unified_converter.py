@@ -1,6 +1,6 @@
 """統一感を持った複数問題の変換"""
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 import sys
 
 sys.path.append(str(Path(__file__).parent.parent))
@@ -12,11 +12,16 @@ from docx.shared import Pt, Cm
 class UnifiedMathConverter:
     """統一されたスタイルで複数問題を変換"""
     
-    def __init__(self, style_config=None):
+    def __init__(self, style_config=None, render_pool=None):
+        """
+        Args:
+            style_config (dict, optional): スタイル設定
+            render_pool (RenderPool, optional): プリフェッチに使うプール（GUIが使い回す場合）
+        """
         self.config = style_config or STYLE_CONFIG
         self.parser = HTMLParser()
         self.math_converter = MathConverter(self.config)
-        self.generator = WordGenerator(self.config, self.math_converter)
+        self.generator = WordGenerator(self.config, self.math_converter, render_pool)
         self.problem_counter = 0
     
     def convert_multiple_problems(self, html_list: List[str], 
@@ -31,37 +36,22 @@ class UnifiedMathConverter:
         Returns:
             bool: 成功時True
         """
-        all_problems = []
-        
-        # すべてのHTMLを解析
-        for html_file in html_list:
-            try:
-                with open(html_file, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                
-                problems = self.parser.parse(html_content)
-                all_problems.extend(problems)
-                
-                print(f"✓ 読み込み: {Path(html_file).name} ({len(problems)}問)")
-                
-            except Exception as e:
-                print(f"✗ エラー: {Path(html_file).name} - {str(e)}")
-                continue
+        # すべてのHTMLを少しずつ解析しながらWord文書を生成
+        try:
+            doc = self.generator.create_document(self._iter_all_problems(html_list))
+        except Exception as e:
+            print(f"\n✗ エラー: {str(e)}")
+            return False
+        finally:
+            self.generator.close()
         
-        if not all_problems:
+        if not self.problem_counter:
             print("エラー: 問題が見つかりませんでした")
             return False
         
-        print(f"\n合計 {len(all_problems)}問を変換します...")
-        
-        # 問題番号を統一的に振り直す
-        for i, problem in enumerate(all_problems, 1):
-            if not problem['title'] or problem['title'].startswith('大問'):
-                problem['title'] = f'大問{i}'
+        print(f"\n合計 {self.problem_counter}問を変換しました")
         
-        # Word文書を生成
         try:
-            doc = self.generator.create_document(all_problems)
             doc.save(output_file)
             print(f"\n✓ 完了: {output_file}")
             return True
@@ -70,6 +60,30 @@ class UnifiedMathConverter:
             print(f"\n✗ エラー: {str(e)}")
             return False
     
+    def _iter_all_problems(self, html_list: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        すべてのHTMLの問題を順に返す（問題番号は統一的に振り直す）
+        
+        途中で解析に失敗したファイルの問題を文書に残さないよう、1ファイル分の問題を
+        読み終えてから返す（ファイルをまたいでは少しずつ処理する）。
+        """
+        self.problem_counter = 0
+        
+        for html_file in html_list:
+            try:
+                problems = list(self.parser.iter_problems(html_file))
+            except Exception as e:
+                print(f"✗ エラー: {Path(html_file).name} - {str(e)}")
+                continue
+            
+            print(f"✓ 読み込み: {Path(html_file).name} ({len(problems)}問)")
+            
+            for problem in problems:
+                self.problem_counter += 1
+                if not problem['title'] or problem['title'].startswith('大問'):
+                    problem['title'] = f'大問{self.problem_counter}'
+                yield problem
+    
     def convert_folder_unified(self, input_folder: str, 
                               output_file: str) -> bool:
         """
@@ -0,0 +1,136 @@
+"""数式キャッシュの事前生成（warm-cache）
+
+フォルダ内の問題HTMLから異なる数式をすべて集めて並列にレンダリングし、
+永続ストアに登録するとともに、配布用のバンドルを書き出す。
+
+使用方法:
+    python src/batch/warm_cache.py data/input --bundle build/formula_bundle.zip
+"""
+import sys
+import time
+from pathlib import Path
+
+# 親ディレクトリのモジュールをインポート
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core import STYLE_CONFIG, HTMLParser, MathConverter
+from core.formula_collector import iter_formulas_with_context
+from core.latex_normalizer import canonicalize_latex
+from core.math_converter import RENDERER_VERSION
+from core.render_bundle import write_bundle
+from core.render_pool import RenderPool
+
+def collect_formulas(input_folder: str, pattern: str = '*.html') -> list:
+    """フォルダ内の異なる数式を集める
+
+    Returns:
+        list: (正規化済みLaTeX, 文脈)のリスト
+    """
+    parser = HTMLParser()
+    formulas = {}
+
+    for html_file in sorted(Path(input_folder).rglob(pattern)):
+        with open(html_file, 'r', encoding='utf-8') as f:
+            problems = parser.parse(f.read())
+        for latex_str, context in iter_formulas_with_context(problems):
+            formulas.setdefault((canonicalize_latex(latex_str), context), None)
+
+    return [(latex_str, context) for latex_str, context in formulas if latex_str]
+
+def warm_cache(input_folder: str, bundle_path: str = None, config: dict = None,
+               workers: int = None, pattern: str = '*.html') -> dict:
+    """
+    数式を事前にレンダリング
+
+    Args:
+        input_folder (str): 入力フォルダ
+        bundle_path (str, optional): バンドルの出力先
+        config (dict, optional): スタイル設定
+        workers (int, optional): ワーカー数（既定はCPU数）
+        pattern (str): ファイルパターン
+
+    Returns:
+        dict: 統計情報
+    """
+    config = config or STYLE_CONFIG
+    # 既存バンドルの内容を再収録しないよう、バンドルは参照しない
+    converter = MathConverter(dict(config, math_bundle_path=None))
+
+    formulas = collect_formulas(input_folder, pattern)
+
+    # ストアなどにあるものは描画しない
+    images = {}
+    pending = {}
+    for latex_str, context in formulas:
+        data = converter.lookup(latex_str, context)
+        if data is None:
+            pending.setdefault(context, []).append(latex_str)
+        else:
+            images[converter._store_key(latex_str, context)] = data
+
+    failed = []
+    if pending:
+        with RenderPool(config, workers) as pool:
+            for context, latex_list in pending.items():
+                for latex_str, data in pool.render(latex_list, context).items():
+                    if data is None:
+                        failed.append(latex_str)
+                        continue
+                    converter.add_rendered(latex_str, data, context)
+                    images[converter._store_key(latex_str, context)] = data
+
+    rendered = sum(len(latex_list) for latex_list in pending.values())
+    stats = {
+        'formulas': len(formulas),
+        'rendered': rendered - len(failed),
+        'reused': len(formulas) - rendered,
+        'failed': failed,
+        'bundle': None,
+    }
+
+    if bundle_path:
+        write_bundle(
+            bundle_path,
+            images,
+            converter.fingerprint,
+            RENDERER_VERSION
+        )
+        stats['bundle'] = bundle_path
+
+    return stats
+
+def main():
+    """コマンドライン実行"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='数式キャッシュを事前に生成')
+    parser.add_argument('input', help='問題HTMLのフォルダ')
+    parser.add_argument('--bundle', help='配布用バンドルの出力先')
+    parser.add_argument('--workers', type=int, help='ワーカー数')
+    parser.add_argument('--pattern', default='*.html', help='ファイルパターン')
+
+    args = parser.parse_args()
+
+    if not Path(args.input).is_dir():
+        print(f"エラー: {args.input} が見つかりません")
+        return 1
+
+    start = time.perf_counter()
+    stats = warm_cache(args.input, args.bundle, workers=args.workers,
+                       pattern=args.pattern)
+    elapsed = time.perf_counter() - start
+
+    print(f"数式: {stats['formulas']}種類")
+    print(f"  描画: {stats['rendered']}")
+    print(f"  既存: {stats['reused']}")
+    print(f"  失敗: {len(stats['failed'])}")
+    for latex_str in stats['failed']:
+        print(f"    ✗ {latex_str}")
+    if stats['bundle']:
+        print(f"バンドル: {stats['bundle']}")
+    print(f"所要時間: {elapsed:.1f}秒")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
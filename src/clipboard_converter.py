@@ -3,7 +3,8 @@ import sys
 from pathlib import Path
 import pyperclip
 from datetime import datetime
-from core import STYLE_CONFIG, TEMPLATES, HTMLParser, MathConverter, WordGenerator, TemplateManager
+# 重い依存（matplotlib, python-docx など）は使うときに読み込む
+from core import STYLE_CONFIG, TEMPLATES, TemplateManager
 
 def convert_from_clipboard(output_file: str = None, template_name: str = 'standard', **kwargs):
     """クリップボードのHTMLをWord文書に変換"""
@@ -29,6 +30,7 @@ def convert_from_clipboard(output_file: str = None, template_name: str = 'standa
             output_file = f'data/output/clipboard_{timestamp}.docx'
         
         # 初期化
+        from core import HTMLParser, MathConverter, WordGenerator
         parser = HTMLParser()
         math_converter = MathConverter(STYLE_CONFIG)
         word_generator = WordGenerator(STYLE_CONFIG, math_converter)
@@ -48,7 +50,10 @@ def convert_from_clipboard(output_file: str = None, template_name: str = 'standa
         
         # Word文書を生成
         print("\nWord文書を生成中...")
-        doc = word_generator.create_document(problems)
+        try:
+            doc = word_generator.create_document(problems)
+        finally:
+            word_generator.close()
         
         # テンプレートを適用
         if template_name != 'none':
@@ -1,15 +1,50 @@
-"""コアモジュール"""
+"""コアモジュール
+
+HTMLParser・MathConverter などのクラスは、初めて参照されたときに
+モジュールを読み込む（PEP 562）。matplotlib・python-docx・BeautifulSoup は
+読み込みに時間がかかるため、設定やテンプレート一覧だけを使う場合
+（--help、テンプレート一覧の表示など）には読み込まない。
+"""
+import importlib
+from typing import TYPE_CHECKING
+
 from .style_config import STYLE_CONFIG, TEMPLATES
-from .html_parser import HTMLParser
-from .math_converter import MathConverter
-from .word_generator import WordGenerator
-from .template_manager import TemplateManager
+
+if TYPE_CHECKING:
+    # 型チェッカーとPyInstallerの依存解析向け（実行時には読み込まない）
+    from .html_parser import HTMLParser
+    from .problem import Problem
+    from .math_converter import MathConverter
+    from .word_generator import WordGenerator
+    from .template_manager import TemplateManager
+
+# 遅延して読み込む名前 -> 定義しているモジュール
+_LAZY_ATTRIBUTES = {
+    'HTMLParser': '.html_parser',
+    'Problem': '.problem',
+    'MathConverter': '.math_converter',
+    'WordGenerator': '.word_generator',
+    'TemplateManager': '.template_manager',
+}
 
 __all__ = [
     'STYLE_CONFIG',
     'TEMPLATES',
     'HTMLParser',
+    'Problem',
     'MathConverter',
     'WordGenerator',
     'TemplateManager'
 ]
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # 2回目以降は通常の属性として参照される
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,477 @@
+"""スレッドセーフな数式レンダラー
+
+pyplotのグローバルな図管理を使わず、matplotlib.figure.Figureと
+FigureCanvasAggを直接扱う。描画に使った図はプールに戻して再利用する。
+"""
+import contextlib
+import io
+import math
+import threading
+from typing import List, Optional, Tuple
+
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.mathtext import MathTextParser
+from matplotlib.transforms import IdentityTransform
+
+from .png_encoder import encode_png, reencode_png
+
+# レンダラーごとのrc設定の既定値
+RENDER_RC = {
+    'mathtext.fontset': 'cm',
+    'mathtext.default': 'regular',
+}
+
+# 図ごとに指定できず、数式の解析時にグローバル設定から参照されるrcキー
+# （解析のたびにrc_contextで適用し、グローバル設定は書き換えない）
+_PARSE_RC_KEYS = ('mathtext.default',)
+
+# matplotlibの数式パーサー（MathTextParserのクラス共有のParserとpyparsingのキャッシュ）は
+# スレッド間で共有されるため、レンダラーからの数式の解析はこのロックで直列化する。
+# 図ごとのFigureCanvasAggへの描画やsavefigは並行してよい
+# （フォントのFT2Fontはmatplotlibがスレッドごとに持つ）
+MATHTEXT_LOCK = threading.RLock()
+
+# 数式を描画する図のサイズ（インチ）
+FORMULA_FIGSIZE = (10, 2)
+ERROR_FIGSIZE = (4, 0.5)
+
+# 数式の周囲の余白（インチ）
+PAD_INCHES = 0.1
+
+# まとめて描画するキャンバスの上限（ピクセル）
+ATLAS_MAX_HEIGHT = 16384
+ATLAS_MAX_PIXELS = 4 * 1024 * 1024
+
+# 目標の大きさに合わせた解像度の刻み（1オクターブあたりの段数）
+# 解像度がそろった数式はまとめて描画できる
+DPI_STEPS = 4
+
+def fit_dpi(size_inches: Tuple[float, float], target, max_dpi: float) -> float:
+    """
+    画像が目標の大きさになる解像度を求める
+
+    Args:
+        size_inches (Tuple[float, float]): 余白を含む画像の大きさ（インチ、解像度によらない）
+        target (Tuple[str, float]): ('width' または 'height', ピクセル数)。Noneなら常にmax_dpi
+        max_dpi (float): 解像度の上限
+
+    Returns:
+        float: 目標以上の大きさになる最小の刻みの解像度（max_dpiが上限）
+    """
+    if target is None:
+        return max_dpi
+
+    axis, pixels = target
+    inches = size_inches[0] if axis == 'width' else size_inches[1]
+    if inches <= 0 or pixels <= 0:
+        return max_dpi
+
+    dpi = 2 ** (math.ceil(math.log2(pixels / inches) * DPI_STEPS) / DPI_STEPS)
+    return min(max_dpi, dpi)
+
+@contextlib.contextmanager
+def _parsing(rc: dict):
+    """数式を解析する間、MATHTEXT_LOCKを持ち、解析時に参照されるrcキーを適用する"""
+    with MATHTEXT_LOCK:
+        parse_rc = {key: rc[key] for key in _PARSE_RC_KEYS
+                    if key in rc and matplotlib.rcParams[key] != rc[key]}
+        if not parse_rc:
+            yield
+            return
+        with matplotlib.rc_context(parse_rc):
+            yield
+
+class LockedMathTextParser:
+    """MathTextParserの解析を、レンダラーのrc設定でMATHTEXT_LOCKを持って行う"""
+
+    def __init__(self, parser: MathTextParser, rc: dict):
+        self._parser = parser
+        self.rc = rc
+
+    def parse(self, *args, **kwargs):
+        with _parsing(self.rc):
+            return self._parser.parse(*args, **kwargs)
+
+class _LockedCanvasAgg(FigureCanvasAgg):
+    """描画器の数式パーサーをLockedMathTextParserで包んだFigureCanvasAgg
+
+    図の描画・レイアウト計算・PNGへの書き出しはいずれもこのパーサーを通るため、
+    数式の解析だけが直列化される。
+    """
+
+    def __init__(self, figure: Figure, rc: dict):
+        super().__init__(figure)
+        self._rc = rc
+
+    def get_renderer(self):
+        renderer = super().get_renderer()
+        if not isinstance(renderer.mathtext_parser, LockedMathTextParser):
+            renderer.mathtext_parser = LockedMathTextParser(renderer.mathtext_parser, self._rc)
+        return renderer
+
+class FigureRenderer:
+    """Figure + FigureCanvasAggによる数式レンダラー
+
+    描画中の図はスレッドごとに専有し、数式の解析だけをMATHTEXT_LOCKで
+    直列化するため、ThreadPoolExecutorなどから同時に呼び出してよい
+    （解析以外の描画・PNGへの書き出しは並行して進む）。
+    ただし描画時間の大半は数式の解析（字形のラスタライズを含む）で、残りもGILを
+    保持したまま進むため、スレッドを増やしても速くはならない。並列に描画するには
+    プロセスを使う（render_pool.RenderPoolを参照）。
+    """
+
+    def __init__(self, rc: dict = None, pool_size: int = 8):
+        self.rc = dict(RENDER_RC, **(rc or {}))
+        self.pool_size = pool_size
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, figsize) -> Figure:
+        """プールから図を取り出す（なければ作成）"""
+        with self._lock:
+            idle = self._idle.get(figsize)
+            if idle:
+                return idle.pop()
+
+        fig = Figure(figsize=figsize)
+        _LockedCanvasAgg(fig, self.rc)
+        return fig
+
+    def _release(self, fig: Figure, figsize):
+        """図を片付けてプールに戻す"""
+        fig.clear()
+        with self._lock:
+            idle = self._idle.setdefault(figsize, [])
+            if len(idle) < self.pool_size:
+                idle.append(fig)
+
+    def _add_text(self, fig: Figure, text: str, **kwargs):
+        """図の中央にテキストを配置"""
+        return fig.text(
+            0.5, 0.5, text,
+            ha='center',
+            va='center',
+            math_fontfamily=self.rc['mathtext.fontset'],
+            **kwargs
+        )
+
+    def render_png(self, latex_str: str, font_size: float, color: str,
+                   dpi: float, target=None, encoding: str = 'rgba') -> bytes:
+        """
+        数式をPNGに描画
+
+        Args:
+            latex_str (str): 前処理済みのLaTeX（$記号なし）
+            font_size (float): フォントサイズ（pt）
+            color (str): 数式の色
+            dpi (float): 出力解像度（targetを指定した場合は上限）
+            target (Tuple[str, float], optional): 目標の大きさ（fit_dpiを参照）
+            encoding (str): PNGのエンコード方式（png_encoder.PNG_ENCODINGSを参照）
+
+        Returns:
+            bytes: 透過PNG
+        """
+        fig = self._acquire(FORMULA_FIGSIZE)
+        try:
+            fig.patch.set_alpha(0)
+            text = self._add_text(fig, f'${latex_str}$', fontsize=font_size, color=color)
+
+            buf = io.BytesIO()
+            # 描画して境界ボックスを取得
+            fig.canvas.draw()
+            bbox = text.get_window_extent(renderer=fig.canvas.get_renderer())
+
+            # 余白を追加
+            bbox_padded = bbox.padded(10)
+            dpi = fit_dpi((bbox_padded.width / fig.dpi, bbox_padded.height / fig.dpi),
+                          target, dpi)
+
+            # 画像として保存
+            fig.savefig(
+                buf,
+                format='png',
+                dpi=dpi,
+                bbox_inches=bbox_padded.transformed(fig.dpi_scale_trans.inverted()),
+                transparent=True,
+                pad_inches=0.1
+            )
+            return reencode_png(buf.getvalue(), encoding)
+        finally:
+            self._release(fig, FORMULA_FIGSIZE)
+
+    def render_svg(self, latex_str: str, font_size: float, color: str) -> bytes:
+        """
+        数式をSVGに描画
+
+        字形はパスとして埋め込むため、フォントのない環境でも同じ見た目になる。
+        切り抜き範囲はPNGと同じ（レイアウト＋余白）で、縦横比も一致する。
+
+        Returns:
+            bytes: 背景が透明なSVG
+        """
+        fig = self._acquire(FORMULA_FIGSIZE)
+        try:
+            fig.patch.set_alpha(0)
+            text = self._add_text(fig, f'${latex_str}$', fontsize=font_size, color=color)
+
+            buf = io.BytesIO()
+            bbox = text.get_window_extent(renderer=fig.canvas.get_renderer()).padded(10)
+            # SVGの書き出しはmatplotlibの描画器の数式パーサーを使うため、書き出し全体を
+            # 解析として直列化する
+            with _parsing(self.rc):
+                fig.savefig(
+                    buf,
+                    format='svg',
+                    bbox_inches=bbox.transformed(fig.dpi_scale_trans.inverted()),
+                    transparent=True,
+                    # 同じ数式から同じSVGを作るため日付を入れない
+                    metadata={'Date': None}
+                )
+            return buf.getvalue()
+        finally:
+            self._release(fig, FORMULA_FIGSIZE)
+
+    def render_many_png(self, latex_list: List[str], font_size: float, color: str,
+                        dpi: float, target=None,
+                        encoding: str = 'rgba') -> List[Optional[bytes]]:
+        """
+        複数の数式を描画
+
+        Returns:
+            List[Optional[bytes]]: 入力順の透過PNG（描画できない数式はNone）
+        """
+        results = []
+        for latex_str in latex_list:
+            try:
+                results.append(self.render_png(latex_str, font_size, color, dpi,
+                                               target, encoding))
+            except Exception:
+                results.append(None)
+        return results
+
+    def render_error_png(self, dpi: float) -> bytes:
+        """数式エラーを示す代替画像を描画"""
+        fig = self._acquire(ERROR_FIGSIZE)
+        try:
+            fig.patch.set_facecolor('#ffe6e6')
+            fig.patch.set_alpha(None)
+            self._add_text(
+                fig, '[数式エラー]',
+                fontsize=10,
+                color='red',
+                bbox=dict(boxstyle='round', facecolor='white', edgecolor='red')
+            )
+
+            buf = io.BytesIO()
+            fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+            return buf.getvalue()
+        finally:
+            self._release(fig, ERROR_FIGSIZE)
+
+class TrimmedFigureRenderer(FigureRenderer):
+    """1回の描画で済ませるFigureRenderer
+
+    従来方式は画面解像度で1回描画して範囲を測り、savefigで出力解像度に
+    もう1回描画する。ここではレイアウト計算だけで切り抜き範囲を求めて
+    キャンバスを合わせ、出力解像度で1回だけ描画する。描画結果のRGBA
+    バッファはNumPyで切り抜き、不透明部分が範囲からはみ出す場合は
+    範囲を広げる。出力画像はFigureRendererと画素単位で一致する。
+
+    複数の数式は1枚のキャンバスに縦に並べてまとめて描画できる。
+    目標の大きさを指定した場合は、解像度がそろった数式ごとにまとめる。
+    """
+
+    def render_rgba(self, latex_str: str, font_size: float, color: str,
+                    dpi: float, target=None) -> np.ndarray:
+        """数式を余白付きのRGBA配列に描画"""
+        return self._render_one(latex_str, font_size, color, dpi, target)[0]
+
+    def render_png(self, latex_str: str, font_size: float, color: str,
+                   dpi: float, target=None, encoding: str = 'rgba') -> bytes:
+        """数式をPNGに描画"""
+        rgba, dpi = self._render_one(latex_str, font_size, color, dpi, target)
+        return encode_png(rgba, dpi, encoding)
+
+    def render_many_png(self, latex_list: List[str], font_size: float, color: str,
+                        dpi: float, target=None,
+                        encoding: str = 'rgba') -> List[Optional[bytes]]:
+        """
+        複数の数式を1枚のキャンバスにまとめて描画し、それぞれをPNGにする
+
+        Returns:
+            List[Optional[bytes]]: 入力順の透過PNG（描画できない数式はNone）
+        """
+        return [
+            None if isinstance(result, Exception) else encode_png(*result, encoding)
+            for result in self._render_atlas(latex_list, font_size, color, dpi, target)
+        ]
+
+    def _render_one(self, latex_str: str, font_size: float, color: str,
+                    dpi: float, target) -> tuple:
+        """1つの数式を描画して(RGBA配列, 解像度)を返す"""
+        result = self._render_atlas([latex_str], font_size, color, dpi, target)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _render_atlas(self, latex_list: List[str], font_size: float, color: str,
+                      dpi: float, target=None) -> list:
+        """数式を縦に並べて描画し、入力順の(RGBA配列, 解像度)を返す（失敗した数式は例外）"""
+        results = [None] * len(latex_list)
+        fig = self._acquire(FORMULA_FIGSIZE)
+        default_dpi = fig.dpi
+        try:
+            fig.patch.set_alpha(0)
+
+            slots = []
+            # 図の解像度でのレイアウト計算のみで各数式の切り抜き範囲を求める
+            renderer = fig.canvas.get_renderer()
+            for index, latex_str in enumerate(latex_list):
+                text = fig.text(
+                    0, 0, f'${latex_str}$',
+                    ha='center',
+                    va='center',
+                    transform=IdentityTransform(),
+                    math_fontfamily=self.rc['mathtext.fontset'],
+                    fontsize=font_size,
+                    color=color
+                )
+                try:
+                    layout = text.get_window_extent(renderer=renderer).padded(10)
+                except Exception as e:
+                    # 解析できない数式は外して他の数式を続ける
+                    text.remove()
+                    results[index] = e
+                    continue
+                # 描画は並べる位置が決まってから
+                text.set_visible(False)
+                slot_dpi = fit_dpi(
+                    (layout.width / default_dpi, layout.height / default_dpi),
+                    target, dpi
+                )
+                crop = _scale_crop(layout, slot_dpi / default_dpi)
+                slots.append((index, text, crop, slot_dpi))
+
+            # 解像度ごとにまとめて描画
+            for slot_dpi in sorted({slot[3] for slot in slots}):
+                group = [slot[:3] for slot in slots if slot[3] == slot_dpi]
+                # はみ出した字形も収まるよう、各数式の周囲に確保する余白
+                margin = math.ceil(PAD_INCHES * slot_dpi)
+                fig.set_dpi(slot_dpi)
+                for chunk in _chunk_slots(group, margin):
+                    self._draw_chunk(fig, chunk, margin, slot_dpi, results)
+        finally:
+            fig.set_dpi(default_dpi)
+            fig.set_size_inches(FORMULA_FIGSIZE)
+            self._release(fig, FORMULA_FIGSIZE)
+
+        return results
+
+    def _draw_chunk(self, fig: Figure, chunk: list, margin: int, dpi: float,
+                    results: list):
+        """数式を縦に並べたキャンバスを1回描画し、それぞれを切り抜く"""
+        width = max(crop[2] for _, _, crop in chunk) + 2 * margin
+        height = sum(crop[3] + 2 * margin for _, _, crop in chunk)
+        fig.set_size_inches(width / dpi, height / dpi)
+
+        # 切り抜き範囲の左下を整数ピクセルに置く
+        # （従来方式とピクセル格子上の位置が同じになり、アンチエイリアスも一致する）
+        rows = []
+        top = 0
+        for index, text, (crop_x0, crop_y0, crop_width, crop_height) in chunk:
+            slot_height = crop_height + 2 * margin
+            base = height - top - slot_height + margin
+            text.set_position((margin - crop_x0, base - crop_y0))
+            text.set_visible(True)
+            rows.append(top)
+            top += slot_height
+
+        try:
+            fig.canvas.draw()
+            buffer = np.asarray(fig.canvas.buffer_rgba())
+        except Exception as e:
+            if len(chunk) == 1:
+                results[chunk[0][0]] = e
+                return
+            # 1つずつ描画し直して失敗した数式を切り分ける
+            for slot in chunk:
+                slot[1].set_visible(False)
+            for slot in chunk:
+                self._draw_chunk(fig, [slot], margin, dpi, results)
+            return
+        finally:
+            for _, text, _ in chunk:
+                text.set_visible(False)
+
+        for (index, _, (_, _, crop_width, crop_height)), top in zip(chunk, rows):
+            slot = buffer[top:top + crop_height + 2 * margin, :crop_width + 2 * margin]
+            results[index] = (_crop_slot(slot, margin, crop_width, crop_height), dpi)
+
+def _scale_crop(layout, scale: float) -> tuple:
+    """従来方式の切り抜き範囲（図の解像度でのレイアウト＋余白10px）を出力解像度に換算
+
+    Returns:
+        tuple: (左端, 下端, 幅, 高さ) 幅と高さはAggと同じく端数を切り捨てる
+    """
+    return (layout.x0 * scale, layout.y0 * scale,
+            int(layout.width * scale), int(layout.height * scale))
+
+def _chunk_slots(slots: list, margin: int):
+    """キャンバスが大きくなりすぎないよう数式を分ける"""
+    chunk = []
+    chunk_width = chunk_height = 0
+    for slot in slots:
+        width = slot[2][2] + 2 * margin
+        height = slot[2][3] + 2 * margin
+        new_width = max(chunk_width, width)
+        new_height = chunk_height + height
+        if chunk and (new_height > ATLAS_MAX_HEIGHT
+                      or new_width * new_height > ATLAS_MAX_PIXELS):
+            yield chunk
+            chunk = []
+            new_width, new_height = width, height
+        chunk.append(slot)
+        chunk_width, chunk_height = new_width, new_height
+    if chunk:
+        yield chunk
+
+def _crop_slot(slot: np.ndarray, margin: int, crop_width: int,
+               crop_height: int) -> np.ndarray:
+    """1つの数式の描画領域から切り抜き範囲を取り出す"""
+    left, top = margin, margin
+    right, bottom = margin + crop_width, margin + crop_height
+
+    # 字形が切り抜き範囲からはみ出していれば、欠けないよう範囲を広げる
+    alpha = slot[..., 3]
+    cols = np.flatnonzero(alpha.any(axis=0))
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if cols.size:
+        left = min(left, int(cols[0]))
+        right = max(right, int(cols[-1]) + 1)
+        top = min(top, int(rows[0]))
+        bottom = max(bottom, int(rows[-1]) + 1)
+
+    return slot[top:bottom, left:right].copy()
+
+# プロセス内で共有するレンダラー
+_shared_renderers = {}
+_shared_lock = threading.Lock()
+
+def get_shared_renderer() -> FigureRenderer:
+    """既定のrc設定で共有するレンダラーを取得"""
+    return _get_shared(FigureRenderer)
+
+def get_shared_trimmed_renderer() -> TrimmedFigureRenderer:
+    """既定のrc設定で共有する1回描画のレンダラーを取得"""
+    return _get_shared(TrimmedFigureRenderer)
+
+def _get_shared(renderer_class):
+    with _shared_lock:
+        renderer = _shared_renderers.get(renderer_class)
+        if renderer is None:
+            renderer = renderer_class()
+            _shared_renderers[renderer_class] = renderer
+        return renderer
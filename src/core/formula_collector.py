@@ -0,0 +1,24 @@
+"""問題データから数式を収集するモジュール"""
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .problem import as_problem
+
+def iter_formulas_with_context(problems: List[Dict[str, Any]]) -> Iterator[Tuple[str, str]]:
+    """問題リスト中のすべての数式を、置かれる場所とともに文書順に返す
+
+    Returns:
+        Iterator[Tuple[str, str]]: (LaTeX, 文脈) 文脈は'inline', 'display', 'choice'
+    """
+    for problem in map(as_problem, problems):
+        for kind, content in problem.text:
+            if kind == 'math':
+                yield content, 'inline'
+
+        for equation in problem.equations:
+            yield equation, 'display'
+
+        # 選択肢は解析時に分けたものを使う
+        for tokens in problem.choice_tokens:
+            for kind, content in tokens:
+                if kind == 'math':
+                    yield content, 'choice'
@@ -0,0 +1,53 @@
+"""凍結アプリ（PyInstaller）の実行環境の設定
+
+PyInstallerの単一ファイル版は起動のたびに別の一時ディレクトリへ展開され、
+matplotlibの設定ディレクトリもそこに作られるため、フォント一覧を毎回作り直す。
+ユーザーごとの固定の場所を設定ディレクトリにし、初回はビルド時に生成した
+フォントキャッシュ（batch/build_font_cache.py）を複製して作り直しを省く。
+"""
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Optional
+
+# matplotlibの設定ディレクトリ（固定の場所）
+DEFAULT_MPLCONFIG_DIR = '~/.mathconverter/matplotlib'
+
+# バンドル内のフォントキャッシュの置き場所
+FONT_CACHE_DIRNAME = 'mpl_cache'
+
+def configure_matplotlib_dir(config_dir: str = DEFAULT_MPLCONFIG_DIR) -> Optional[Path]:
+    """
+    凍結アプリならmatplotlibの設定ディレクトリを固定の場所にする
+
+    matplotlibを読み込む前（起動直後、multiprocessing.freeze_supportより前）に呼ぶ。
+    描画ワーカーのプロセスも同じ場所を使う。
+
+    Returns:
+        Optional[Path]: 設定したディレクトリ（凍結アプリでない、または設定できない場合はNone）
+    """
+    if not getattr(sys, 'frozen', False) or 'matplotlib' in sys.modules:
+        return None
+
+    path = Path(os.path.expanduser(config_dir))
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        # 作れなければPyInstallerの既定（一時ディレクトリ）のまま
+        return None
+    os.environ['MPLCONFIGDIR'] = str(path)
+
+    # 同梱のフォントキャッシュを複製（他のプロセスと同時に書いても壊れないよう置き換える）
+    bundled = Path(getattr(sys, '_MEIPASS', '')) / FONT_CACHE_DIRNAME
+    for cache in bundled.glob('fontlist-v*.json'):
+        target = path / cache.name
+        if target.exists():
+            continue
+        try:
+            temporary = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+            shutil.copyfile(cache, temporary)
+            os.replace(temporary, target)
+        except OSError:
+            pass
+    return path
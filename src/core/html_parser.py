@@ -1,19 +1,133 @@
 """HTML解析モジュール（修正版）"""
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import codecs
+import os
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+
+from .math_tokenizer import split_math
+from .mathml_converter import mathml_to_latex
+from .problem import Problem, Token
+from .style_config import STYLE_CONFIG
+
+# HTMLの解析エンジン
+# 'html.parser': BeautifulSoup（Python標準のパーサー）
+# 'lxml': BeautifulSoup（lxmlのパーサー）
+# 'lxml-xpath': lxmlの要素をXPathで直接探す（最も速い）
+PARSER_ENGINES = ('html.parser', 'lxml', 'lxml-xpath')
+
+# h2タグで問題を分割するときに問題へ移す要素
+SPLIT_TAGS = ['h2', 'p', 'div', 'ol', 'ul']
+
+# 問題の抽出に使う要素だけを木にする（head, script, styleなどは作らない）
+# 問題のdivも、h2タグでの分割に使う要素もこの中に含まれる
+PROBLEM_STRAINER = SoupStrainer(SPLIT_TAGS)
+
+# iter_problemsで1回に読む大きさ（文字数またはバイト数）
+READ_CHUNK_SIZE = 64 * 1024
+
+TITLE_TAGS = ('h1', 'h2', 'h3')
+LIST_TAGS = ('ol', 'ul')
+
+def make_soup(html_content: str, engine: str = 'html.parser', parse_only: SoupStrainer = None):
+    """
+    HTMLを解析する
+
+    Args:
+        parse_only: BeautifulSoupで木にする要素（'lxml-xpath'では使わない）
+
+    Returns:
+        BeautifulSoup、または同じ操作ができるlxmlの木（engineが'lxml-xpath'の場合）
+    """
+    if engine not in PARSER_ENGINES:
+        raise ValueError(f"HTMLの解析エンジン '{engine}' が見つかりません")
+    if engine == 'lxml-xpath':
+        from .lxml_tree import parse_lxml
+        return parse_lxml(html_content)
+    return BeautifulSoup(html_content, engine, parse_only=parse_only)
+
+def _child_tags(tag) -> list:
+    """子の要素（文字列とコメントを除く）"""
+    return [child for child in tag.children if child.name is not None]
+
+def _is_math_name(name: str) -> bool:
+    """<math>要素の名前か（m:mathのような接頭辞付きも含む）"""
+    return name.split(':')[-1] == 'math'
+
+class _StreamingSoup(BeautifulSoup):
+    """
+    少しずつ渡したHTMLを解析するBeautifulSoup（HTMLParser.iter_problemsで使う）
+    
+    作られた最も外側の問題のdivをproblem_divsに文書順に記録する。
+    """
+    
+    def start_feed(self):
+        """
+        ツリービルダーを準備し、(feed, close) を返す
+        
+        parseでBeautifulSoupが文書全体を渡すのと同じパーサーに、feedで少しずつ渡す。
+        """
+        self.problem_divs = []
+        self.reset()
+        self.builder.initialize_soup(self)
+        if self.builder.NAME == 'lxml':
+            parser = self.builder.parser_for(None)
+            started = []
+            
+            def feed(chunk: str):
+                # BeautifulSoupが文字列を渡すときと同じく先頭のBOMは除く
+                if not started:
+                    started.append(True)
+                    if chunk.startswith('\N{BYTE ORDER MARK}'):
+                        chunk = chunk[1:]
+                parser.feed(chunk)
+            
+            def finish():
+                # 空の文書でも一度はfeedしないとパーサーが準備されない（BeautifulSoupと同じ）
+                if not started:
+                    parser.feed('')
+                parser.close()
+        else:
+            from bs4.builder._htmlparser import BeautifulSoupHTMLParser
+            args, kwargs = self.builder.parser_args
+            parser = BeautifulSoupHTMLParser(self, *args, **kwargs)
+            feed = parser.feed
+            finish = parser.close
+        
+        def close():
+            finish()
+            # 閉じていない要素を閉じる（BeautifulSoupが解析の最後に行うのと同じ）
+            self.endData()
+            while self.currentTag is not None and self.currentTag.name != self.ROOT_TAG_NAME:
+                self.popTag()
+        
+        return feed, close
+    
+    def is_open(self, tag) -> bool:
+        """要素がまだ閉じていないか"""
+        return any(open_tag is tag for open_tag in self.tagStack)
+    
+    def handle_starttag(self, name, *args, **kwargs):
+        tag = super().handle_starttag(name, *args, **kwargs)
+        if (tag is not None and name == 'div' and 'problem' in (tag.get('class') or ())
+                and tag.find_parent('div', class_='problem') is None):
+            self.problem_divs.append(tag)
+        return tag
 
 class HTMLParser:
-    def __init__(self):
-        # LaTeX数式パターン
-        # $$...$$（ディスプレイ数式）
-        self.display_math_pattern = re.compile(r'\$\$(.+?)\$\$', re.DOTALL)
-        # $...$ または \(...\)（インライン数式）
-        self.inline_math_pattern = re.compile(r'(?<!\$)\$(?!\$)(.+?)(?<!\$)\$(?!\$)|\\\((.+?)\\\)', re.DOTALL)
-    
-    def parse(self, html_content: str) -> List[Dict[str, Any]]:
+    def __init__(self, engine: str = None, keep_raw_html: bool = None):
+        # 解析エンジン（省略時は設定の html_parser_engine）
+        self.engine = engine or STYLE_CONFIG.get('html_parser_engine', 'html.parser')
+        if self.engine not in PARSER_ENGINES:
+            raise ValueError(f"HTMLの解析エンジン '{self.engine}' が見つかりません")
+        # 問題のHTMLを残すか（省略時は設定の html_keep_raw_html）
+        if keep_raw_html is None:
+            keep_raw_html = STYLE_CONFIG.get('html_keep_raw_html', False)
+        self.keep_raw_html = keep_raw_html
+    
+    def parse(self, html_content: str) -> List[Problem]:
         """HTMLを解析して問題データを抽出"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = make_soup(html_content, self.engine, PROBLEM_STRAINER)
         problems = []
         
         # 問題ブロックを探す
@@ -24,52 +138,265 @@ class HTMLParser:
             problem_divs = self._split_by_headers(soup)
         
         for problem_div in problem_divs:
-            problem_data = {
-                'title': self._extract_title(problem_div),
-                'text': self._extract_text(problem_div),
-                'equations': self._extract_equations(problem_div),
-                'choices': self._extract_choices(problem_div),
-                'raw_html': str(problem_div)
-            }
-            problems.append(problem_data)
+            problems.append(self._extract_problem(problem_div))
         
         return problems
     
+    def iter_problems(self, source, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Problem]:
+        """
+        HTMLを少しずつ読みながら問題データを1問ずつ返す
+        
+        chunk_sizeずつ解析エンジンに渡し、最も外側の問題のdivが閉じるたびにその問題を返して
+        木から取り除く（それより前の要素も取り除く）。文書全体の木や問題のリストを作らないため、
+        大きな問題集でもparseよりずっと少ないメモリで済む。
+        BeautifulSoupのエンジンでは、parseと同じツリービルダーに少しずつ渡す。
+        'lxml-xpath'ではlxmlのプルパーサーを使う（libxml2は読み込んだバイト列を
+        解析の終わりまで持つため、その分は増える）。
+        div.problemのない文書はh2タグで分割するため、最後まで読んでから返す。
+        
+        Args:
+            source: HTMLファイルのパス、またはファイルオブジェクト（テキスト・バイナリ）
+            chunk_size: 1回に読む大きさ
+        
+        Yields:
+            Problem: parseと同じ問題データ
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                yield from self.iter_problems(f, chunk_size)
+            return
+        
+        if self.engine == 'lxml-xpath':
+            yield from self._iter_lxml_problems(source, chunk_size)
+        else:
+            yield from self._iter_soup_problems(source, chunk_size)
+    
+    def _iter_soup_problems(self, source, chunk_size: int) -> Iterator[Problem]:
+        """BeautifulSoupのエンジンで少しずつ解析する（iter_problemsを参照）"""
+        soup = _StreamingSoup('', self.engine, parse_only=PROBLEM_STRAINER)
+        feed, close = soup.start_feed()
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        found = False
+        while True:
+            chunk = source.read(chunk_size)
+            text = decoder.decode(chunk, final=not chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                feed(text)
+            if not chunk:
+                close()
+            
+            # 閉じた問題のdivを文書順に返す（開いている問題より後のものは待つ）
+            problem_divs = soup.problem_divs
+            while problem_divs and (not chunk or not soup.is_open(problem_divs[0])):
+                problem_div = problem_divs.pop(0)
+                found = True
+                # 入れ子の問題のdivはparseと同じく外側の問題の後に返す
+                for div in [problem_div] + problem_div.find_all('div', class_='problem'):
+                    yield self._extract_problem(div)
+                
+                # 返した問題と、それより前の要素（祖先の前のものも）を木から取り除く
+                node = problem_div
+                while node is not None and node is not soup:
+                    parent = node.parent
+                    for sibling in list(node.previous_siblings):
+                        sibling.extract()
+                    node = parent
+                problem_div.decompose()
+            
+            if not chunk:
+                break
+        
+        if not found:
+            # class指定がない場合、h2タグで区切る
+            for problem_div in self._split_by_headers(soup):
+                yield self._extract_problem(problem_div)
+    
+    def _iter_lxml_problems(self, source, chunk_size: int) -> Iterator[Problem]:
+        """lxmlのプルパーサーで少しずつ解析する（iter_problemsを参照）"""
+        from lxml import etree
+        from .lxml_tree import LxmlTag
+        
+        pull_parser = etree.HTMLPullParser(events=('end',), tag='div', encoding='utf-8')
+        found = False
+        root = None
+        while True:
+            chunk = source.read(chunk_size)
+            if chunk:
+                pull_parser.feed(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            else:
+                try:
+                    root = pull_parser.close()
+                except etree.XMLSyntaxError:
+                    # 空の文書
+                    root = None
+            
+            for _, element in pull_parser.read_events():
+                problem_div = LxmlTag(element)
+                if ('problem' not in (problem_div.get('class') or ())
+                        or problem_div.find_parent('div', class_='problem') is not None):
+                    continue
+                # 入れ子の問題のdivはparseと同じく外側の問題の後に返す
+                found = True
+                for div in [problem_div] + problem_div.find_all('div', class_='problem'):
+                    yield self._extract_problem(div)
+                
+                # 返した問題と、それより前の要素（祖先の前のものも）を木から取り除く
+                element.clear(keep_tail=True)
+                for node in [element] + list(element.iterancestors()):
+                    parent = node.getparent()
+                    while parent is not None and node.getprevious() is not None:
+                        del parent[0]
+            
+            if not chunk:
+                break
+        
+        if not found and root is not None:
+            # class指定がない場合、h2タグで区切る
+            for problem_div in self._split_by_headers(LxmlTag(root)):
+                yield self._extract_problem(problem_div)
+    
+    def _extract_problem(self, problem_div) -> Problem:
+        """問題のdivから問題データを抽出"""
+        # 書き出しに時間がかかり、以降の処理では使わないため、指定されたときだけ残す
+        raw_html = str(problem_div) if self.keep_raw_html else None
+        elements = self._scan_problem(problem_div)
+        # MathMLは以降の抽出でLaTeXの数式として扱えるよう置き換えておく
+        mathml = self._replace_mathml(elements['math'])
+        
+        return Problem(
+            title=self._extract_title(elements),
+            text=self._extract_text(elements),
+            equations=self._extract_equations(elements),
+            choices=self._extract_choices(elements),
+            mathml=mathml,
+            raw_html=raw_html,
+        )
+    
     def _split_by_headers(self, soup):
-        """h2タグで問題を分割"""
+        """h2タグで問題を分割（最初のh2より前の要素は見ない）"""
         problems = []
         current_problem = None
         
-        for element in soup.find_all(['h2', 'p', 'div', 'ol', 'ul']):
+        first_header = soup.find('h2')
+        if first_header is None:
+            return problems
+        
+        for element in [first_header] + first_header.find_all_next(SPLIT_TAGS):
             if element.name == 'h2':
                 if current_problem:
                     problems.append(current_problem)
-                current_problem = BeautifulSoup('<div class="problem"></div>', 'html.parser').div
-                current_problem.append(element)
-            elif current_problem is not None:
-                current_problem.append(element)
+                current_problem = soup.new_tag('div', attrs={'class': 'problem'})
+            current_problem.append(element)
         
         if current_problem:
             problems.append(current_problem)
         
         return problems
     
-    def _extract_title(self, problem_div) -> str:
-        """タイトルを抽出"""
-        title_elem = problem_div.find(['h1', 'h2', 'h3'], class_='problem-title')
-        if not title_elem:
-            title_elem = problem_div.find(['h1', 'h2', 'h3'])
+    def _scan_problem(self, problem_div) -> Dict[str, Any]:
+        """
+        問題の部分木を1回だけ走査し、抽出に使う要素を文書順に集める
+        
+        <math>要素の中は見ない（置き換えると文字列になるため）。
+        
+        Returns:
+            Dict[str, Any]: 'titles'（要素, problem-titleか）, 'paragraphs'（要素,
+                problem-textか）, 'math_divs', 'lists'（要素, choicesか, 中のli）,
+                'math'（<math>要素, div.mathの中か）
+        """
+        elements = {'titles': [], 'paragraphs': [], 'math_divs': [], 'lists': [], 'math': []}
+        
+        # 問題のdiv自身がdiv.mathか、その中にあるか（中の<math>は独立した数式）
+        in_math_div = self._is_math_div(problem_div) or \
+            problem_div.find_parent('div', class_='math') is not None
+        
+        # (要素, div.mathの中か, 囲んでいるリスト)
+        stack = [(child, in_math_div, ()) for child in reversed(_child_tags(problem_div))]
+        while stack:
+            tag, in_math_div, lists = stack.pop()
+            name = tag.name
+            if _is_math_name(name):
+                elements['math'].append((tag, in_math_div))
+                continue
+            
+            if name in TITLE_TAGS:
+                elements['titles'].append((tag, 'problem-title' in (tag.get('class') or ())))
+            elif name == 'p':
+                elements['paragraphs'].append((tag, 'problem-text' in (tag.get('class') or ())))
+            elif name == 'div':
+                if self._is_math_div(tag):
+                    elements['math_divs'].append(tag)
+                    in_math_div = True
+            elif name in LIST_TAGS:
+                entry = (tag, 'choices' in (tag.get('class') or ()), [])
+                elements['lists'].append(entry)
+                lists = lists + (entry,)
+            elif name == 'li':
+                # 入れ子のリストのliは外側のリストにも含まれる
+                for entry in lists:
+                    entry[2].append(tag)
+            
+            stack.extend((child, in_math_div, lists) for child in reversed(_child_tags(tag)))
+        
+        return elements
+    
+    @staticmethod
+    def _is_math_div(tag) -> bool:
+        return tag.name == 'div' and 'math' in (tag.get('class') or ())
+    
+    def _replace_mathml(self, math_elements) -> Dict[str, str]:
+        """
+        MathMLの<math>要素を区切り記号付きのLaTeXに置き換える
+        
+        独立した数式（div.math内）は$$...$$、それ以外は\\(...\\)にする。
+        
+        Args:
+            math_elements: (最も外側の<math>要素, div.mathの中か) の並び
+        
+        Returns:
+            Dict[str, str]: LaTeX -> 元のMathML（Word文書ではMathMLから直接数式を作る）
+        """
+        sources = {}
         
+        for math, display in math_elements:
+            markup = str(math)
+            try:
+                latex_str = ' '.join(mathml_to_latex(markup).split())
+            except ValueError as e:
+                # 変換できなければ従来どおり文字だけを残す
+                print(f"MathML変換エラー: {e}")
+                math.replace_with(math.get_text())
+                continue
+            
+            sources[latex_str] = markup
+            if display:
+                math.replace_with(f'$${latex_str}$$')
+            else:
+                math.replace_with(f'\\({latex_str}\\)')
+        
+        return sources
+    
+    @staticmethod
+    def _first(found: list):
+        """class指定のある最初の要素（なければ最初の要素）"""
+        for tag, classed, *_ in found:
+            if classed:
+                return tag
+        return found[0][0] if found else None
+    
+    def _extract_title(self, elements) -> str:
+        """タイトルを抽出"""
+        title_elem = self._first(elements['titles'])
         return title_elem.get_text(strip=True) if title_elem else ""
     
-    def _extract_text(self, problem_div) -> List[Dict[str, Any]]:
+    def _extract_text(self, elements) -> List[Token]:
         """問題文を抽出（テキストと数式を分離）"""
         text_elements = []
         
-        # 問題文パラグラフを探す
-        text_paras = problem_div.find_all('p', class_='problem-text')
+        # 問題文パラグラフ（problem-textがなければすべてのp）
+        text_paras = [para for para, classed in elements['paragraphs'] if classed]
         if not text_paras:
-            text_paras = problem_div.find_all('p')
+            text_paras = [para for para, _ in elements['paragraphs']]
         
         for para in text_paras:
             # パラグラフ内のテキストと数式を分離
@@ -81,63 +408,26 @@ class HTMLParser:
         
         return text_elements
     
-    def _split_text_and_math(self, text: str) -> List[Dict[str, Any]]:
-        """テキスト内の数式を分離"""
+    def _split_text_and_math(self, text: str) -> List[Token]:
+        """テキスト内の数式を分離（$$...$$, \\[...\\], $...$, \\(...\\)）"""
         parts = []
-        last_end = 0
-        
-        # まずディスプレイ数式を処理（$$...$$）
-        display_matches = list(self.display_math_pattern.finditer(text))
-        
-        # 次にインライン数式を処理（$...$ または \(...\)）
-        inline_matches = list(self.inline_math_pattern.finditer(text))
-        
-        # すべてのマッチを位置順にソート
-        all_matches = sorted(
-            display_matches + inline_matches,
-            key=lambda m: m.start()
-        )
         
-        for match in all_matches:
-            # 数式の前のテキスト
-            if match.start() > last_end:
-                plain_text = text[last_end:match.start()].strip()
-                if plain_text:
-                    parts.append({'type': 'text', 'content': plain_text})
-            
-            # 数式部分
-            # ディスプレイ数式の場合
-            if match in display_matches:
-                latex_str = match.group(1).strip()
-            # インライン数式の場合
-            else:
-                latex_str = (match.group(1) or match.group(2)).strip()
-            
-            if latex_str:
-                parts.append({'type': 'math', 'content': latex_str})
-            
-            last_end = match.end()
-        
-        # 残りのテキスト
-        if last_end < len(text):
-            plain_text = text[last_end:].strip()
-            if plain_text:
-                parts.append({'type': 'text', 'content': plain_text})
+        for kind, content in split_math(text):
+            content = content.strip()
+            if content:
+                parts.append(('text' if kind == 'text' else 'math', content))
         
         # 数式が見つからなかった場合は全体をテキストとして返す
         if not parts and text.strip():
-            parts.append({'type': 'text', 'content': text.strip()})
+            parts.append(('text', text.strip()))
         
         return parts
     
-    def _extract_equations(self, problem_div) -> List[str]:
-        """独立した数式ブロックを抽出"""
+    def _extract_equations(self, elements) -> List[str]:
+        """独立した数式ブロック（div.math）を抽出"""
         equations = []
         
-        # mathクラスのdivを探す
-        math_divs = problem_div.find_all('div', class_='math')
-        
-        for math_div in math_divs:
+        for math_div in elements['math_divs']:
             content = math_div.get_text(strip=True)
             # $$...$$を除去
             content = re.sub(r'^\$\$|\$\$$', '', content).strip()
@@ -146,18 +436,15 @@ class HTMLParser:
         
         return equations
     
-    def _extract_choices(self, problem_div) -> List[str]:
-        """選択肢を抽出"""
+    def _extract_choices(self, elements) -> List[str]:
+        """選択肢を抽出（choicesのol/ul、なければ最初のol/ul）"""
         choices = []
         
-        # olまたはulタグを探す
-        choice_list = problem_div.find(['ol', 'ul'], class_='choices')
-        if not choice_list:
-            choice_list = problem_div.find(['ol', 'ul'])
-        
-        if choice_list:
-            for li in choice_list.find_all('li'):
-                choice_text = li.get_text(strip=True)
-                choices.append(choice_text)
+        lists = elements['lists']
+        items = next((items for _, classed, items in lists if classed),
+                     lists[0][2] if lists else [])
+        for li in items:
+            choice_text = li.get_text(strip=True)
+            choices.append(choice_text)
         
         return choices
@@ -0,0 +1,297 @@
+"""数式の隔離レンダリングモジュール
+
+数式を監視付きのサブプロセス（ワーカー）で描画する。
+入れ子の深い\\fracや巨大な\\left(…\\right)のように描画が終わらない・
+メモリを使い果たす数式があっても、変換全体やGUIが止まらないよう、
+数式ごとに実時間の制限と常駐メモリ（RSS）の上限を設ける。
+制限を超えたワーカーは強制終了して作り直し、その数式は失敗として記録する
+（MathConverterがエラー画像に置き換える）。
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from typing import List, Optional
+
+# 既定の制限（1数式あたりの秒数、ワーカーのRSSのバイト数）
+DEFAULT_RENDER_TIMEOUT = 10.0
+DEFAULT_RENDER_MAX_RSS = 1024 * 1024 * 1024
+
+# ワーカー起動（matplotlibとフォントの読み込み）を待つ秒数
+STARTUP_TIMEOUT = 120.0
+
+# 応答待ちの間に時間とメモリを確認する間隔（秒）
+POLL_INTERVAL = 0.02
+
+# フォント読み込みを済ませるための数式
+_WARMUP_FORMULA = r'\frac{a}{b}'
+
+# 制限超過の理由
+REASON_TIMEOUT = 'timeout'
+REASON_MEMORY = 'memory'
+REASON_CRASH = 'crash'
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def process_rss(pid: int) -> Optional[int]:
+    """プロセスの常駐メモリ（バイト、測れない環境ではNone）"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class RenderAborted(RuntimeError):
+    """制限超過などでワーカーを終了し、描画を打ち切った"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+def _worker_main(conn, engine: str, config: Optional[dict]):
+    """ワーカーの処理（描画の依頼を受けて結果を返す）"""
+    from .render_backends import create_renderer
+
+    renderer = create_renderer(engine, config)
+    try:
+        renderer.render_png(_WARMUP_FORMULA, 12, 'black', 100)
+    except Exception:
+        pass
+    conn.send(('ready', None))
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        method, args = request
+        try:
+            conn.send(('ok', getattr(renderer, method)(*args)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+class _Worker:
+    """1つのワーカープロセスと通信路"""
+
+    def __init__(self, context, engine: str, config: Optional[dict]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, engine, config), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def call(self, method: str, args: tuple, timeout: float, max_rss: Optional[int]):
+        """
+        ワーカーで描画し、結果を返す
+
+        Raises:
+            RenderAborted: 時間・メモリの制限を超えた、またはワーカーが異常終了した場合
+            RuntimeError: 描画自体のエラー（ワーカーは引き続き使える）
+        """
+        if not self.ready:
+            self._wait(STARTUP_TIMEOUT, None)
+            self.ready = True
+        try:
+            self.conn.send((method, args))
+        except (OSError, ValueError):
+            raise RenderAborted(REASON_CRASH, "描画ワーカーが異常終了しました")
+        status, value = self._wait(timeout, max_rss)
+        if status == 'error':
+            raise RuntimeError(value)
+        return value
+
+    def _wait(self, timeout: float, max_rss: Optional[int]):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self.conn.poll(POLL_INTERVAL):
+                    return self.conn.recv()
+            except (EOFError, OSError):
+                raise RenderAborted(REASON_CRASH, "描画ワーカーが異常終了しました")
+            if not self.process.is_alive():
+                raise RenderAborted(REASON_CRASH, "描画ワーカーが異常終了しました")
+            if max_rss:
+                rss = process_rss(self.process.pid)
+                if rss is not None and rss > max_rss:
+                    raise RenderAborted(
+                        REASON_MEMORY,
+                        f"描画のメモリが上限を超えました（{rss // (1024 * 1024)}MB）"
+                    )
+            if time.monotonic() > deadline:
+                raise RenderAborted(REASON_TIMEOUT,
+                                    f"描画が制限時間（{timeout:g}秒）を超えました")
+
+    def kill(self):
+        """ワーカーを強制終了"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        """ワーカーに終了を伝える（応答がなければ強制終了）"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1.0)
+        self.kill()
+
+class IsolatedRenderer:
+    """描画エンジンをワーカープロセスで動かすレンダラー
+
+    MathConverterのレンダラーと同じメソッドを持つ。制限を超えた数式では
+    RenderAbortedを送出するので、呼び出し側の通常のエラー処理でエラー画像になる。
+    """
+
+    def __init__(self, engine: str = 'trim', workers: int = 1,
+                 timeout: float = DEFAULT_RENDER_TIMEOUT,
+                 max_rss: Optional[int] = DEFAULT_RENDER_MAX_RSS, config: dict = None):
+        """
+        Args:
+            engine: ワーカーで使う描画エンジン（render_backendsのバックエンド名か'auto'）
+            workers: 同時に描画するワーカー数
+            timeout: 1数式あたりの制限時間（秒）
+            max_rss: ワーカーの常駐メモリの上限（バイト、Noneで無制限。
+                psutilがなくLinux以外の環境では確認できない）
+            config: 'auto'の選択に関わる設定（render_backends.create_rendererを参照）
+        """
+        self.engine = engine
+        self.config = config
+        self.timeout = timeout
+        self.max_rss = max_rss
+        # matplotlibの状態やロックを引き継がないようspawnで起動する
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = [None] * max(1, workers)
+        self._available = threading.Semaphore(len(self._idle))
+        self._lock = threading.Lock()
+        self._stats = {'rendered': 0, 'errors': 0, REASON_TIMEOUT: 0, REASON_MEMORY: 0,
+                       REASON_CRASH: 0, 'restarts': 0}
+        self._failures = []
+
+    def _call(self, method: str, args: tuple, timeout: float, latex_str: str = None):
+        """空いているワーカーで描画（制限超過ならワーカーを作り直して記録）"""
+        with self._available:
+            with self._lock:
+                worker = self._idle.pop()
+            if worker is not None and not worker.process.is_alive():
+                # 待機中に終了したワーカー（OOMキラーや外部からのkillなど）は作り直す
+                worker.kill()
+                worker = None
+                with self._lock:
+                    self._stats['restarts'] += 1
+                    self._stats[REASON_CRASH] += 1
+            try:
+                if worker is None:
+                    worker = _Worker(self._context, self.engine, self.config)
+                result = worker.call(method, args, timeout, self.max_rss)
+            except RenderAborted as e:
+                worker.kill()
+                worker = None
+                with self._lock:
+                    self._stats['restarts'] += 1
+                    if latex_str is not None:
+                        self._stats[e.reason] += 1
+                        self._failures.append({'latex': latex_str, 'reason': e.reason})
+                raise
+            except RuntimeError:
+                with self._lock:
+                    self._stats['errors'] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._idle.append(worker)
+
+        with self._lock:
+            self._stats['rendered'] += 1
+        return result
+
+    def render_png(self, latex_str: str, font_size: float, color: str, dpi: float,
+                   target=None, encoding: str = 'rgba') -> bytes:
+        """数式をPNGに描画（ワーカーで実行）"""
+        return self._call('render_png', (latex_str, font_size, color, dpi, target, encoding),
+                          self.timeout, latex_str)
+
+    def render_many_png(self, latex_list: List[str], font_size: float, color: str,
+                        dpi: float, target=None,
+                        encoding: str = 'rgba') -> List[Optional[bytes]]:
+        """
+        複数の数式をまとめて描画（失敗した数式はNone）
+
+        まとめて1数式分の制限時間で描画し、制限を超えたら原因の数式を
+        特定するため1つずつ描画し直す。
+        """
+        if not latex_list:
+            return []
+        try:
+            return self._call('render_many_png',
+                              (latex_list, font_size, color, dpi, target, encoding),
+                              self.timeout)
+        except RenderAborted:
+            pass
+
+        results = []
+        for latex_str in latex_list:
+            try:
+                results.append(self.render_png(latex_str, font_size, color, dpi,
+                                               target, encoding))
+            except Exception:
+                results.append(None)
+        return results
+
+    def render_svg(self, latex_str: str, font_size: float, color: str) -> bytes:
+        """数式をSVGに描画（ワーカーで実行）"""
+        return self._call('render_svg', (latex_str, font_size, color), self.timeout,
+                          latex_str)
+
+    def render_error_png(self, dpi: float) -> bytes:
+        """エラー時の代替画像"""
+        return self._call('render_error_png', (dpi,), self.timeout)
+
+    def stats(self) -> dict:
+        """描画数・制限超過の件数（理由ごと）・作り直し回数・失敗した数式"""
+        with self._lock:
+            return dict(self._stats, failures=list(self._failures))
+
+    def close(self):
+        """ワーカーを終了"""
+        with self._lock:
+            workers, self._idle = self._idle, [None] * len(self._idle)
+        for worker in workers:
+            if worker is not None:
+                worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# プロセス内で共有するレンダラー（設定ごと）
+_shared_renderers = {}
+_shared_lock = threading.Lock()
+
+def get_shared_isolated_renderer(engine: str, workers: int, timeout: float,
+                                 max_rss: Optional[int],
+                                 config: dict = None) -> IsolatedRenderer:
+    """同じ設定で共有する隔離レンダラーを取得（ワーカーは文書をまたいで再利用）"""
+    key = (engine, workers, timeout, max_rss,
+           json.dumps(config, sort_keys=True, default=str))
+    with _shared_lock:
+        renderer = _shared_renderers.get(key)
+        if renderer is None:
+            renderer = IsolatedRenderer(engine, workers, timeout, max_rss, config)
+            _shared_renderers[key] = renderer
+        return renderer
@@ -0,0 +1,94 @@
+"""LaTeX正規化モジュール
+
+描画結果が同じになる表記ゆれ（空白、添字の波括弧、区切り記号、
+同義のコマンド）を吸収し、キャッシュや重複排除に使う安定したキーを作る。
+"""
+import re
+from typing import List
+
+# トークン: 制御語、制御記号、空白、その他1文字
+_TOKEN_PATTERN = re.compile(r'\\[A-Za-z]+|\\.|\s+|.', re.DOTALL)
+
+# 数式全体を囲む区切り記号
+_DELIMITERS = (
+    ('$$', '$$'),
+    ('\\[', '\\]'),
+    ('\\(', '\\)'),
+    ('$', '$'),
+)
+
+# 同じ記号を表すコマンド（左を右に統一）
+# \text{}はmathtextが完全には対応していないため\mathrm{}に変換する
+COMMAND_ALIASES = {
+    '\\text': '\\mathrm',
+    '\\le': '\\leq',
+    '\\ge': '\\geq',
+    '\\ne': '\\neq',
+    '\\lbrace': '\\{',
+    '\\rbrace': '\\}',
+    '\\lbrack': '[',
+    '\\rbrack': ']',
+}
+
+def tokenize_latex(latex_str: str) -> List[str]:
+    """LaTeX文字列をトークンに分割"""
+    return _TOKEN_PATTERN.findall(latex_str)
+
+def strip_delimiters(latex_str: str) -> str:
+    """前後の空白と数式の区切り記号を1組だけ取り除く"""
+    latex_str = latex_str.strip()
+    for opening, closing in _DELIMITERS:
+        if (len(latex_str) >= len(opening) + len(closing)
+                and latex_str.startswith(opening)
+                and latex_str.endswith(closing)
+                and not latex_str.endswith('\\' + closing)):
+            return latex_str[len(opening):-len(closing)].strip()
+    return latex_str
+
+def _is_control_word(token: str) -> bool:
+    return len(token) > 1 and token[0] == '\\' and token[1].isalpha()
+
+def _unwrap_script_groups(tokens: List[str]) -> List[str]:
+    """^{x} / _{x} のように1トークンだけを囲む波括弧を外す"""
+    result = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if (token in ('^', '_')
+                and i + 3 < len(tokens)
+                and tokens[i + 1] == '{'
+                and tokens[i + 3] == '}'
+                and tokens[i + 2] not in ('{', '}', '^', '_')):
+            result.append(token)
+            result.append(tokens[i + 2])
+            i += 4
+            continue
+        result.append(token)
+        i += 1
+    return result
+
+def canonicalize_latex(latex_str: str) -> str:
+    """描画結果が同じ数式に同じ文字列を返す
+
+    mathtextは数式中の空白を無視するため、空白は制御語の区切りに
+    必要な場合を除いてすべて取り除く。
+    """
+    body = strip_delimiters(latex_str)
+
+    tokens = []
+    for token in tokenize_latex(body):
+        if token.isspace():
+            continue
+        tokens.append(COMMAND_ALIASES.get(token, token))
+
+    tokens = _unwrap_script_groups(tokens)
+
+    # 制御語の直後に英字が続く場合だけ空白で区切る
+    parts = []
+    for i, token in enumerate(tokens):
+        parts.append(token)
+        if (_is_control_word(token) and i + 1 < len(tokens)
+                and tokens[i + 1][0].isalpha()):
+            parts.append(' ')
+
+    return ''.join(parts)
@@ -0,0 +1,246 @@
+"""lxmlによるHTMLの木（BeautifulSoup互換の最小限の操作）
+
+HTMLParserとHTMLValidatorが使うBeautifulSoupの操作（find, find_all, find_all_next,
+find_parent, children, get_text, replace_with, append, new_tag, get, str）だけを、lxml.htmlの要素と
+コンパイル済みのXPathで実装する。結果はBeautifulSoupの結果と同じになるようにする:
+
+- get_textは文字列ごと（要素のtextとtail）に扱い、script, style, rt などの中身は含めない
+- 空白だけの文字列は改行1つ（改行を含まなければ空白1つ）にする（pre, textareaの中を除く）
+- 要素を置き換えた文字列や、移動した要素の後ろの文字列は、前後の文字列とつなげない
+- strはBeautifulSoupと同じ書式（属性は名前順、空要素は<br/>、最小限のエスケープ）
+
+値のない属性（<input disabled>）は、lxmlが属性名を値にするため disabled="disabled" になる。
+"""
+import re
+from typing import Callable, Iterator, List, Optional, Union
+
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+from bs4.formatter import HTMLFormatter
+from lxml import etree
+
+# BeautifulSoupの書式（'minimal'）と、空要素・複数の値を持つ属性・get_textで除く要素の一覧
+_FORMATTER = HTMLFormatter.REGISTRY['minimal']
+_EMPTY_ELEMENT_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+_LIST_ATTRIBUTES = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+_HIDDEN_TEXT_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+_PRESERVE_WHITESPACE_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+
+# BeautifulSoupが1文字にまとめる空白
+_ASCII_SPACES = frozenset('\x20\x0a\x09\x0c\x0d')
+
+# 置き換えた文字列を入れる要素（検索の対象にならず、文字列として扱う）
+TEXT_TAG = 'mathconverter-text'
+
+_NON_WHITESPACE = re.compile(r'\S+')
+
+Name = Union[str, List[str], Callable[['LxmlTag'], bool]]
+
+_queries = {}
+
+def _query(names: Union[str, List[str]], class_: Optional[str], first: bool,
+           axis: str = 'descendant::*') -> etree.XPath:
+    """要素名（とclass）で探すXPath（コンパイル済みのものを使い回す）"""
+    if isinstance(names, str):
+        names = [names]
+    key = (tuple(names), class_, first, axis)
+    query = _queries.get(key)
+    if query is None:
+        path = f'({axis})[' + ' or '.join(f'self::{name}' for name in names) + ']'
+        if class_ is not None:
+            path += f"[contains(concat(' ', normalize-space(@class), ' '), ' {class_} ')]"
+        if first:
+            path = f'({path})[1]'
+        query = _queries[key] = etree.XPath(path)
+    return query
+
+def _is_tag(element) -> bool:
+    """文字列やコメントでない要素か"""
+    return isinstance(element.tag, str) and element.tag != TEXT_TAG
+
+def _collapse(text: str, preserve: bool) -> str:
+    """空白だけの文字列をBeautifulSoupと同じく1文字にまとめる"""
+    if preserve or not _ASCII_SPACES.issuperset(text):
+        return text
+    return '\n' if '\n' in text else ' '
+
+def _escape(text: str) -> str:
+    """BeautifulSoupの'minimal'と同じエスケープ（&, <, >）"""
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+# 要素がpre, textareaの中にあるか
+_preserves_whitespace = etree.XPath(
+    'boolean(' + ' or '.join(f'ancestor-or-self::{tag}'
+                             for tag in sorted(_PRESERVE_WHITESPACE_TAGS)) + ')')
+
+class LxmlTag:
+    """lxmlの要素をBeautifulSoupのTagのように扱う"""
+
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LxmlTag) and other.element is self.element
+
+    def __hash__(self) -> int:
+        return id(self.element)
+
+    @property
+    def name(self) -> str:
+        return self.element.tag
+
+    def get(self, key: str, default=None):
+        """属性の値（classなどは値のリスト）"""
+        value = self.element.get(key)
+        if value is None:
+            return default
+        if key in _LIST_ATTRIBUTES['*'] or key in _LIST_ATTRIBUTES.get(self.name, ()):
+            return _NON_WHITESPACE.findall(value)
+        return value
+
+    def find_all(self, name: Name, class_: str = None) -> List['LxmlTag']:
+        """子孫の要素を文書順に探す（nameは要素名、そのリスト、または判定関数）"""
+        if callable(name):
+            return [tag for tag in map(LxmlTag, self.element.iterdescendants())
+                    if _is_tag(tag.element) and name(tag)]
+        return [LxmlTag(element) for element in _query(name, class_, False)(self.element)]
+
+    def find_all_next(self, name: Union[str, List[str]]) -> List['LxmlTag']:
+        """文書中でこの要素より後（子孫を含む）にある要素を文書順に探す"""
+        query = _query(name, None, False, 'descendant::* | following::*')
+        return [LxmlTag(element) for element in query(self.element)]
+
+    @property
+    def children(self) -> Iterator['LxmlTag']:
+        """子の要素（文字列とコメントは含めない）"""
+        return (LxmlTag(element) for element in self.element if _is_tag(element))
+
+    def find(self, name: Name, class_: str = None) -> Optional['LxmlTag']:
+        """最初に見つかった子孫の要素"""
+        if callable(name):
+            found = self.find_all(name)
+        else:
+            found = _query(name, class_, True)(self.element)
+        return LxmlTag(found[0]) if found else None
+
+    def find_parent(self, name: Name, class_: str = None) -> Optional['LxmlTag']:
+        """条件に合う最も近い祖先の要素"""
+        for element in self.element.iterancestors():
+            tag = LxmlTag(element)
+            if callable(name):
+                if name(tag):
+                    return tag
+            elif element.tag == name and (class_ is None or class_ in (tag.get('class') or [])):
+                return tag
+        return None
+
+    def get_text(self, strip: bool = False) -> str:
+        """子孫の文字列をつなげる（stripなら文字列ごとに前後の空白を除き、空のものは除く）"""
+        strings = _strings(self.element, _preserves_whitespace(self.element))
+        if strip:
+            return ''.join(text for text in (text.strip() for text in strings) if text)
+        return ''.join(strings)
+
+    def replace_with(self, text: str):
+        """要素を文字列に置き換える"""
+        placeholder = etree.Element(TEXT_TAG)
+        placeholder.text = text
+        placeholder.tail = self.element.tail
+        self.element.tail = None
+        self.element.getparent().replace(self.element, placeholder)
+
+    def append(self, tag: 'LxmlTag'):
+        """要素を末尾に移動する（後ろの文字列は元の場所に残す）"""
+        element = tag.element
+        parent = element.getparent()
+        if element.tail and parent is not None:
+            placeholder = etree.Element(TEXT_TAG)
+            placeholder.tail = element.tail
+            element.addnext(placeholder)
+        element.tail = None
+        self.element.append(element)
+
+    def new_tag(self, name: str, attrs: dict = None) -> 'LxmlTag':
+        """どこにも属さない新しい要素"""
+        return LxmlTag(etree.Element(name, attrs or {}))
+
+    def __str__(self) -> str:
+        pieces = []
+        _serialize(self.element, pieces, _preserves_whitespace(self.element))
+        return ''.join(pieces)
+
+def _strings(element, preserve: bool) -> Iterator[str]:
+    """get_textの対象になる子孫の文字列（要素自身のtailは含めない）"""
+    if element.tag == TEXT_TAG:
+        if element.text:
+            yield element.text
+        return
+    if not isinstance(element.tag, str) or element.tag in _HIDDEN_TEXT_TAGS:
+        return
+    preserve = preserve or element.tag in _PRESERVE_WHITESPACE_TAGS
+    if element.text:
+        yield _collapse(element.text, preserve)
+    for child in element:
+        yield from _strings(child, preserve)
+        if child.tail:
+            yield _collapse(child.tail, preserve)
+
+def _serialize(element, pieces: list, preserve: bool):
+    """BeautifulSoupのstr(tag)と同じ書式で書き出す（要素自身のtailは含めない）"""
+    tag = element.tag
+    if tag == TEXT_TAG:
+        if element.text:
+            pieces.append(_escape(element.text))
+        return
+    if tag is etree.Comment:
+        pieces.append(f'<!--{element.text or ""}-->')
+        return
+    if tag is etree.ProcessingInstruction:
+        pieces.append(f'<?{element.target} {element.text or ""}>')
+        return
+    if not isinstance(tag, str):
+        return
+
+    attributes = []
+    wrapped = LxmlTag(element)
+    for key in sorted(element.keys()):
+        value = wrapped.get(key)
+        if isinstance(value, list):
+            value = ' '.join(value)
+        value = EntitySubstitution.quoted_attribute_value(_escape(value or ''))
+        attributes.append(f' {key}={value}')
+    empty = not element.text and len(element) == 0
+    if empty and tag in _EMPTY_ELEMENT_TAGS:
+        pieces.append(f'<{tag}{"".join(attributes)}/>')
+        return
+
+    pieces.append(f'<{tag}{"".join(attributes)}>')
+    preserve = preserve or tag in _PRESERVE_WHITESPACE_TAGS
+    literal = tag in _FORMATTER.cdata_containing_tags
+    text = element.text
+    if text:
+        text = _collapse(text, preserve)
+        pieces.append(text if literal else _escape(text))
+    for child in element:
+        _serialize(child, pieces, preserve)
+        text = child.tail
+        if text:
+            text = _collapse(text, preserve)
+            pieces.append(text if literal else _escape(text))
+    pieces.append(f'</{tag}>')
+
+def parse_lxml(html_content: str) -> LxmlTag:
+    """HTMLを解析して文書全体（html要素）を返す"""
+    root = etree.HTML(html_content.encode('utf-8'), etree.HTMLParser(encoding='utf-8'))
+    if root is None:
+        # 空の文書
+        root = etree.Element('html')
+    return LxmlTag(root)
@@ -0,0 +1,114 @@
+"""数式画像キャッシュモジュール"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+# 既定のキャッシュ上限（バイト）
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+class MathImageCache:
+    """レンダリング済み数式画像（PNGバイト列）のLRUキャッシュ
+
+    上限はエントリ数ではなく合計バイト数で管理し、
+    超過した場合は最も古く参照されたものから破棄する。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        # 統計情報
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """キャッシュから取得（なければNone）"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Hashable, data: bytes):
+        """キャッシュに登録"""
+        size = len(data)
+        if size > self.max_bytes:
+            # 1件で上限を超えるものは保持しない
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+
+            self._entries[key] = data
+            self._size += size
+            self._evict()
+
+    def resize(self, max_bytes: int):
+        """上限を変更（超えた分は古い順に破棄）"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self):
+        """上限を超えた分を古い順に破棄（ロックを取得して呼ぶ）"""
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        """すべてのエントリと統計を破棄"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """統計情報を取得"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+# プロセス内で共有するキャッシュ
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_shared_cache(max_bytes: int = DEFAULT_CACHE_BYTES) -> MathImageCache:
+    """プロセス共有のキャッシュを取得
+
+    キーに描画パラメータが含まれるため、設定の異なる
+    MathConverter同士で共有しても結果が混ざることはない。
+    上限が前回と異なれば、既存のキャッシュの上限を変更する（超えた分は破棄）。
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = MathImageCache(max_bytes)
+        elif _shared_cache.max_bytes != max_bytes:
+            _shared_cache.resize(max_bytes)
+        return _shared_cache
@@ -1,127 +1,341 @@
 """数式画像変換モジュール（完全修正版）"""
 import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from matplotlib import mathtext
 from PIL import Image
 import io
-from typing import BinaryIO
-import re
+from typing import BinaryIO, List, Optional
+
+from .math_cache import MathImageCache, get_shared_cache, DEFAULT_CACHE_BYTES
+from .render_store import get_store, make_store_key, DEFAULT_STORE_BYTES
+from .style_config import style_fingerprint
+from .latex_normalizer import canonicalize_latex
+from .render_bundle import load_bundle
+from .figure_renderer import FigureRenderer
+from .png_encoder import PNG_ENCODINGS
+from .render_backends import AUTO_ENGINE, backend_names, create_renderer
+from .isolated_renderer import (
+    DEFAULT_RENDER_MAX_RSS, DEFAULT_RENDER_TIMEOUT, get_shared_isolated_renderer
+)
+
+# 描画・PNGエンコードの出力形式の版（トリミング・文字・パレットなど、同じ数式の画像が
+# 変わる変更をしたら上げる。永続ストアとバンドルの古い画像を使わないようにする）
+RENDER_FORMAT_VERSION = 1
+
+# 永続ストアのキーとバンドルの互換性に使う描画系のバージョン
+RENDERER_VERSION = f'{matplotlib.__version__}+format{RENDER_FORMAT_VERSION}'
+
+# 'auto'の選択に関わる設定キー（隔離描画のワーカーにも渡す）
+BACKEND_CONFIG_KEYS = ('math_auto_engines', 'math_backend_costs')
+
+# 数式を置く場所ごとの文書上の大きさ: 文脈名 -> (合わせる軸, 設定キー, 既定値, 1単位のインチ数)
+MATH_CONTEXTS = {
+    'inline': ('height', 'inline_math_height', 14, 1 / 72),
+    'choice': ('height', 'choice_math_height', None, 1 / 72),
+    'display': ('width', 'display_math_width', 2.5, 1),
+}
+
+def preload_bundle(config: dict):
+    """起動時にバンドルを読み込んでおく（以降のMathConverterで共有される）"""
+    return load_bundle(
+        config.get('math_bundle_path'), style_fingerprint(config), RENDERER_VERSION
+    )
 
 class MathConverter:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, cache: MathImageCache = None,
+                 renderer: FigureRenderer = None):
         self.dpi = config['math_dpi']
         self.font_size = config['math_font_size']
         self.color = config['math_color']
+        # SVGモードではPNGはSVGに対応しないアプリ向けの代替画像のため、
+        # 文書が大きくならないよう代替画像用の解像度とエンコード方式で描画する
+        svg_fallback = config.get('math_format', 'png') == 'svg'
+        # 文書上の実効解像度（Noneなら文脈によらずmath_dpiで描画）
+        self.target_ppi = config.get('math_target_ppi')
+        if svg_fallback:
+            self.target_ppi = config.get('math_svg_fallback_ppi') or self.target_ppi
+        self.targets = self._context_targets(config)
+        self.engine = config.get('math_engine', 'trim')
+        if self.engine != AUTO_ENGINE and self.engine not in backend_names():
+            raise ValueError(f"描画エンジン '{self.engine}' が見つかりません")
+        # PNGのエンコード方式（単色でない画像は常にRGBA）
+        self.png_encoding = config.get('math_png_encoding', 'rgba')
+        if svg_fallback:
+            self.png_encoding = config.get('math_svg_fallback_encoding') or self.png_encoding
+        if self.png_encoding not in PNG_ENCODINGS:
+            raise ValueError(f"PNGのエンコード方式 '{self.png_encoding}' が見つかりません")
+        
+        # 画像キャッシュ（上限0で無効）
+        if cache is None:
+            max_bytes = config.get('math_cache_max_bytes', DEFAULT_CACHE_BYTES)
+            cache = get_shared_cache(max_bytes) if max_bytes else None
+        self.cache = cache
+        
+        # 永続ストア（開けない場合は無効化して続行）
+        self.fingerprint = style_fingerprint(config)
+        self.store = None
+        store_path = config.get('math_store_path')
+        if store_path:
+            try:
+                self.store = get_store(
+                    store_path,
+                    config.get('math_store_max_bytes', DEFAULT_STORE_BYTES)
+                )
+            except Exception as e:
+                print(f"数式ストアを開けません: {store_path}")
+                print(f"エラー内容: {str(e)}")
+        
+        # 事前レンダリング済みバンドル（読み取り専用）
+        self.bundle = load_bundle(
+            config.get('math_bundle_path'), self.fingerprint, RENDERER_VERSION
+        )
         
-        # matplotlibの設定
-        plt.rcParams['mathtext.fontset'] = 'cm'
-        plt.rcParams['mathtext.default'] = 'regular'
+        # レンダラー（pyplotのグローバル状態を使わないためスレッドセーフ）
+        # math_isolation が有効ならワーカープロセスで制限付きで描画する
+        self.isolated = renderer is None and bool(config.get('math_isolation', False))
+        backend_config = {key: config.get(key) for key in BACKEND_CONFIG_KEYS}
+        if renderer is None and self.isolated:
+            renderer = get_shared_isolated_renderer(
+                self.engine,
+                config.get('math_isolation_workers') or 1,
+                config.get('math_render_timeout') or DEFAULT_RENDER_TIMEOUT,
+                config.get('math_render_max_rss', DEFAULT_RENDER_MAX_RSS),
+                backend_config
+            )
+        # 描画エンジンはバックエンドとして登録されたもの（render_backendsを参照）
+        self.renderer = renderer or create_renderer(self.engine, backend_config)
+    
+    def _context_targets(self, config: dict) -> dict:
+        """文脈ごとの目標の大きさ（軸, ピクセル数）"""
+        if not self.target_ppi:
+            return {}
+        
+        targets = {}
+        for context, (axis, key, default, inches) in MATH_CONTEXTS.items():
+            size = config.get(key) or default
+            if size is None:
+                # 選択肢の数式は指定がなければインライン数式と同じ大きさ
+                size = config.get('inline_math_height', 14)
+            targets[context] = (axis, size * inches * self.target_ppi)
+        return targets
     
-    def latex_to_image(self, latex_str: str) -> BinaryIO:
-        """LaTeX数式を画像化"""
+    def _target(self, context: str = None):
+        """文脈の目標の大きさ（文脈なし・未設定ならNone）"""
+        if context is None:
+            return None
+        if context not in MATH_CONTEXTS:
+            raise ValueError(f"数式の文脈 '{context}' が見つかりません")
+        return self.targets.get(context)
+    
+    def latex_to_image(self, latex_str: str, context: str = None) -> BinaryIO:
+        """
+        LaTeX数式を画像化
+        
+        Args:
+            latex_str (str): LaTeX数式
+            context (str, optional): 数式を置く場所（'inline', 'choice', 'display'）。
+                指定すると文書上の大きさに見合った解像度で描画する
+        """
         try:
             # 前処理
             latex_str = self._preprocess_latex(latex_str)
             
-            # 図を作成
-            fig = plt.figure(figsize=(10, 2))
-            fig.patch.set_alpha(0)
+            data = self.lookup(latex_str, context)
+            if data is None:
+                data = self._render_png(latex_str, context)
+                self.add_rendered(latex_str, data, context)
             
-            # 数式をレンダリング
-            ax = fig.add_subplot(111)
-            ax.axis('off')
+            return io.BytesIO(data)
             
-            # テキストを描画
-            text = ax.text(
-                0.5, 0.5,
-                f'${latex_str}$',
-                fontsize=self.font_size,
-                color=self.color,
-                ha='center',
-                va='center',
-                transform=ax.transAxes
+        except Exception as e:
+            print(f"数式変換エラー: {latex_str[:50]}...")
+            print(f"エラー内容: {str(e)}")
+            return self._create_error_image(latex_str)
+    
+    def render_many(self, latex_list: List[str], context: str = None) -> List[BinaryIO]:
+        """
+        複数のLaTeX数式をまとめて画像化
+
+        キャッシュなどにない数式は1枚のキャンバスにまとめて描画する。
+        変換できない数式はエラー画像になり、他の数式には影響しない。
+
+        Args:
+            latex_list (List[str]): LaTeX数式のリスト
+            context (str, optional): 数式を置く場所（latex_to_imageを参照）
+
+        Returns:
+            List[BinaryIO]: 入力順のPNG画像
+        """
+        canonicals = [self._preprocess_latex(latex_str) for latex_str in latex_list]
+
+        images = {}
+        for latex_str in canonicals:
+            if latex_str not in images:
+                images[latex_str] = self.lookup(latex_str, context)
+
+        missing = [latex_str for latex_str, data in images.items() if data is None]
+        for latex_str, data in zip(missing, self._render_many_png(missing, context)):
+            if data is None:
+                print(f"数式変換エラー: {latex_str[:50]}...")
+                continue
+            self.add_rendered(latex_str, data, context)
+            images[latex_str] = data
+
+        results = []
+        for latex_str in canonicals:
+            data = images[latex_str]
+            results.append(
+                io.BytesIO(data) if data is not None
+                else self._create_error_image(latex_str)
             )
+        return results
+    
+    def latex_to_svg(self, latex_str: str) -> Optional[bytes]:
+        """
+        LaTeX数式をSVGに変換
+
+        SVGは拡大しても劣化しないため、文脈（文書上の大きさ）によらない。
+
+        Returns:
+            Optional[bytes]: SVG（変換できない場合はNone）
+        """
+        try:
+            latex_str = self._preprocess_latex(latex_str)
             
-            # 描画して境界ボックスを取得
-            fig.canvas.draw()
-            renderer = fig.canvas.get_renderer()
-            bbox = text.get_window_extent(renderer=renderer)
-            
-            # 余白を追加
-            bbox_padded = bbox.padded(10)
-            
-            # 画像として保存
-            buf = io.BytesIO()
-            fig.savefig(
-                buf,
-                format='png',
-                dpi=self.dpi,
-                bbox_inches=bbox_padded.transformed(fig.dpi_scale_trans.inverted()),
-                transparent=True,
-                pad_inches=0.1
-            )
-            plt.close(fig)
+            data = self.lookup(latex_str, image_format='svg')
+            if data is None:
+                data = self.renderer.render_svg(latex_str, self.font_size, self.color)
+                self.add_rendered(latex_str, data, image_format='svg')
             
-            buf.seek(0)
-            return buf
+            return data
             
         except Exception as e:
-            print(f"数式変換エラー: {latex_str[:50]}...")
+            print(f"数式SVG変換エラー: {latex_str[:50]}...")
             print(f"エラー内容: {str(e)}")
-            return self._create_error_image(latex_str)
+            return None
     
-    def _preprocess_latex(self, latex_str: str) -> str:
-        """LaTeX文字列の前処理"""
-        # 前後の空白を削除
-        latex_str = latex_str.strip()
-        
-        # $記号を削除
-        latex_str = re.sub(r'^\$+|\$+$', '', latex_str)
-        
-        # \text{}の処理を改善
-        # matplotlibのmathtextは\text{}を完全にはサポートしていないため、
-        # \mathrm{}に変換
-        latex_str = re.sub(r'\\text\{([^}]+)\}', r'\\mathrm{\1}', latex_str)
+    def lookup(self, latex_str: str, context: str = None, image_format: str = 'png'):
+        """描画済みの画像を探す（正規化済みLaTeX、なければNone）
+
+        メモリキャッシュ、バンドル、永続ストアの順に探し、
+        見つかった画像はメモリキャッシュに載せる。
+        """
+        key = self._cache_key(latex_str, context, image_format)
+        if self.cache is not None:
+            data = self.cache.get(key)
+            if data is not None:
+                return data
         
-        # 特殊文字のエスケープ
-        # （必要に応じて追加）
+        data = None
+        if self.bundle is not None:
+            data = self.bundle.get(self._store_key(latex_str, context, image_format))
+        if data is None:
+            data = self._load_from_store(latex_str, context, image_format)
         
-        return latex_str
+        if data is not None and self.cache is not None:
+            self.cache.put(key, data)
+        return data
+    
+    def add_rendered(self, latex_str: str, data: bytes, context: str = None,
+                     image_format: str = 'png'):
+        """描画した画像をメモリキャッシュと永続ストアに登録（正規化済みLaTeX）"""
+        self._save_to_store(latex_str, data, context, image_format)
+        if self.cache is not None:
+            self.cache.put(self._cache_key(latex_str, context, image_format), data)
+    
+    def _cache_key(self, latex_str: str, context: str = None,
+                   image_format: str = 'png') -> tuple:
+        """キャッシュキー（正規化済みLaTeX・スタイル指紋・目標の大きさ）"""
+        if image_format == 'svg':
+            return (latex_str, self.fingerprint, 'svg')
+        return (latex_str, self.fingerprint, self._target(context))
+    
+    def latex_to_image_with_size(self, latex_str: str, context: str = None):
+        """LaTeX数式を画像化し、画像の寸法（ピクセル）も返す"""
+        buf = self.latex_to_image(latex_str, context)
+        with Image.open(buf) as img:
+            size = img.size
+        buf.seek(0)
+        return buf, size
+    
+    def _store_key(self, latex_str: str, context: str = None,
+                   image_format: str = 'png') -> str:
+        """永続ストアのキー（LaTeX・スタイル指紋・描画系のバージョン・目標の大きさ）"""
+        if image_format == 'svg':
+            return make_store_key(latex_str, self.fingerprint, RENDERER_VERSION,
+                                  'svg')
+        target = self._target(context)
+        if target is None:
+            return make_store_key(latex_str, self.fingerprint, RENDERER_VERSION)
+        return make_store_key(latex_str, self.fingerprint, RENDERER_VERSION,
+                              *target)
+    
+    def _load_from_store(self, latex_str: str, context: str = None,
+                         image_format: str = 'png'):
+        """永続ストアから取得（失敗時はNone）"""
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(self._store_key(latex_str, context, image_format))
+        except Exception as e:
+            print(f"数式ストア読み込みエラー: {str(e)}")
+            return None
+    
+    def _save_to_store(self, latex_str: str, data: bytes, context: str = None,
+                       image_format: str = 'png'):
+        """永続ストアに保存（失敗しても変換は続行）"""
+        if self.store is None:
+            return
+        try:
+            self.store.put(self._store_key(latex_str, context, image_format), data)
+        except Exception as e:
+            print(f"数式ストア書き込みエラー: {str(e)}")
+    
+    def cache_stats(self) -> dict:
+        """キャッシュの統計情報（ヒット・ミス・破棄数など）"""
+        if self.cache is None:
+            return {}
+        return self.cache.stats()
+    
+    def render_stats(self) -> dict:
+        """隔離描画の統計情報（制限超過の件数や失敗した数式など、隔離しない場合は空）"""
+        if not self.isolated:
+            return {}
+        return self.renderer.stats()
+    
+    def _render_png(self, latex_str: str, context: str = None) -> bytes:
+        """前処理済みのLaTeXをPNGバイト列に描画"""
+        return self.renderer.render_png(latex_str, self.font_size, self.color, self.dpi,
+                                        self._target(context), self.png_encoding)
+    
+    def _render_many_png(self, latex_list: List[str],
+                         context: str = None) -> List[Optional[bytes]]:
+        """前処理済みのLaTeXをまとめて描画（失敗した数式はNone）"""
+        if not latex_list:
+            return []
+        try:
+            return self.renderer.render_many_png(
+                latex_list, self.font_size, self.color, self.dpi, self._target(context),
+                self.png_encoding
+            )
+        except Exception as e:
+            print(f"数式の一括変換エラー: {str(e)}")
+            return [None] * len(latex_list)
+    
+    def _preprocess_latex(self, latex_str: str) -> str:
+        """LaTeX文字列の前処理
+
+        区切り記号・空白・同義コマンドなどの表記ゆれを正規化する。
+        正規化後の文字列をそのまま描画し、キャッシュのキーにも使う。
+        """
+        return canonicalize_latex(latex_str)
     
     def _create_error_image(self, latex_str: str) -> BinaryIO:
         """エラー時の代替画像"""
         try:
-            fig = plt.figure(figsize=(4, 0.5))
-            fig.patch.set_facecolor('#ffe6e6')
-            
-            ax = fig.add_subplot(111)
-            ax.axis('off')
-            
-            error_msg = f'[数式エラー]'
-            ax.text(
-                0.5, 0.5,
-                error_msg,
-                fontsize=10,
-                color='red',
-                ha='center',
-                va='center',
-                transform=ax.transAxes,
-                bbox=dict(boxstyle='round', facecolor='white', edgecolor='red')
-            )
-            
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', dpi=self.dpi, bbox_inches='tight')
-            plt.close(fig)
-            
-            buf.seek(0)
-            return buf
+            return io.BytesIO(self.renderer.render_error_png(self.dpi))
         except:
             # 最終フォールバック
-            fig = plt.figure(figsize=(2, 0.3))
             buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=150)
-            plt.close(fig)
+            Image.new('RGBA', (300, 45), (255, 255, 255, 255)).save(buf, format='PNG')
             buf.seek(0)
             return buf
     
@@ -0,0 +1,91 @@
+"""数式の記号の対応表
+
+LaTeXのコマンドとUnicodeの文字の対応。LaTeX→OMMLの変換と、MathMLから
+LaTeXへの変換（逆引き）で共有する。
+"""
+
+# 1文字の記号になるコマンド
+SYMBOLS = {
+    # ギリシャ文字
+    '\\alpha': 'α', '\\beta': 'β', '\\gamma': 'γ', '\\delta': 'δ',
+    '\\epsilon': 'ϵ', '\\varepsilon': 'ε', '\\zeta': 'ζ', '\\eta': 'η',
+    '\\theta': 'θ', '\\vartheta': 'ϑ', '\\iota': 'ι', '\\kappa': 'κ',
+    '\\lambda': 'λ', '\\mu': 'μ', '\\nu': 'ν', '\\xi': 'ξ', '\\pi': 'π',
+    '\\varpi': 'ϖ', '\\rho': 'ρ', '\\varrho': 'ϱ', '\\sigma': 'σ',
+    '\\varsigma': 'ς', '\\tau': 'τ', '\\upsilon': 'υ', '\\phi': 'ϕ',
+    '\\varphi': 'φ', '\\chi': 'χ', '\\psi': 'ψ', '\\omega': 'ω',
+    '\\Gamma': 'Γ', '\\Delta': 'Δ', '\\Theta': 'Θ', '\\Lambda': 'Λ',
+    '\\Xi': 'Ξ', '\\Pi': 'Π', '\\Sigma': 'Σ', '\\Upsilon': 'Υ',
+    '\\Phi': 'Φ', '\\Psi': 'Ψ', '\\Omega': 'Ω',
+    # 演算子
+    '\\cdot': '⋅', '\\times': '×', '\\div': '÷', '\\pm': '±', '\\mp': '∓',
+    '\\ast': '∗', '\\circ': '∘', '\\bullet': '∙', '\\cup': '∪', '\\cap': '∩',
+    '\\setminus': '∖', '\\oplus': '⊕', '\\otimes': '⊗',
+    # 関係記号
+    '\\neq': '≠', '\\leq': '≤', '\\geq': '≥', '\\ne': '≠', '\\le': '≤', '\\ge': '≥',
+    '\\leqq': '≦', '\\geqq': '≧',
+    '\\ll': '≪', '\\gg': '≫', '\\approx': '≈', '\\equiv': '≡', '\\sim': '∼',
+    '\\simeq': '≃', '\\propto': '∝', '\\in': '∈', '\\notin': '∉', '\\ni': '∋',
+    '\\subset': '⊂', '\\supset': '⊃', '\\subseteq': '⊆', '\\supseteq': '⊇',
+    '\\perp': '⊥', '\\parallel': '∥', '\\mid': '∣',
+    # 矢印
+    '\\to': '→', '\\rightarrow': '→', '\\leftarrow': '←', '\\gets': '←',
+    '\\Rightarrow': '⇒', '\\Leftarrow': '⇐', '\\Leftrightarrow': '⇔',
+    '\\leftrightarrow': '↔', '\\iff': '⟺', '\\implies': '⟹', '\\mapsto': '↦',
+    # その他
+    '\\infty': '∞', '\\partial': '∂', '\\nabla': '∇', '\\angle': '∠',
+    '\\triangle': '△', '\\forall': '∀', '\\exists': '∃', '\\emptyset': '∅',
+    '\\therefore': '∴', '\\because': '∵', '\\prime': '′', '\\degree': '°',
+    '\\cdots': '⋯', '\\ldots': '…', '\\dots': '…', '\\vdots': '⋮', '\\ddots': '⋱',
+    '\\langle': '⟨', '\\rangle': '⟩', '\\lfloor': '⌊', '\\rfloor': '⌋',
+    '\\lceil': '⌈', '\\rceil': '⌉', '\\|': '‖',
+    '\\lbrace': '{', '\\rbrace': '}', '\\lbrack': '[', '\\rbrack': ']',
+    '\\{': '{', '\\}': '}', '\\%': '%', '\\$': '$', '\\&': '&', '\\#': '#', '\\_': '_',
+    # 空白
+    '\\,': ' ', '\\:': ' ', '\\;': ' ', '\\ ': ' ',
+    '\\quad': ' ', '\\qquad': '  ', '\\!': '',
+}
+
+# 数式中で別の文字にする記号
+CHARACTERS = {
+    '-': '−',
+    '*': '∗',
+    "'": '′',
+    '~': ' ',
+}
+
+# 関数名（立体で書く）
+FUNCTIONS = {
+    '\\sin', '\\cos', '\\tan', '\\cot', '\\sec', '\\csc',
+    '\\arcsin', '\\arccos', '\\arctan', '\\sinh', '\\cosh', '\\tanh',
+    '\\log', '\\ln', '\\lg', '\\exp', '\\det', '\\dim', '\\gcd', '\\deg',
+    '\\arg', '\\ker', '\\Pr',
+}
+
+# 添字を真下に置く関数名
+LIMIT_FUNCTIONS = {'\\lim', '\\max', '\\min', '\\sup', '\\inf', '\\limsup', '\\liminf'}
+
+# 大型演算子: コマンド -> (記号, 添字を上下に置くか)
+NARY_OPERATORS = {
+    '\\sum': ('∑', True),
+    '\\prod': ('∏', True),
+    '\\coprod': ('∐', True),
+    '\\bigcup': ('⋃', True),
+    '\\bigcap': ('⋂', True),
+    '\\int': ('∫', False),
+    '\\iint': ('∬', False),
+    '\\iiint': ('∭', False),
+    '\\oint': ('∮', False),
+}
+
+# アクセント: コマンド -> 結合文字
+ACCENTS = {
+    '\\vec': '⃗',
+    '\\hat': '̂',
+    '\\widehat': '̂',
+    '\\bar': '̅',
+    '\\dot': '̇',
+    '\\ddot': '̈',
+    '\\tilde': '̃',
+    '\\widetilde': '̃',
+}
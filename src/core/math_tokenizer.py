@@ -0,0 +1,95 @@
+"""テキスト中の数式の分割モジュール
+
+問題文や選択肢のテキストを、左から1回だけ走査して文字列と数式に分ける。
+HTMLParser（問題文）とWordGenerator（選択肢）、数式の収集で同じ分け方を使う。
+
+- $$...$$ と \\[...\\] はディスプレイ数式、$...$ と \\(...\\) はインライン数式
+- \\$ はドル記号の文字（数式の区切りにしない）
+- 数式の中の \\x（\\$, \\\\ など）は2文字で1つとして扱い、区切りとみなさない
+- 閉じていない開き記号はそのまま文字として残す
+
+閉じ記号が見つからなかった開き記号は覚えておき、以降の同じ開き記号では探さない。
+そのため、どんな入力でも文字列の長さに比例する時間で終わる。
+"""
+import re
+from typing import List, Tuple
+
+# 開き記号 -> (閉じ記号, 種類)
+_DELIMITERS = {
+    '$$': ('$$', 'display'),
+    '\\[': ('\\]', 'display'),
+    '\\(': ('\\)', 'inline'),
+    '$': ('$', 'inline'),
+}
+
+# 区切りになりうる文字
+_SPECIAL = re.compile(r'[\\$]')
+
+def _find_closing(text: str, start: int, closing: str) -> int:
+    """startより後の閉じ記号の位置（なければ-1）"""
+    pos = start
+    while True:
+        match = _SPECIAL.search(text, pos)
+        if match is None:
+            return -1
+        pos = match.start()
+        if text.startswith(closing, pos):
+            return pos
+        # \x は2文字で1つ
+        pos += 2 if text[pos] == '\\' else 1
+
+def split_math(text: str) -> List[Tuple[str, str]]:
+    """
+    テキストを文字列と数式に分ける
+
+    Returns:
+        List[Tuple[str, str]]: (種類, 内容) の並び。種類は'text', 'inline', 'display'。
+            内容は区切り記号を除いたもので、前後の空白は除かない。
+            文字列は連続しない（\\$ などを含めて1つにまとめる）。
+    """
+    tokens = []
+    pieces = []
+    unclosed = set()
+    pos = 0
+
+    while True:
+        match = _SPECIAL.search(text, pos)
+        if match is None:
+            pieces.append(text[pos:])
+            break
+        start = match.start()
+        pieces.append(text[pos:start])
+
+        opening = text[start:start + 2]
+        if opening == '\\$':
+            pieces.append('$')
+            pos = start + 2
+            continue
+        if opening not in _DELIMITERS:
+            opening = text[start]
+        if opening not in _DELIMITERS:
+            # 区切りでない \x
+            pieces.append(text[start:start + 2])
+            pos = start + 2
+            continue
+
+        closing, kind = _DELIMITERS[opening]
+        begin = start + len(opening)
+        end = -1 if opening in unclosed else _find_closing(text, begin, closing)
+        if end < 0:
+            unclosed.add(opening)
+            pieces.append(opening)
+            pos = begin
+            continue
+
+        plain_text = ''.join(pieces)
+        if plain_text:
+            tokens.append(('text', plain_text))
+        pieces = []
+        tokens.append((kind, text[begin:end]))
+        pos = end + len(closing)
+
+    plain_text = ''.join(pieces)
+    if plain_text:
+        tokens.append(('text', plain_text))
+    return tokens
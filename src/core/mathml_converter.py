@@ -0,0 +1,230 @@
+"""MathML読み込みモジュール
+
+入力HTML中の<math>要素を解析し、画像で描画するためのLaTeXを作る。
+TeXの注釈（<annotation encoding="application/x-tex">）があればそれを使い、
+なければ要素の構造からLaTeXを組み立てる。
+"""
+from typing import Optional
+
+from lxml import etree
+
+from .latex_normalizer import COMMAND_ALIASES
+from .math_symbols import ACCENTS, CHARACTERS, FUNCTIONS, LIMIT_FUNCTIONS, NARY_OPERATORS, SYMBOLS
+
+# TeXの注釈のencoding
+TEX_ENCODINGS = ('application/x-tex', 'application/x-latex', 'text/x-latex', 'TeX', 'LaTeX')
+
+# 見た目を持たない演算子（関数適用・見えない乗算など）
+INVISIBLE_OPERATORS = {'⁡', '⁢', '⁣', '⁤'}
+
+# mover・munderのアクセント記号: 文字 -> 結合文字（上線はNone）
+ACCENT_CHARACTERS = {
+    '→': '⃗', '⃗': '⃗',
+    '^': '̂', 'ˆ': '̂', '̂': '̂',
+    '~': '̃', '˜': '̃', '̃': '̃',
+    '˙': '̇', '̇': '̇',
+    '¨': '̈', '̈': '̈',
+    '¯': None, '‾': None, '―': None, '_': None, '̅': None,
+}
+
+# 文字 -> LaTeXのコマンド（同義のコマンドは正規の表記を使う）
+_COMMANDS = {}
+for _command, _char in SYMBOLS.items():
+    if _char.strip() and _command not in COMMAND_ALIASES:
+        _COMMANDS.setdefault(_char, _command)
+for _command, (_char, _) in NARY_OPERATORS.items():
+    _COMMANDS.setdefault(_char, _command)
+_COMMANDS.update({char: latex for latex, char in CHARACTERS.items() if char.strip()})
+_COMMANDS.update({'{': '\\{', '}': '\\}'})
+
+# 結合文字 -> アクセントのコマンド
+_ACCENT_COMMANDS = {}
+for _command, _char in ACCENTS.items():
+    _ACCENT_COMMANDS.setdefault(_char, _command)
+
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, remove_comments=True)
+
+def local_name(element) -> str:
+    """名前空間を除いた要素名"""
+    return etree.QName(element).localname
+
+def token_text(element) -> str:
+    """トークン要素（mi, mn, mo, mtext）の文字（前後の空白は除き、連続する空白は1つに）"""
+    return ' '.join(''.join(element.itertext()).split())
+
+def parse_mathml(markup: str):
+    """
+    MathMLの文字列を要素にする
+
+    Raises:
+        ValueError: XMLとして読めない、または<math>要素でない場合
+    """
+    try:
+        root = etree.fromstring(markup.encode('utf-8'), _XML_PARSER)
+    except etree.XMLSyntaxError as e:
+        raise ValueError(f"MathMLを読み込めません: {e}")
+    if local_name(root) != 'math':
+        raise ValueError(f"<math>要素ではありません: <{local_name(root)}>")
+    return root
+
+def tex_annotation(root) -> Optional[str]:
+    """TeXの注釈があればその内容"""
+    for element in root.iter('{*}annotation'):
+        if element.get('encoding') in TEX_ENCODINGS:
+            text = ''.join(element.itertext()).strip()
+            if text:
+                return text
+    return None
+
+def mathml_to_latex(markup: str) -> str:
+    """
+    MathMLを同じ数式のLaTeXに変換
+
+    Raises:
+        ValueError: 読み込めない、または対応していない要素（表など）を含む場合
+    """
+    root = parse_mathml(markup)
+
+    annotation = tex_annotation(root)
+    if annotation is not None:
+        return annotation
+
+    latex_str = _latex(root).strip()
+    if not latex_str:
+        raise ValueError("数式が空です")
+    return latex_str
+
+def _children(element) -> list:
+    return [child for child in element if isinstance(child.tag, str)]
+
+def _arguments(element, count: int) -> list:
+    children = _children(element)
+    if len(children) != count:
+        raise ValueError(f"<{local_name(element)}>の子要素は{count}個必要です")
+    return children
+
+def _group(latex_str: str) -> str:
+    """添字や引数に使う形（1文字・1コマンドでなければ波括弧で囲む）"""
+    if len(latex_str) == 1 or (latex_str.startswith('\\') and latex_str[1:].isalpha()):
+        return latex_str
+    return '{' + latex_str + '}'
+
+def _row(elements) -> str:
+    return ' '.join(part for part in (_latex(child) for child in elements) if part)
+
+def _character(char: str) -> str:
+    return _COMMANDS.get(char, char)
+
+def _escape_text(text: str) -> str:
+    for char in '\\{}$%&#_':
+        text = text.replace(char, '\\' + char)
+    return text
+
+def _latex(element) -> str:
+    name = local_name(element)
+
+    if name in ('math', 'mrow', 'mstyle', 'mpadded'):
+        return _row(_children(element))
+    if name == 'semantics':
+        return _row(child for child in _children(element)
+                    if local_name(child) not in ('annotation', 'annotation-xml'))
+    if name == 'mphantom':
+        return ''
+
+    if name == 'mi':
+        text = token_text(element)
+        variant = element.get('mathvariant')
+        if len(text) > 1:
+            if '\\' + text in FUNCTIONS or '\\' + text in LIMIT_FUNCTIONS:
+                return '\\' + text
+            return '\\mathrm{' + _escape_text(text) + '}'
+        if variant == 'normal':
+            return '\\mathrm{' + _character(text) + '}'
+        if variant == 'bold':
+            return '\\mathbf{' + _character(text) + '}'
+        return _character(text)
+    if name == 'mn':
+        return token_text(element)
+    if name == 'mo':
+        text = token_text(element)
+        if text in INVISIBLE_OPERATORS:
+            return ''
+        if '\\' + text in FUNCTIONS or '\\' + text in LIMIT_FUNCTIONS:
+            return '\\' + text
+        return ''.join(_character(char) for char in text)
+    if name in ('mtext', 'ms'):
+        text = token_text(element)
+        return '\\text{' + _escape_text(text) + '}' if text else ''
+    if name == 'mspace':
+        return '\\,'
+
+    if name == 'mfrac':
+        numerator, denominator = _arguments(element, 2)
+        return '\\frac{' + _latex(numerator) + '}{' + _latex(denominator) + '}'
+    if name == 'msqrt':
+        return '\\sqrt{' + _row(_children(element)) + '}'
+    if name == 'mroot':
+        radicand, degree = _arguments(element, 2)
+        return '\\sqrt[' + _latex(degree) + ']{' + _latex(radicand) + '}'
+
+    if name in ('msub', 'msup', 'msubsup', 'munder', 'mover', 'munderover'):
+        return _scripts(element, name)
+
+    if name == 'mfenced':
+        opening = element.get('open', '(')
+        closing = element.get('close', ')')
+        separator = (element.get('separators', ',').strip() or ',')[0]
+        body = (' ' + _character(separator) + ' ').join(
+            _latex(child) for child in _children(element))
+        return '\\left' + _fence(opening) + ' ' + body + ' \\right' + _fence(closing)
+
+    raise ValueError(f"対応していないMathMLの要素: <{name}>")
+
+def _fence(char: str) -> str:
+    if not char:
+        return '.'
+    if char in ('{', '}'):
+        return '\\' + char
+    return _character(char)
+
+def _scripts(element, name: str) -> str:
+    if name in ('msub', 'munder'):
+        base, sub = _arguments(element, 2)
+        sup = None
+    elif name in ('msup', 'mover'):
+        base, sup = _arguments(element, 2)
+        sub = None
+    else:
+        base, sub, sup = _arguments(element, 3)
+
+    # アクセント（上線・ベクトルなど）と下線
+    mark_element = sup if sub is None else sub
+    if name in ('mover', 'munder') and local_name(mark_element) == 'mo':
+        mark = token_text(mark_element)
+        if mark in ACCENT_CHARACTERS:
+            accent = ACCENT_CHARACTERS[mark]
+            if name == 'mover' and accent is None:
+                return '\\overline{' + _latex(base) + '}'
+            if name == 'mover':
+                return _ACCENT_COMMANDS[accent] + '{' + _latex(base) + '}'
+            if accent is None:
+                return '\\underline{' + _latex(base) + '}'
+
+    latex_str = _latex(base)
+    if name.startswith('mu') or name.startswith('mo'):
+        # 総和や極限でなければ真上・真下に置く
+        if not (latex_str in FUNCTIONS or latex_str in LIMIT_FUNCTIONS
+                or latex_str in NARY_OPERATORS):
+            if sub is not None:
+                latex_str = '\\underset{' + _latex(sub) + '}{' + latex_str + '}'
+            if sup is not None:
+                latex_str = '\\overset{' + _latex(sup) + '}{' + latex_str + '}'
+            return latex_str
+    else:
+        latex_str = _group(latex_str)
+
+    if sub is not None:
+        latex_str += '_' + _group(_latex(sub))
+    if sup is not None:
+        latex_str += '^' + _group(_latex(sup))
+    return latex_str
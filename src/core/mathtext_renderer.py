@@ -0,0 +1,121 @@
+"""mathtext直接描画レンダラー
+
+図やAxesを作らず、MathTextParserで数式を直接ラスタライズする。
+レイアウトは1回だけで、切り抜き済みのRGBA画像とその寸法を返す。
+"""
+import threading
+from typing import List, Optional
+
+import numpy as np
+from matplotlib.colors import to_rgba
+from matplotlib.font_manager import FontProperties
+from matplotlib.mathtext import MathTextParser
+from PIL import Image
+
+from .figure_renderer import (
+    RENDER_RC, FigureRenderer, LockedMathTextParser, fit_dpi,
+    get_shared_renderer
+)
+from .png_encoder import encode_png
+
+# 数式の周囲の余白（インチ）。FigureRendererと同じ見た目にそろえる
+PAD_INCHES = 0.1
+
+class MathtextRenderer:
+    """MathTextParserによる数式レンダラー"""
+
+    def __init__(self, rc: dict = None, fallback: FigureRenderer = None):
+        self.rc = dict(RENDER_RC, **(rc or {}))
+        self._parser = LockedMathTextParser(MathTextParser('agg'), self.rc)
+        # 代替画像の描画にはFigureRendererを使う
+        self._fallback = fallback or get_shared_renderer()
+
+    def render_rgba(self, latex_str: str, font_size: float, color: str,
+                    dpi: float, target=None) -> np.ndarray:
+        """数式を余白付きのRGBA配列に描画（targetはfit_dpiを参照）"""
+        return self._render(latex_str, font_size, color, dpi, target)[0]
+
+    def _render(self, latex_str: str, font_size: float, color: str,
+                dpi: float, target) -> tuple:
+        """数式を描画して(RGBA配列, 解像度)を返す"""
+        prop = FontProperties(size=font_size,
+                              math_fontfamily=self.rc['mathtext.fontset'])
+        # 解析は1回だけ（LockedMathTextParserがMATHTEXT_LOCKで直列化する）。
+        # 上限の解像度で描画し、目標の大きさに合わせる場合はその寸法から
+        # 解像度を決めて縮小する
+        result = self._parser.parse(f'${latex_str}$', dpi=dpi, prop=prop)
+        mask = np.asarray(result.image)
+        height, width = mask.shape
+        if target is not None:
+            size = (width / dpi + 2 * PAD_INCHES, height / dpi + 2 * PAD_INCHES)
+            fit = fit_dpi(size, target, dpi)
+            if fit < dpi:
+                width = max(1, round(width * fit / dpi))
+                height = max(1, round(height * fit / dpi))
+                mask = np.asarray(Image.fromarray(mask).resize((width, height), Image.LANCZOS))
+                dpi = fit
+        pad = int(round(PAD_INCHES * dpi))
+
+        # 数式の色で塗り、描画結果を透明度として使う
+        r, g, b, a = to_rgba(color)
+        rgba = np.zeros((height + 2 * pad, width + 2 * pad, 4), np.uint8)
+        rgba[..., 0] = round(r * 255)
+        rgba[..., 1] = round(g * 255)
+        rgba[..., 2] = round(b * 255)
+        rgba[pad:pad + height, pad:pad + width, 3] = (mask * a).astype(np.uint8)
+        return rgba, dpi
+
+    def render_with_size(self, latex_str: str, font_size: float, color: str,
+                         dpi: float, target=None, encoding: str = 'rgba'):
+        """
+        数式をPNGに描画し、画像の寸法も返す
+
+        Returns:
+            Tuple[bytes, Tuple[int, int]]: (透過PNG, (幅, 高さ)ピクセル)
+        """
+        rgba, dpi = self._render(latex_str, font_size, color, dpi, target)
+        return encode_png(rgba, dpi, encoding), (rgba.shape[1], rgba.shape[0])
+
+    def render_png(self, latex_str: str, font_size: float, color: str,
+                   dpi: float, target=None, encoding: str = 'rgba') -> bytes:
+        """数式をPNGに描画"""
+        return self.render_with_size(latex_str, font_size, color, dpi, target,
+                                     encoding)[0]
+
+    def render_many_png(self, latex_list: List[str], font_size: float, color: str,
+                        dpi: float, target=None,
+                        encoding: str = 'rgba') -> List[Optional[bytes]]:
+        """
+        複数の数式を描画（図を使わないため1つずつ描画する）
+
+        Returns:
+            List[Optional[bytes]]: 入力順の透過PNG（描画できない数式はNone）
+        """
+        results = []
+        for latex_str in latex_list:
+            try:
+                results.append(self.render_png(latex_str, font_size, color, dpi,
+                                               target, encoding))
+            except Exception:
+                results.append(None)
+        return results
+
+    def render_svg(self, latex_str: str, font_size: float, color: str) -> bytes:
+        """数式をSVGに描画（FigureRendererのSVG出力を使う）"""
+        return self._fallback.render_svg(latex_str, font_size, color)
+
+    def render_error_png(self, dpi: float) -> bytes:
+        """数式エラーを示す代替画像を描画"""
+        return self._fallback.render_error_png(dpi)
+
+# プロセス内で共有するレンダラー
+_shared_renderer = None
+_shared_lock = threading.Lock()
+
+def get_shared_mathtext_renderer() -> MathtextRenderer:
+    """既定のrc設定で共有するレンダラーを取得"""
+    global _shared_renderer
+    with _shared_lock:
+        if _shared_renderer is None:
+            _shared_renderer = MathtextRenderer()
+        return _shared_renderer
@@ -0,0 +1,619 @@
+"""LaTeX・MathML→Office Math（OMML）変換モジュール
+
+分数・添字・根号・ギリシャ文字・関係記号・総和などの数式を、画像にせず
+Wordの数式（m:oMath）として直接書き込む。Word上で編集でき、描画も不要になる。
+MathMLは要素の構造をそのままOMMLに対応させる（LaTeXを経由しない）。
+対応していない記法を含む数式は変換せずNoneを返し、呼び出し側で画像にする。
+"""
+import copy
+from collections import OrderedDict
+from typing import List, Optional
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from lxml import etree
+
+from .latex_normalizer import strip_delimiters, tokenize_latex
+from .mathml_converter import (ACCENT_CHARACTERS, INVISIBLE_OPERATORS, local_name, parse_mathml,
+                               token_text)
+from .math_symbols import (ACCENTS, CHARACTERS, FUNCTIONS, LIMIT_FUNCTIONS, NARY_OPERATORS,
+                           SYMBOLS)
+
+# 数式用のフォント
+MATH_FONT = 'Cambria Math'
+
+# 変換結果を保持する数式の数（超えたら最も古く使われたものから捨てる）
+OMML_CACHE_SIZE = 1024
+
+# 記号として扱わない文字（表の区切りなど、対応していない記法）
+_UNSUPPORTED_CHARACTERS = {'&', '#', '%', '$'}
+
+# 書体: コマンド -> m:styの値（Noneは通常のテキスト）
+STYLES = {
+    '\\mathrm': 'p',
+    '\\operatorname': 'p',
+    '\\mathbf': 'b',
+    '\\mathit': 'i',
+    '\\boldsymbol': 'bi',
+    '\\text': None,
+    '\\textrm': None,
+    '\\mbox': None,
+}
+
+# \left・\rightで使える区切り記号
+DELIMITERS = {
+    '(': '(', ')': ')', '[': '[', ']': ']', '|': '|', '.': '',
+    '\\lbrace': '{', '\\rbrace': '}', '\\lbrack': '[', '\\rbrack': ']',
+    '\\{': '{', '\\}': '}', '\\|': '‖', '\\langle': '⟨', '\\rangle': '⟩',
+    '\\lfloor': '⌊', '\\rfloor': '⌋', '\\lceil': '⌈', '\\rceil': '⌉',
+}
+
+# 大型演算子の被演算子を区切る記号
+_RELATIONS = {'=', '<', '>', ',', '\\neq', '\\leq', '\\geq', '\\ne', '\\le', '\\ge',
+              '\\leqq', '\\geqq', '\\approx', '\\equiv', '\\sim', '\\simeq', '\\to', '\\rightarrow',
+              '\\Rightarrow', '\\Leftrightarrow', '\\iff', '\\implies', '\\in'}
+
+class UnsupportedFormula(Exception):
+    """OMMLに変換できない記法（LaTeX・MathML）"""
+
+def _m(tag: str, *children, **attrs):
+    """m名前空間の要素を作成（属性もm名前空間）"""
+    element = OxmlElement(f'm:{tag}')
+    for name, value in attrs.items():
+        element.set(qn(f'm:{name}'), value)
+    for child in children:
+        if isinstance(child, list):
+            element.extend(child)
+        elif child is not None:
+            element.append(child)
+    return element
+
+def _run(text: str, style: Optional[str] = 'auto'):
+    """数式のテキスト（m:r）。styleはm:styの値、Noneは通常のテキスト"""
+    run = _m('r')
+    if style is None:
+        run.append(_m('rPr', _m('nor')))
+    elif style != 'auto':
+        run.append(_m('rPr', _m('sty', val=style)))
+    t = _m('t')
+    t.text = text
+    run.append(t)
+    return run
+
+def _script(base: list, sub: Optional[list], sup: Optional[list]):
+    """添字（subかsupの少なくとも一方）"""
+    if sub is None:
+        return _m('sSup', _m('e', base), _m('sup', sup))
+    if sup is None:
+        return _m('sSub', _m('e', base), _m('sub', sub))
+    return _m('sSubSup', _m('e', base), _m('sub', sub), _m('sup', sup))
+
+class _Parser:
+    """トークン列を左から読んでOMMLの要素を組み立てる"""
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def _peek(self) -> Optional[str]:
+        while self.pos < len(self.tokens) and self.tokens[self.pos].isspace():
+            self.pos += 1
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise UnsupportedFormula('数式が途中で終わっています')
+        self.pos += 1
+        return token
+
+    def _expect(self, token: str):
+        if self._next() != token:
+            raise UnsupportedFormula(f"'{token}' がありません")
+
+    def parse(self) -> list:
+        elements = self.expression()
+        if self._peek() is not None:
+            raise UnsupportedFormula(f"対応していない記号: {self._peek()}")
+        return elements
+
+    def expression(self, stop: Optional[str] = None) -> list:
+        """stop（または閉じ括弧）の手前までの要素"""
+        elements = []
+        while True:
+            token = self._peek()
+            if token is None or token == '}' or token == stop or token == '\\right':
+                return elements
+            elements.extend(self.term())
+
+    def term(self) -> list:
+        """添字付きの1項（大型演算子・関数はその被演算子まで）"""
+        token = self._peek()
+        if token in NARY_OPERATORS:
+            self.pos += 1
+            return [self._nary(token)]
+        if token in FUNCTIONS or token in LIMIT_FUNCTIONS:
+            self.pos += 1
+            return self._function(token)
+
+        base = self.atom()
+        sub, sup = self._scripts()
+        if sub is None and sup is None:
+            return base
+        return [_script(base, sub, sup)]
+
+    def _scripts(self):
+        """後に続く ^・_ の内容"""
+        sub = sup = None
+        while self._peek() in ('^', '_'):
+            token = self._next()
+            argument = self.argument()
+            if token == '_':
+                if sub is not None:
+                    raise UnsupportedFormula('添字が重複しています')
+                sub = argument
+            else:
+                if sup is not None:
+                    raise UnsupportedFormula('上付き文字が重複しています')
+                sup = argument
+        return sub, sup
+
+    def argument(self) -> list:
+        """コマンドの引数（{...}または1トークン）"""
+        token = self._peek()
+        if token == '{':
+            return self.atom()
+        if token is None or token in ('}', '^', '_'):
+            raise UnsupportedFormula('引数がありません')
+        return self.atom()
+
+    def _operand(self) -> list:
+        """大型演算子の被演算子（関係記号の手前まで）"""
+        elements = []
+        while True:
+            token = self._peek()
+            if token is None or token in ('}', ')', '\\right') or token in _RELATIONS:
+                return elements
+            elements.extend(self.term())
+
+    def _nary(self, command: str):
+        symbol, under_over = NARY_OPERATORS[command]
+        sub, sup = self._scripts()
+
+        properties = _m('naryPr',
+                        _m('chr', val=symbol),
+                        _m('limLoc', val='undOvr' if under_over else 'subSup'),
+                        _m('subHide', val='1') if sub is None else None,
+                        _m('supHide', val='1') if sup is None else None)
+        return _m('nary', properties, _m('sub', sub or []), _m('sup', sup or []),
+                  _m('e', self._operand()))
+
+    def _function(self, command: str) -> list:
+        name = [_run(command[1:], 'p')]
+        sub, sup = self._scripts()
+        if command in LIMIT_FUNCTIONS and sub is not None:
+            name = [_m('limLow', _m('e', name), _m('lim', sub))]
+            sub = None
+        if sub is not None or sup is not None:
+            name = [_script(name, sub, sup)]
+
+        # 引数がなければ関数名だけ
+        token = self._peek()
+        if token is None or token in ('}', ')', '\\right') or token in _RELATIONS:
+            return name
+        return [_m('func', _m('fName', name), _m('e', self.term()))]
+
+    def atom(self) -> list:
+        token = self._next()
+
+        if token == '{':
+            elements = self.expression()
+            self._expect('}')
+            return elements
+        if token == '(' and self._has_closing():
+            elements = self.expression(stop=')')
+            self._expect(')')
+            return [self._delimited('(', ')', elements)]
+        if token == '\\left':
+            opening = self._delimiter()
+            elements = self.expression(stop='\\right')
+            self._expect('\\right')
+            return [self._delimited(opening, self._delimiter(), elements)]
+        if token in ('\\frac', '\\dfrac', '\\tfrac'):
+            return [_m('f', _m('num', self.argument()), _m('den', self.argument()))]
+        if token == '\\binom':
+            fraction = _m('f', _m('fPr', _m('type', val='noBar')),
+                          _m('num', self.argument()), _m('den', self.argument()))
+            return [self._delimited('(', ')', [fraction])]
+        if token == '\\sqrt':
+            return [self._radical()]
+        if token in ACCENTS:
+            return [_m('acc', _m('accPr', _m('chr', val=ACCENTS[token])),
+                       _m('e', self.argument()))]
+        if token in ('\\overline', '\\underline'):
+            position = 'top' if token == '\\overline' else 'bot'
+            return [_m('bar', _m('barPr', _m('pos', val=position)),
+                       _m('e', self.argument()))]
+        if token in STYLES:
+            return self._styled(STYLES[token])
+        if token in SYMBOLS:
+            return [_run(SYMBOLS[token])] if SYMBOLS[token] else []
+        if token in ('^', '_'):
+            # 基底のない添字
+            self.pos -= 1
+            return []
+
+        if token[0] == '\\' or token in _UNSUPPORTED_CHARACTERS or token == '}':
+            raise UnsupportedFormula(f"対応していない記号: {token}")
+        return [_run(CHARACTERS.get(token, token))]
+
+    def _has_closing(self) -> bool:
+        """現在のグループ内に対応する ) があるか"""
+        depth = 0
+        braces = 0
+        for token in self.tokens[self.pos:]:
+            if token == '{':
+                braces += 1
+            elif token == '}':
+                if braces == 0:
+                    return False
+                braces -= 1
+            elif braces == 0 and token == '(':
+                depth += 1
+            elif braces == 0 and token == ')':
+                if depth == 0:
+                    return True
+                depth -= 1
+        return False
+
+    def _delimiter(self) -> str:
+        token = self._next()
+        if token not in DELIMITERS:
+            raise UnsupportedFormula(f"対応していない区切り記号: {token}")
+        return DELIMITERS[token]
+
+    @staticmethod
+    def _delimited(opening: str, closing: str, elements: list):
+        properties = _m('dPr', _m('begChr', val=opening), _m('endChr', val=closing))
+        return _m('d', properties, _m('e', elements))
+
+    def _radical(self):
+        degree = []
+        if self._peek() == '[':
+            self.pos += 1
+            degree = self.expression(stop=']')
+            self._expect(']')
+        radicand = self.argument()
+        if not degree:
+            return _m('rad', _m('radPr', _m('degHide', val='1')), _m('deg'), _m('e', radicand))
+        return _m('rad', _m('deg', degree), _m('e', radicand))
+
+    def _styled(self, style: Optional[str]) -> list:
+        """書体を指定したグループ（Noneは通常のテキスト）"""
+        if style is not None:
+            elements = self.argument()
+            for run in _iter_runs(elements):
+                rpr = run.find(qn('m:rPr'))
+                if rpr is None:
+                    run.insert(0, _m('rPr', _m('sty', val=style)))
+            return elements
+
+        # テキストは空白も含めてそのまま
+        self._expect('{')
+        text = []
+        depth = 0
+        while True:
+            if self.pos >= len(self.tokens):
+                raise UnsupportedFormula('テキストが閉じていません')
+            token = self.tokens[self.pos]
+            self.pos += 1
+            if token == '}' and depth == 0:
+                break
+            if token in ('{', '}'):
+                depth += 1 if token == '{' else -1
+                continue
+            if token[0] == '\\':
+                if token not in SYMBOLS or token[1].isalpha():
+                    raise UnsupportedFormula(f"テキスト中の対応していないコマンド: {token}")
+                token = SYMBOLS[token]
+            text.append(token)
+        return [_run(''.join(text), None)] if text else []
+
+def _iter_runs(elements: list):
+    for element in elements:
+        if element.tag == qn('m:r'):
+            yield element
+        else:
+            yield from element.iter(qn('m:r'))
+
+def _merge_runs(element):
+    """書式が同じ隣り合うm:rを1つにまとめる"""
+    previous = None
+    for child in list(element):
+        if child.tag != qn('m:r'):
+            _merge_runs(child)
+            previous = None
+            continue
+        rpr = child.find(qn('m:rPr'))
+        key = None if rpr is None else etree.tostring(rpr)
+        if previous is not None and previous[1] == key:
+            target = previous[0].find(qn('m:t'))
+            target.text += child.find(qn('m:t')).text
+            element.remove(child)
+        else:
+            previous = (child, key)
+
+def _finish_runs(omath, font_size: Optional[float], east_asia_font: Optional[str]):
+    """各m:rに文字の書式（w:rPr）を付け、前後の空白を保持する"""
+    for run in omath.iter(qn('m:r')):
+        rpr = OxmlElement('w:rPr')
+        fonts = OxmlElement('w:rFonts')
+        fonts.set(qn('w:ascii'), MATH_FONT)
+        fonts.set(qn('w:hAnsi'), MATH_FONT)
+        if east_asia_font:
+            fonts.set(qn('w:eastAsia'), east_asia_font)
+        rpr.append(fonts)
+        if font_size:
+            for tag in ('w:sz', 'w:szCs'):
+                size = OxmlElement(tag)
+                size.set(qn('w:val'), str(int(round(font_size * 2))))
+                rpr.append(size)
+
+        t = run.find(qn('m:t'))
+        t.addprevious(rpr)
+        if t.text != t.text.strip():
+            t.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
+
+# MathMLのmathvariant -> m:styの値
+_MATHML_STYLES = {'normal': 'p', 'bold': 'b', 'italic': 'i', 'bold-italic': 'bi'}
+
+# 大型演算子の記号 -> 添字を上下に置くか
+_NARY_CHARACTERS = {symbol: under_over for symbol, under_over in NARY_OPERATORS.values()}
+
+# 大型演算子の被演算子を区切る文字（MathMLのmo）
+_RELATION_CHARACTERS = {SYMBOLS.get(token, token) for token in _RELATIONS}
+
+def _mathml_children(element) -> list:
+    return [child for child in element if isinstance(child.tag, str)]
+
+def _mathml_arguments(element, count: int) -> list:
+    children = _mathml_children(element)
+    if len(children) != count:
+        raise UnsupportedFormula(f"<{local_name(element)}>の子要素は{count}個必要です")
+    return children
+
+def _mathml_nary(element) -> Optional[str]:
+    """大型演算子（添字付きを含む）ならその記号"""
+    name = local_name(element)
+    if name in ('msub', 'msup', 'msubsup', 'munder', 'mover', 'munderover'):
+        children = _mathml_children(element)
+        if not children:
+            return None
+        element = children[0]
+        name = local_name(element)
+    if name == 'mo' and token_text(element) in _NARY_CHARACTERS:
+        return token_text(element)
+    return None
+
+def _mathml_row(children: list) -> list:
+    """MathMLの要素の並び（大型演算子は関係記号の手前までを被演算子にする）"""
+    elements = []
+    i = 0
+    while i < len(children):
+        child = children[i]
+        i += 1
+        symbol = _mathml_nary(child)
+        if symbol is None:
+            elements.extend(_mathml(child))
+            continue
+
+        operand = []
+        while (i < len(children)
+               and not (local_name(children[i]) == 'mo'
+                        and token_text(children[i]) in _RELATION_CHARACTERS)):
+            operand.append(children[i])
+            i += 1
+        elements.append(_mathml_nary_element(child, symbol, _mathml_row(operand)))
+    return elements
+
+def _mathml_nary_element(element, symbol: str, operand: list):
+    name = local_name(element)
+    children = _mathml_children(element)
+    sub = sup = None
+    if name in ('msub', 'munder', 'msubsup', 'munderover'):
+        sub = _mathml(children[1])
+    if name in ('msup', 'mover'):
+        sup = _mathml(children[1])
+    if name in ('msubsup', 'munderover'):
+        sup = _mathml(children[2])
+
+    under_over = name.startswith('mu') or name == 'mover' or _NARY_CHARACTERS[symbol]
+    properties = _m('naryPr',
+                    _m('chr', val=symbol),
+                    _m('limLoc', val='undOvr' if under_over else 'subSup'),
+                    _m('subHide', val='1') if sub is None else None,
+                    _m('supHide', val='1') if sup is None else None)
+    return _m('nary', properties, _m('sub', sub or []), _m('sup', sup or []),
+              _m('e', operand))
+
+def _mathml(element) -> list:
+    """MathMLの要素をOMMLの要素に変換"""
+    name = local_name(element)
+
+    if name in ('math', 'mrow', 'mstyle', 'mpadded'):
+        return _mathml_row(_mathml_children(element))
+    if name == 'semantics':
+        return _mathml_row([child for child in _mathml_children(element)
+                            if local_name(child) not in ('annotation', 'annotation-xml')])
+    if name == 'mphantom':
+        return []
+
+    if name == 'mi':
+        text = token_text(element)
+        style = _MATHML_STYLES.get(element.get('mathvariant'))
+        if style is None and len(text) > 1:
+            # 複数文字の識別子（関数名など）は立体
+            style = 'p'
+        return [_run(text, style or 'auto')] if text else []
+    if name in ('mn', 'mo'):
+        text = token_text(element)
+        if not text or text in INVISIBLE_OPERATORS:
+            return []
+        return [_run(''.join(CHARACTERS.get(char, char) for char in text))]
+    if name in ('mtext', 'ms'):
+        text = token_text(element)
+        return [_run(text, None)] if text else []
+    if name == 'mspace':
+        return [_run(' ')]
+
+    if name == 'mfrac':
+        numerator, denominator = _mathml_arguments(element, 2)
+        properties = None
+        if element.get('linethickness') in ('0', '0px', '0pt'):
+            properties = _m('fPr', _m('type', val='noBar'))
+        return [_m('f', properties, _m('num', _mathml(numerator)),
+                   _m('den', _mathml(denominator)))]
+    if name == 'msqrt':
+        return [_m('rad', _m('radPr', _m('degHide', val='1')), _m('deg'),
+                   _m('e', _mathml_row(_mathml_children(element))))]
+    if name == 'mroot':
+        radicand, degree = _mathml_arguments(element, 2)
+        return [_m('rad', _m('deg', _mathml(degree)), _m('e', _mathml(radicand)))]
+
+    if name == 'msub':
+        base, sub = _mathml_arguments(element, 2)
+        return [_script(_mathml(base), _mathml(sub), None)]
+    if name == 'msup':
+        base, sup = _mathml_arguments(element, 2)
+        return [_script(_mathml(base), None, _mathml(sup))]
+    if name == 'msubsup':
+        base, sub, sup = _mathml_arguments(element, 3)
+        return [_script(_mathml(base), _mathml(sub), _mathml(sup))]
+    if name in ('munder', 'mover', 'munderover'):
+        return [_mathml_under_over(element, name)]
+
+    if name == 'mfenced':
+        separator = (element.get('separators', ',').strip() or ',')[0]
+        properties = _m('dPr',
+                        _m('begChr', val=element.get('open', '(')),
+                        _m('sepChr', val=separator),
+                        _m('endChr', val=element.get('close', ')')))
+        return [_m('d', properties,
+                   [_m('e', _mathml(child)) for child in _mathml_children(element)])]
+
+    raise UnsupportedFormula(f"対応していないMathMLの要素: <{name}>")
+
+def _mathml_under_over(element, name: str):
+    if name == 'munderover':
+        base, under, over = _mathml_arguments(element, 3)
+    elif name == 'munder':
+        (base, under), over = _mathml_arguments(element, 2), None
+    else:
+        (base, over), under = _mathml_arguments(element, 2), None
+
+    # アクセント（上線・ベクトルなど）と下線
+    mark = under if over is None else over
+    if name != 'munderover' and local_name(mark) == 'mo' and token_text(mark) in ACCENT_CHARACTERS:
+        accent = ACCENT_CHARACTERS[token_text(mark)]
+        if accent is None:
+            position = 'top' if name == 'mover' else 'bot'
+            return _m('bar', _m('barPr', _m('pos', val=position)), _m('e', _mathml(base)))
+        if name == 'mover':
+            return _m('acc', _m('accPr', _m('chr', val=accent)), _m('e', _mathml(base)))
+
+    result = _mathml(base)
+    if under is not None:
+        result = [_m('limLow', _m('e', result), _m('lim', _mathml(under)))]
+    if over is not None:
+        result = [_m('limUpp', _m('e', result), _m('lim', _mathml(over)))]
+    return result[0]
+
+class OmmlConverter:
+    """LaTeX・MathMLの数式をWordの数式（OMML）に変換する
+
+    変換結果は元の数式ごとに保持し（最近使ったcache_size個まで）、使うたびに複製を返す。
+    """
+
+    def __init__(self, east_asia_font: Optional[str] = None,
+                 cache_size: int = OMML_CACHE_SIZE):
+        """
+        Args:
+            east_asia_font (str): 数式中の日本語（\\text{}など）のフォント
+            cache_size (int): 変換結果を保持する数式の数
+        """
+        self.east_asia_font = east_asia_font
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def convert(self, latex_str: str, display: bool = False,
+                font_size: Optional[float] = None):
+        """
+        LaTeX数式をOMMLに変換
+
+        Args:
+            latex_str (str): LaTeX数式（区切り記号があれば取り除く）
+            display (bool): Trueなら独立した数式（m:oMathPara）にする
+            font_size (float): 文字の大きさ（ポイント、Noneで段落の設定に従う）
+
+        Returns:
+            m:oMath（displayならm:oMathPara）の要素。変換できない数式はNone
+        """
+        key = ('latex', strip_delimiters(latex_str), display, font_size)
+        if key not in self._cache:
+            self._store(key, self._build(self._latex_elements(latex_str), display, font_size))
+        return self._copy(key)
+
+    def convert_mathml(self, markup: str, display: bool = False,
+                       font_size: Optional[float] = None):
+        """
+        MathML（<math>要素の文字列）をOMMLに変換
+
+        引数と戻り値はconvertと同じ。表などの対応していない要素を含む場合はNone
+        """
+        key = ('mathml', markup, display, font_size)
+        if key not in self._cache:
+            try:
+                elements = _mathml(parse_mathml(markup))
+            except (ValueError, UnsupportedFormula):
+                elements = None
+            self._store(key, self._build(elements, display, font_size))
+        return self._copy(key)
+
+    def supports(self, latex_str: str) -> bool:
+        """OMMLに変換できる数式か"""
+        return self.convert(latex_str) is not None
+
+    def _store(self, key, element):
+        """変換結果を保持する（古いものから捨てる）"""
+        self._cache[key] = element
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _copy(self, key):
+        self._cache.move_to_end(key)
+        element = self._cache[key]
+        return None if element is None else copy.deepcopy(element)
+
+    @staticmethod
+    def _latex_elements(latex_str: str) -> Optional[list]:
+        tokens = tokenize_latex(strip_delimiters(latex_str))
+        if not tokens:
+            return None
+
+        try:
+            return _Parser(tokens).parse()
+        except UnsupportedFormula:
+            return None
+
+    def _build(self, elements: Optional[list], display: bool, font_size: Optional[float]):
+        """要素を数式（m:oMath / m:oMathPara）にまとめる"""
+        if not elements:
+            return None
+
+        omath = _m('oMath', elements)
+        _merge_runs(omath)
+        _finish_runs(omath, font_size, self.east_asia_font)
+
+        if display:
+            return _m('oMathPara', _m('oMathParaPr', _m('jc', val='center')), omath)
+        return omath
@@ -0,0 +1,177 @@
+"""単純な数式の文字列化モジュール
+
+x, 2, x^2, n+1 のように文字と記号だけで書ける数式を、画像にせず
+書式付きの文字（英字は斜体、添字はUnicodeの上付き・下付き文字）にする。
+文書が小さくなり、本文と同じように検索できる。
+"""
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from .latex_normalizer import strip_delimiters, tokenize_latex
+from .math_symbols import CHARACTERS, FUNCTIONS, LIMIT_FUNCTIONS, SYMBOLS
+
+# 既定で文字にしてよいコマンド
+DEFAULT_PLAIN_COMMANDS = (
+    '\\alpha', '\\beta', '\\gamma', '\\delta', '\\theta', '\\lambda', '\\mu',
+    '\\pi', '\\sigma', '\\phi', '\\omega', '\\Delta', '\\Omega',
+    '\\cdot', '\\times', '\\div', '\\pm', '\\mp',
+    '\\leq', '\\geq', '\\neq', '\\le', '\\ge', '\\ne', '\\approx', '\\to',
+    '\\infty', '\\angle', '\\triangle', '\\perp', '\\parallel', '\\circ',
+    '\\cdots', '\\ldots', '\\sin', '\\cos', '\\tan', '\\log', '\\ln',
+    '\\,', '\\;', '\\ ',
+)
+
+# 変換結果を保持する数式の数（超えたら最も古く使われたものから捨てる）
+PLAIN_CACHE_SIZE = 4096
+
+# 上付き・下付きにできる文字
+SUPERSCRIPTS = dict(zip('0123456789+-=()ni', '⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻⁼⁽⁾ⁿⁱ'))
+SUBSCRIPTS = dict(zip('0123456789+-=()aehklmnopstx', '₀₁₂₃₄₅₆₇₈₉₊₋₌₍₎ₐₑₕₖₗₘₙₒₚₛₜₓ'))
+
+# 前後に空白を置く記号（二項演算子・関係記号）
+_SPACED = set('+−=<>±∓×÷⋅≤≥≠≈→')
+
+# 直後の+・−を符号（単項）とみなす記号
+_UNARY_AFTER = set('([,') | _SPACED
+
+# 英字以外でそのまま使える文字
+_PLAIN_CHARACTERS = set('0123456789.,()[]|/!+=<>') | set(CHARACTERS)
+
+# 斜体にするギリシャ文字（小文字）
+_ITALIC_GREEK = set('αβγδϵεζηθϑικλμνξπϖρϱσςτυϕφχψω')
+
+class PlainMathConverter:
+    """単純な数式を書式付きの文字列（斜体かどうかの区切り）に変換する"""
+
+    def __init__(self, commands=DEFAULT_PLAIN_COMMANDS, cache_size: int = PLAIN_CACHE_SIZE):
+        """
+        Args:
+            commands: 文字にしてよいLaTeXのコマンド（これ以外を含む数式は変換しない）
+            cache_size (int): 変換結果を保持する数式の数（最近使ったものから）
+        """
+        self.commands = frozenset(commands)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def convert(self, latex_str: str) -> Optional[List[Tuple[str, bool]]]:
+        """
+        数式を文字列に変換
+
+        Returns:
+            Optional[List[Tuple[str, bool]]]: (文字列, 斜体か) の並び。文字にできない数式はNone
+        """
+        body = strip_delimiters(latex_str)
+        if body in self._cache:
+            self._cache.move_to_end(body)
+            return self._cache[body]
+
+        result = self._convert(body)
+        self._cache[body] = result
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _convert(self, body: str) -> Optional[List[Tuple[str, bool]]]:
+        tokens = [token for token in tokenize_latex(body) if not token.isspace()]
+        if not tokens:
+            return None
+
+        # (文字, 斜体か) を1文字ずつ
+        chars = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            i += 1
+
+            if token in ('^', '_'):
+                if not chars:
+                    return None
+                script, i = self._script(tokens, i, SUPERSCRIPTS if token == '^' else SUBSCRIPTS)
+                if script is None:
+                    return None
+                chars.extend((char, False) for char in script)
+                continue
+
+            if token[0] == '\\':
+                if token not in self.commands:
+                    return None
+                if token in FUNCTIONS or token in LIMIT_FUNCTIONS:
+                    chars.extend((char, False) for char in token[1:])
+                    # 関数名と引数の間をあける
+                    chars.append((' ', False))
+                    continue
+                symbol = SYMBOLS.get(token)
+                if symbol is None:
+                    return None
+                if symbol.isspace():
+                    chars.append((' ', False))
+                else:
+                    chars.extend((char, char in _ITALIC_GREEK) for char in symbol)
+                continue
+
+            if 'a' <= token.lower() <= 'z':
+                chars.append((token, True))
+            elif token in _PLAIN_CHARACTERS:
+                chars.append((CHARACTERS.get(token, token), False))
+            else:
+                return None
+
+        return _segments(_space_operators(chars))
+
+    @staticmethod
+    def _script(tokens: List[str], i: int, table: dict):
+        """^・_ の引数（1トークンか{...}）を上付き・下付き文字に"""
+        if i >= len(tokens):
+            return None, i
+        if tokens[i] == '{':
+            try:
+                end = tokens.index('}', i)
+            except ValueError:
+                return None, i
+            argument, i = tokens[i + 1:end], end + 1
+        else:
+            argument, i = [tokens[i]], i + 1
+
+        if not argument or any(token not in table for token in argument):
+            return None, i
+        return ''.join(table[token] for token in argument), i
+
+def _space_operators(chars: list) -> list:
+    """二項演算子・関係記号の前後とカンマの後に空白を置く"""
+    result = []
+    for char, italic in chars:
+        if char == ' ':
+            if result and result[-1][0] != ' ':
+                result.append((char, italic))
+            continue
+
+        previous = next((c for c, _ in reversed(result) if c != ' '), None)
+        if char in _SPACED and not (char in '+−±∓' and (previous is None or previous in _UNARY_AFTER)):
+            if result and result[-1][0] != ' ':
+                result.append((' ', False))
+            result.append((char, False))
+            result.append((' ', False))
+        else:
+            result.append((char, italic))
+        if char == ',':
+            result.append((' ', False))
+
+    # 空白の重複と前後の空白を除く
+    cleaned = []
+    for char, italic in result:
+        if char == ' ' and (not cleaned or cleaned[-1][0] == ' '):
+            continue
+        cleaned.append((char, italic))
+    while cleaned and cleaned[-1][0] == ' ':
+        cleaned.pop()
+    return cleaned
+
+def _segments(chars: list) -> List[Tuple[str, bool]]:
+    """同じ書式の文字をまとめる"""
+    segments = []
+    for char, italic in chars:
+        if segments and segments[-1][1] == italic:
+            segments[-1] = (segments[-1][0] + char, italic)
+        else:
+            segments.append((char, italic))
+    return segments
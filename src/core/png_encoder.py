@@ -0,0 +1,86 @@
+"""数式画像のPNGエンコーダー
+
+数式画像は単色の字形と透明な背景だけでできているため、色は1色のまま
+透明度だけをパレットの段階に量子化し、インデックスカラーのPNGにする。
+パレットの各色に透明度を持たせる（tRNSチャンク）ので、RGBAと同じく
+背景が透けて見える。
+"""
+import io
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# エンコード方式: 方式名 -> (透明度の段階数, ビット深度)
+# Noneは32bit RGBAのまま
+PNG_ENCODINGS = {
+    'rgba': None,
+    'palette8': (256, 8),   # 透明度256段階（RGBAと同じ画質）
+    'palette4': (16, 4),    # 透明度16段階
+    'palette1': (2, 1),     # 1bit（不透明/透明の2値）
+}
+
+def solid_color(rgba: np.ndarray) -> Optional[Tuple[int, int, int]]:
+    """透明でない画素がすべて同じ色ならその色（異なる色があればNone）"""
+    rgb = rgba[..., :3][rgba[..., 3] > 0]
+    if rgb.size == 0:
+        return (0, 0, 0)
+    first = rgb[0]
+    if not (rgb == first).all():
+        return None
+    return tuple(int(value) for value in first)
+
+def encode_png(rgba: np.ndarray, dpi: float, encoding: str = 'rgba') -> bytes:
+    """
+    RGBA配列をPNGにする
+
+    Args:
+        rgba (np.ndarray): (高さ, 幅, 4)のuint8配列
+        dpi (float): PNGに記録する解像度
+        encoding (str): PNG_ENCODINGSのいずれか。単色でない画像はRGBAのまま
+
+    Returns:
+        bytes: PNG
+    """
+    if encoding not in PNG_ENCODINGS:
+        raise ValueError(f"PNGのエンコード方式 '{encoding}' が見つかりません")
+
+    if PNG_ENCODINGS[encoding] is not None:
+        color = solid_color(rgba)
+        if color is not None:
+            levels, bits = PNG_ENCODINGS[encoding]
+            return _encode_indexed(rgba[..., 3], color, levels, bits, dpi)
+
+    buf = io.BytesIO()
+    Image.fromarray(rgba, 'RGBA').save(buf, format='PNG', dpi=(dpi, dpi))
+    return buf.getvalue()
+
+def reencode_png(data: bytes, encoding: str) -> bytes:
+    """PNGを指定の方式で作り直す（RGBAならそのまま）"""
+    if encoding == 'rgba':
+        return data
+
+    with Image.open(io.BytesIO(data)) as img:
+        dpi = img.info.get('dpi', (72, 72))[0]
+        rgba = np.asarray(img.convert('RGBA'))
+    return encode_png(rgba, dpi, encoding)
+
+def _encode_indexed(alpha: np.ndarray, color: Tuple[int, int, int], levels: int,
+                    bits: int, dpi: float) -> bytes:
+    """透明度をlevels段階に量子化したインデックスカラーのPNG"""
+    if levels == 2:
+        # 2値は半分以上の不透明度を字形とみなす
+        index = (alpha >= 128).astype(np.uint8)
+    else:
+        # 最も近い段階に丸める
+        index = ((alpha.astype(np.uint16) * (levels - 1) + 127) // 255).astype(np.uint8)
+
+    img = Image.fromarray(index, 'P')
+    img.putpalette(list(color) * levels)
+
+    # 各段階の透明度（tRNSチャンク）
+    transparency = bytes(round(i * 255 / (levels - 1)) for i in range(levels))
+
+    buf = io.BytesIO()
+    img.save(buf, format='PNG', dpi=(dpi, dpi), bits=bits, transparency=transparency)
+    return buf.getvalue()
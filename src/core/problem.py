@@ -0,0 +1,129 @@
+"""問題データの表現
+
+HTMLParserが返す問題を、辞書より小さな__slots__のオブジェクトで持つ。
+問題文と選択肢は解析時に (種類, 内容) の並びに分けておき、Word文書の生成や
+数式の収集では分け直さない。数式の文字列はsys.internで共有する
+（問題集では同じ数式が何度も現れる）。
+
+従来の辞書と同じく problem['title'] のように読み書きできる:
+'text' は {'type', 'content'} の辞書のリスト、'choices' は元の文字列のリスト。
+"""
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .math_tokenizer import split_math
+
+# (種類, 内容) 種類は'text'または'math'
+Token = Tuple[str, str]
+
+# 辞書として見たときのキー（raw_htmlは残した場合だけ）
+KEYS = ('title', 'text', 'equations', 'choices', 'mathml', 'raw_html')
+
+def _intern_tokens(tokens: Iterable[Token]) -> Tuple[Token, ...]:
+    return tuple((kind, sys.intern(content) if kind == 'math' else content)
+                 for kind, content in tokens)
+
+def _intern_mathml(mathml: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    if not mathml:
+        return None
+    return {sys.intern(latex_str): markup for latex_str, markup in mathml.items()}
+
+def tokenize_choice(choice: str) -> Tuple[Token, ...]:
+    """選択肢を文字列と数式に分ける（数式は前後の空白を除き、空のものは除く）"""
+    tokens = []
+    for kind, content in split_math(choice):
+        if kind == 'text':
+            tokens.append(('text', content))
+            continue
+        latex_str = content.strip()
+        if latex_str:
+            tokens.append(('math', sys.intern(latex_str)))
+    return tuple(tokens)
+
+class Problem(Mapping):
+    """
+    1つの問題
+
+    Attributes:
+        title: タイトル
+        text: 問題文の (種類, 内容) の並び（内容は前後の空白を除いたもの）
+        equations: 独立した数式
+        choices: 選択肢の元の文字列
+        choice_tokens: 選択肢ごとの (種類, 内容) の並び
+        mathml: LaTeX -> 元のMathML（なければNone）
+        raw_html: 問題のHTML（HTMLParserでkeep_raw_htmlのときだけ）
+    """
+
+    __slots__ = ('title', 'text', 'equations', 'choices', 'choice_tokens', 'mathml', 'raw_html')
+
+    def __init__(self, title: str = '', text: Iterable[Token] = (),
+                 equations: Iterable[str] = (), choices: Iterable[str] = (),
+                 mathml: Optional[Dict[str, str]] = None, raw_html: Optional[str] = None):
+        self.title = title
+        self.text = _intern_tokens(text)
+        self.equations = tuple(sys.intern(equation) for equation in equations)
+        self._set_choices(choices)
+        self.mathml = _intern_mathml(mathml)
+        self.raw_html = raw_html
+
+    def _set_choices(self, choices: Iterable[str]):
+        self.choices = tuple(choices)
+        self.choice_tokens = tuple(tokenize_choice(choice) for choice in self.choices)
+
+    @classmethod
+    def from_dict(cls, problem: Dict[str, Any]) -> 'Problem':
+        """従来の辞書から作る"""
+        return cls(
+            title=problem.get('title', ''),
+            text=[(element['type'], element['content']) for element in problem.get('text', ())],
+            equations=problem.get('equations', ()),
+            choices=problem.get('choices', ()),
+            mathml=problem.get('mathml'),
+            raw_html=problem.get('raw_html'),
+        )
+
+    def __getitem__(self, key: str):
+        if key == 'title':
+            return self.title
+        if key == 'text':
+            return [{'type': kind, 'content': content} for kind, content in self.text]
+        if key == 'equations':
+            return list(self.equations)
+        if key == 'choices':
+            return list(self.choices)
+        if key == 'mathml':
+            return self.mathml if self.mathml is not None else {}
+        if key == 'raw_html' and self.raw_html is not None:
+            return self.raw_html
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key == 'title':
+            self.title = value
+        elif key == 'text':
+            self.text = _intern_tokens((element['type'], element['content']) for element in value)
+        elif key == 'equations':
+            self.equations = tuple(sys.intern(equation) for equation in value)
+        elif key == 'choices':
+            self._set_choices(value)
+        elif key == 'mathml':
+            self.mathml = _intern_mathml(value)
+        elif key == 'raw_html':
+            self.raw_html = value
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return (key for key in KEYS if key != 'raw_html' or self.raw_html is not None)
+
+    def __len__(self) -> int:
+        return len(KEYS) if self.raw_html is not None else len(KEYS) - 1
+
+    def __repr__(self) -> str:
+        return (f'Problem(title={self.title!r}, text={self.text!r}, '
+                f'equations={self.equations!r}, choices={self.choices!r})')
+
+def as_problem(problem) -> Problem:
+    """Problemはそのまま、従来の辞書はProblemにして返す"""
+    return problem if isinstance(problem, Problem) else Problem.from_dict(problem)
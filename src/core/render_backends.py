@@ -0,0 +1,194 @@
+"""数式描画バックエンドの登録と選択
+
+描画エンジン（レンダラー）をバックエンドとして名前で登録する。
+バックエンドはレンダラーの描画メソッドに加えて、できること（capabilities）、
+数式が描画できるか（supports）、描画時間の見積もり（estimate_cost）を持つ。
+'auto'では数式ごとに、描画できるバックエンドのうち見積もりが最小のものを使う。
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .figure_renderer import get_shared_renderer, get_shared_trimmed_renderer
+from .latex_normalizer import tokenize_latex
+from .mathtext_renderer import get_shared_mathtext_renderer
+from .text_renderer import get_shared_text_renderer
+
+# 数式ごとにバックエンドを選ぶエンジン名
+AUTO_ENGINE = 'auto'
+
+# バックエンドのできること
+CAPABILITY_PNG = 'png'
+CAPABILITY_SVG = 'svg'
+CAPABILITY_BATCH = 'batch'  # 複数の数式を1回でまとめて描画できる
+
+class RenderBackend:
+    """名前・できること・描画時間の見積もりを持つレンダラー"""
+
+    def __init__(self, name: str, renderer, capabilities: Iterable[str], cost: tuple,
+                 supports: Callable[[str], bool] = None):
+        """
+        Args:
+            name: バックエンド名
+            renderer: レンダラー（render_png, render_many_png, render_svg, render_error_png）
+            capabilities: できること（CAPABILITY_*）
+            cost: 描画時間の見積もり（1数式あたりのミリ秒, 1トークンあたりのミリ秒）
+            supports: 描画できる数式か判定する関数（Noneならすべて描画を試みる）
+        """
+        self.name = name
+        self.renderer = renderer
+        self.capabilities = frozenset(capabilities)
+        self.cost = tuple(cost)
+        self._supports = supports
+
+    def supports(self, latex_str: str) -> bool:
+        """描画できる数式か"""
+        return self._supports is None or self._supports(latex_str)
+
+    def estimate_cost(self, latex_str: str, cost: tuple = None) -> float:
+        """描画時間の見積もり（ミリ秒、costを渡せばその係数で）"""
+        per_formula, per_token = cost or self.cost
+        return per_formula + per_token * len(tokenize_latex(latex_str))
+
+    def render_png(self, latex_str: str, font_size: float, color: str, dpi: float,
+                   target=None, encoding: str = 'rgba') -> bytes:
+        return self.renderer.render_png(latex_str, font_size, color, dpi, target, encoding)
+
+    def render_many_png(self, latex_list: List[str], font_size: float, color: str,
+                        dpi: float, target=None,
+                        encoding: str = 'rgba') -> List[Optional[bytes]]:
+        return self.renderer.render_many_png(latex_list, font_size, color, dpi, target,
+                                             encoding)
+
+    def render_svg(self, latex_str: str, font_size: float, color: str) -> bytes:
+        return self.renderer.render_svg(latex_str, font_size, color)
+
+    def render_error_png(self, dpi: float) -> bytes:
+        return self.renderer.render_error_png(dpi)
+
+# バックエンド名 -> バックエンドを作る関数
+_factories: Dict[str, Callable[[], RenderBackend]] = {}
+_backends: Dict[str, RenderBackend] = {}
+_lock = threading.Lock()
+
+def register_backend(name: str, factory: Callable[[], RenderBackend]):
+    """バックエンドを登録（初回の利用時にfactoryで作成し、プロセス内で共有する）"""
+    if name == AUTO_ENGINE:
+        raise ValueError(f"'{AUTO_ENGINE}' はバックエンド名に使えません")
+    with _lock:
+        _factories[name] = factory
+        _backends.pop(name, None)
+
+def backend_names() -> List[str]:
+    """登録済みのバックエンド名（登録順）"""
+    return list(_factories)
+
+def get_backend(name: str) -> RenderBackend:
+    """名前からバックエンドを取得"""
+    with _lock:
+        backend = _backends.get(name)
+        if backend is None:
+            if name not in _factories:
+                raise ValueError(f"描画エンジン '{name}' が見つかりません")
+            backend = _factories[name]()
+            _backends[name] = backend
+        return backend
+
+def load_costs(path: str) -> Dict[str, tuple]:
+    """bench_renderersで測った描画時間の係数を読み込む（読めなければ空）"""
+    try:
+        with open(Path(path).expanduser(), 'r', encoding='utf-8') as f:
+            costs = json.load(f)['costs']
+        return {name: tuple(cost) for name, cost in costs.items()}
+    except Exception as e:
+        print(f"描画時間の計測結果を読み込めません: {path}")
+        print(f"エラー内容: {str(e)}")
+        return {}
+
+class AutoBackend:
+    """数式ごとに最も速いと見積もられるバックエンドで描画するレンダラー"""
+
+    def __init__(self, backends: List[RenderBackend], costs: Dict[str, tuple] = None):
+        """
+        Args:
+            backends: 候補のバックエンド（先頭は代替画像の描画にも使う）
+            costs: バックエンド名 -> 描画時間の係数（ないものは既定の見積もり）
+        """
+        if not backends:
+            raise ValueError("描画エンジンの候補がありません")
+        self.backends = list(backends)
+        self.costs = costs or {}
+
+    def choose(self, latex_str: str, capability: str = CAPABILITY_PNG) -> RenderBackend:
+        """数式を描画できるバックエンドのうち見積もりが最小のもの"""
+        candidates = [backend for backend in self.backends
+                      if capability in backend.capabilities and backend.supports(latex_str)]
+        if not candidates:
+            raise ValueError(f"数式を描画できるエンジンがありません: {latex_str[:50]}")
+        return min(candidates, key=lambda backend: backend.estimate_cost(
+            latex_str, self.costs.get(backend.name)))
+
+    def render_png(self, latex_str: str, font_size: float, color: str, dpi: float,
+                   target=None, encoding: str = 'rgba') -> bytes:
+        return self.choose(latex_str).render_png(latex_str, font_size, color, dpi,
+                                                 target, encoding)
+
+    def render_many_png(self, latex_list: List[str], font_size: float, color: str,
+                        dpi: float, target=None,
+                        encoding: str = 'rgba') -> List[Optional[bytes]]:
+        """数式を選んだバックエンドごとにまとめて描画（描画できない数式はNone）"""
+        groups = {}
+        results = [None] * len(latex_list)
+        for i, latex_str in enumerate(latex_list):
+            try:
+                backend = self.choose(latex_str)
+            except ValueError:
+                continue
+            groups.setdefault(backend.name, (backend, []))[1].append(i)
+
+        for backend, indexes in groups.values():
+            images = backend.render_many_png([latex_list[i] for i in indexes], font_size,
+                                             color, dpi, target, encoding)
+            for i, data in zip(indexes, images):
+                results[i] = data
+        return results
+
+    def render_svg(self, latex_str: str, font_size: float, color: str) -> bytes:
+        return self.choose(latex_str, CAPABILITY_SVG).render_svg(latex_str, font_size, color)
+
+    def render_error_png(self, dpi: float) -> bytes:
+        return self.backends[0].render_error_png(dpi)
+
+def create_renderer(engine: str, config: dict = None):
+    """
+    設定に合わせたレンダラーを作成
+
+    Args:
+        engine: バックエンド名、または 'auto'
+        config: 'auto'の候補（math_auto_engines）と計測結果（math_backend_costs）を含む設定
+    """
+    if engine != AUTO_ENGINE:
+        return get_backend(engine)
+
+    config = config or {}
+    names = config.get('math_auto_engines') or backend_names()
+    costs_path = config.get('math_backend_costs')
+    return AutoBackend([get_backend(name) for name in names],
+                       load_costs(costs_path) if costs_path else None)
+
+# 組み込みのバックエンド
+# 描画時間の見積もりは既定の設定でdata/inputの数式を測った値（bench_renderers）
+register_backend('figure', lambda: RenderBackend(
+    'figure', get_shared_renderer(), (CAPABILITY_PNG, CAPABILITY_SVG), (10.6, 1.8)))
+register_backend('trim', lambda: RenderBackend(
+    'trim', get_shared_trimmed_renderer(),
+    (CAPABILITY_PNG, CAPABILITY_SVG, CAPABILITY_BATCH), (7.9, 1.2)))
+register_backend('mathtext', lambda: RenderBackend(
+    'mathtext', get_shared_mathtext_renderer(), (CAPABILITY_PNG, CAPABILITY_SVG), (4.0, 1.1)))
+
+def _create_text_backend() -> RenderBackend:
+    renderer = get_shared_text_renderer()
+    return RenderBackend('text', renderer, (CAPABILITY_PNG,), (0.9, 0.4), renderer.supports)
+
+register_backend('text', _create_text_backend)
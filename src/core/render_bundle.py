@@ -0,0 +1,133 @@
+"""数式画像バンドルモジュール
+
+事前にレンダリングした数式画像を1つのZIPファイルにまとめ、
+配布先のアプリから読み取り専用で利用できるようにする。
+バンドルには形式バージョンとスタイル指紋を記録し、
+現在の設定と一致しない古いバンドルは無視する。
+"""
+import json
+import os
+import sys
+import threading
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+# バンドル形式のバージョン
+BUNDLE_FORMAT_VERSION = 1
+
+# 既定のバンドルファイル名
+BUNDLE_FILENAME = 'formula_bundle.zip'
+
+_MANIFEST = 'manifest.json'
+
+def write_bundle(path: str, images: Dict[str, bytes], fingerprint: str,
+                 renderer_version: str) -> int:
+    """
+    バンドルを書き出す
+
+    Args:
+        path (str): 出力ファイル
+        images (Dict[str, bytes]): ストアキーとPNGの対応
+        fingerprint (str): スタイル指紋
+        renderer_version (str): 描画系のバージョン（matplotlibと出力形式の版）
+
+    Returns:
+        int: 収録した画像の数
+    """
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'fingerprint': fingerprint,
+        'renderer_version': renderer_version,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'count': len(images),
+    }
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    # PNGは圧縮済みのため無圧縮で格納する
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+        zf.writestr(_MANIFEST, json.dumps(manifest, indent=2))
+        for key, data in images.items():
+            zf.writestr(f'images/{key}.png', data)
+
+    return len(images)
+
+class RenderBundle:
+    """読み取り専用の数式画像バンドル"""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._zip = zipfile.ZipFile(self.path, 'r')
+        self.manifest = json.loads(self._zip.read(_MANIFEST))
+        self._names = set(self._zip.namelist())
+        self._lock = threading.Lock()
+
+    def is_compatible(self, fingerprint: str, renderer_version: str) -> bool:
+        """現在の設定で使えるバンドルか"""
+        return (self.manifest.get('format_version') == BUNDLE_FORMAT_VERSION
+                and self.manifest.get('fingerprint') == fingerprint
+                and self.manifest.get('renderer_version') == renderer_version)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """画像を取得（なければNone）"""
+        name = f'images/{key}.png'
+        if name not in self._names:
+            return None
+        with self._lock:
+            return self._zip.read(name)
+
+    def __len__(self):
+        return self.manifest.get('count', 0)
+
+def find_default_bundle() -> Optional[str]:
+    """既定の場所からバンドルを探す
+
+    環境変数MATHCONVERTER_BUNDLE、実行ファイルの同梱データ、
+    ユーザーディレクトリの順に探す。
+    """
+    candidates = []
+    if os.environ.get('MATHCONVERTER_BUNDLE'):
+        candidates.append(Path(os.environ['MATHCONVERTER_BUNDLE']))
+    if getattr(sys, 'frozen', False):
+        candidates.append(Path(getattr(sys, '_MEIPASS', '')) / BUNDLE_FILENAME)
+        candidates.append(Path(sys.executable).parent / BUNDLE_FILENAME)
+    candidates.append(Path.home() / '.mathconverter' / BUNDLE_FILENAME)
+
+    for candidate in candidates:
+        if candidate.is_file():
+            return str(candidate)
+    return None
+
+# パスごとに共有するバンドル（読み込めなかったものはNone）
+_bundles = {}
+_bundles_lock = threading.Lock()
+_warned = set()
+
+def load_bundle(path: str, fingerprint: str,
+                renderer_version: str) -> Optional[RenderBundle]:
+    """バンドルを読み込む（存在しない・古い場合はNone）"""
+    if path == 'auto':
+        path = find_default_bundle()
+    if not path:
+        return None
+
+    resolved = os.path.abspath(os.path.expanduser(str(path)))
+    with _bundles_lock:
+        if resolved not in _bundles:
+            try:
+                _bundles[resolved] = RenderBundle(resolved)
+            except Exception as e:
+                print(f"数式バンドルを読み込めません: {resolved}")
+                print(f"エラー内容: {str(e)}")
+                _bundles[resolved] = None
+        bundle = _bundles[resolved]
+
+    if bundle is None:
+        return None
+    if not bundle.is_compatible(fingerprint, renderer_version):
+        if (resolved, fingerprint) not in _warned:
+            _warned.add((resolved, fingerprint))
+            print(f"数式バンドルが現在の設定と一致しないため無視します: {resolved}")
+        return None
+    return bundle
@@ -0,0 +1,95 @@
+"""数式の並列レンダリングモジュール
+
+ワーカープロセスは起動時にmatplotlibを読み込んでMathConverterを用意し、
+正規化済みのLaTeXをまとめて受け取り、1枚のキャンバスに描画してPNGバイト列を返す。
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+# ワーカー内のMathConverter
+_worker_converter = None
+
+# フォント読み込みを済ませるための数式
+_WARMUP_FORMULA = r'\frac{a}{b}'
+
+def _init_worker(config: dict):
+    """ワーカーの初期化（matplotlibとフォントを読み込む）"""
+    global _worker_converter
+    from .math_converter import MathConverter
+
+    # キャッシュと永続ストアは親プロセス側で扱う
+    worker_config = dict(config, math_cache_max_bytes=0, math_store_path=None,
+                         math_bundle_path=None)
+    _worker_converter = MathConverter(worker_config)
+    try:
+        _worker_converter._render_png(_WARMUP_FORMULA)
+    except Exception:
+        pass
+
+# 1回にワーカーへ渡す数式の上限
+MAX_BATCH = 32
+
+def _render_in_worker(latex_list: List[str], context: Optional[str]):
+    """ワーカーで数式をまとめて描画（失敗した数式はNone）"""
+    return list(zip(latex_list, _worker_converter._render_many_png(latex_list, context)))
+
+class RenderPool:
+    """数式を複数プロセスで描画するプール"""
+
+    def __init__(self, config: dict, workers: int = None):
+        self.config = config
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """初回利用時にワーカーを起動"""
+        if self._executor is None:
+            # forkではGUIのスレッドが持つロック（描画の準備中のMATHTEXT_LOCKなど）が
+            # 取得されたまま子プロセスに写り、ワーカーが止まるためspawnで起動する
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.config,)
+            )
+        return self._executor
+
+    def render(self, formulas: Iterable[str],
+               context: str = None) -> Dict[str, Optional[bytes]]:
+        """
+        正規化済みの数式をまとめて描画
+
+        Args:
+            formulas (Iterable[str]): 正規化済みLaTeX（重複可）
+            context (str, optional): 数式を置く場所（MathConverter.latex_to_imageを参照）
+
+        Returns:
+            Dict[str, Optional[bytes]]: 数式ごとのPNG（失敗した数式はNone）
+        """
+        distinct = list(dict.fromkeys(formulas))
+        if not distinct:
+            return {}
+
+        # ワーカーごとに数回ずつ受け取れる大きさに分ける
+        size = min(MAX_BATCH, max(1, len(distinct) // (self.workers * 4)))
+        batches = [distinct[i:i + size] for i in range(0, len(distinct), size)]
+
+        results = {}
+        contexts = [context] * len(batches)
+        for batch in self._get_executor().map(_render_in_worker, batches, contexts):
+            results.update(batch)
+        return results
+
+    def close(self):
+        """ワーカーを終了"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
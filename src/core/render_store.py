@@ -0,0 +1,240 @@
+"""数式画像の永続ストアモジュール
+
+SQLite（WALモード）に内容アドレス方式で画像を保存し、
+実行をまたいで、また複数のワーカープロセス間でレンダリング結果を共有する。
+
+使用方法:
+    python src/core/render_store.py stats
+    python src/core/render_store.py gc --max-mb 256
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+# 既定の保存先と容量上限
+DEFAULT_STORE_PATH = '~/.mathconverter/formula_store.sqlite3'
+DEFAULT_STORE_BYTES = 512 * 1024 * 1024
+
+# 上限超過を確認する間隔（登録件数）
+GC_CHECK_INTERVAL = 64
+
+# GC後に残す容量の割合
+GC_TARGET_RATIO = 0.9
+
+# 取得時に最終参照時刻を更新する間隔（秒）
+# これより新しく参照された画像は更新しない（GCの順序はこの精度で十分）
+ACCESS_REFRESH_INTERVAL = 3600
+
+# fork前に開かれていた接続（子プロセスでは閉じずに持っておく）
+# 閉じるとファイルのロックがプロセスごと外れ、子プロセス自身の接続のロックも失われる
+_inherited_connections = []
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_images_last_access ON images(last_access);
+"""
+
+def make_store_key(*parts) -> str:
+    """描画内容を一意に表すキー（SHA-256）"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+class RenderStore:
+    """数式画像の永続ストア
+
+    書き込みはINSERT OR IGNOREのみで、同じキーには常に同じ内容が入るため、
+    複数プロセスが同時に読み書きしても整合性が保たれる。
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH,
+                 max_bytes: int = DEFAULT_STORE_BYTES):
+        self.path = Path(os.path.expanduser(str(path)))
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._puts = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッド・プロセスごとの接続を取得"""
+        conn = getattr(self._local, 'conn', None)
+        # fork後の子プロセスでは親の接続を使わない
+        if conn is not None:
+            if self._local.pid == os.getpid():
+                return conn
+            _inherited_connections.append(conn)
+
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        """画像を取得（なければNone）"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT data, last_access FROM images WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        if now - row[1] >= ACCESS_REFRESH_INTERVAL:
+            conn.execute(
+                'UPDATE images SET last_access = ? WHERE key = ?',
+                (now, key)
+            )
+        return bytes(row[0])
+
+    def put(self, key: str, data: bytes):
+        """画像を登録"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR IGNORE INTO images (key, data, size, created, last_access) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (key, sqlite3.Binary(data), len(data), now, now)
+        )
+
+        # 定期的に容量を確認
+        self._puts += 1
+        if self.max_bytes and self._puts % GC_CHECK_INTERVAL == 0:
+            if self.total_bytes() > self.max_bytes:
+                self.gc(int(self.max_bytes * GC_TARGET_RATIO))
+
+    def total_bytes(self) -> int:
+        """保存済み画像の合計サイズ"""
+        row = self._connect().execute(
+            'SELECT COALESCE(SUM(size), 0) FROM images'
+        ).fetchone()
+        return row[0]
+
+    def gc(self, max_bytes: int = None) -> int:
+        """最終参照の古い順に削除して容量を上限以下にする
+
+        Returns:
+            int: 削除した件数
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            total = conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM images'
+            ).fetchone()[0]
+
+            removed = []
+            if total > max_bytes:
+                rows = conn.execute(
+                    'SELECT key, size FROM images ORDER BY last_access'
+                )
+                for key, size in rows:
+                    if total <= max_bytes:
+                        break
+                    removed.append((key,))
+                    total -= size
+
+            conn.executemany('DELETE FROM images WHERE key = ?', removed)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        return len(removed)
+
+    def stats(self) -> dict:
+        """統計情報を取得"""
+        conn = self._connect()
+        count, total, oldest, newest = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), '
+            'MIN(last_access), MAX(last_access) FROM images'
+        ).fetchone()
+
+        return {
+            'path': str(self.path),
+            'entries': count,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'oldest_access': oldest,
+            'newest_access': newest,
+        }
+
+    def close(self):
+        """このスレッドの接続を閉じる"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+# パスごとに共有するストア
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(path: str = DEFAULT_STORE_PATH,
+              max_bytes: int = DEFAULT_STORE_BYTES) -> RenderStore:
+    """プロセス内で共有するストアを取得"""
+    resolved = os.path.abspath(os.path.expanduser(str(path)))
+    with _stores_lock:
+        store = _stores.get(resolved)
+        if store is None:
+            store = RenderStore(resolved, max_bytes)
+            _stores[resolved] = store
+        return store
+
+def main():
+    """コマンドライン実行"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='数式画像ストアの管理')
+    parser.add_argument('--path', default=DEFAULT_STORE_PATH, help='ストアのパス')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('stats', help='統計情報を表示')
+
+    gc_parser = sub.add_parser('gc', help='古い画像を削除')
+    gc_parser.add_argument('--max-mb', type=float,
+                           default=DEFAULT_STORE_BYTES / (1024 * 1024),
+                           help='残す容量の上限（MB）')
+
+    args = parser.parse_args()
+
+    if not Path(os.path.expanduser(args.path)).exists():
+        print(f"エラー: {args.path} が見つかりません")
+        return 1
+
+    store = RenderStore(args.path)
+
+    if args.command == 'stats':
+        stats = store.stats()
+        print(f"ストア: {stats['path']}")
+        print(f"  件数: {stats['entries']}")
+        print(f"  容量: {stats['bytes'] / (1024 * 1024):.1f} MB")
+    elif args.command == 'gc':
+        removed = store.gc(int(args.max_mb * 1024 * 1024))
+        print(f"{removed}件を削除しました")
+        print(f"  容量: {store.total_bytes() / (1024 * 1024):.1f} MB")
+
+    return 0
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -1,4 +1,6 @@
 """統一スタイル設定"""
+import hashlib
+import json
 
 STYLE_CONFIG = {
     # 数式画像設定
@@ -7,10 +9,76 @@ STYLE_CONFIG = {
     'math_color': 'black',
     'math_background': 'transparent',
     
+    # 数式の書き込み方（'image': 画像、'omml': Wordの数式。変換できない数式は画像にする）
+    'math_mode': 'image',
+    
+    # 文字と記号だけで書けるインライン数式（x, x^2, n+1 など）は画像にせず文字にする
+    # （英字は斜体、添字はUnicodeの上付き・下付き文字）
+    'math_plain_text': True,
+    'math_plain_commands': None,  # 文字にしてよいコマンド（Noneで既定の一覧）
+    'math_text_font': 'Cambria Math',
+    
+    # 数式の埋め込み形式（'png': 画像のみ、'svg': SVGとPNGの代替画像）
+    'math_format': 'png',
+    # SVGモードの代替PNG（SVGに対応しないアプリだけが表示する）の実効解像度（ppi）と
+    # エンコード方式。文書が大きくならないよう粗く描画する
+    'math_svg_fallback_ppi': 96,
+    'math_svg_fallback_encoding': 'palette1',
+    
+    # PNGのエンコード方式（'rgba': 32bit、'palette8'/'palette4'/'palette1':
+    # 単色の数式を透明度256/16/2段階のパレット画像にする）
+    'math_png_encoding': 'palette4',
+    
+    # 描画エンジン（'figure': 図を使う従来方式、'trim': 1回描画して切り抜き、
+    # 'mathtext': 図を使わず直接描画、'text': 単純な数式の字形を直接並べる、
+    # 'auto': 数式ごとに描画できるエンジンのうち最も速いと見積もられるもの）
+    'math_engine': 'trim',
+    'math_auto_engines': None,  # 'auto'で選ぶ候補（Noneで登録済みのすべて）
+    'math_backend_costs': None,  # bench_renderersで測った描画時間（JSON、Noneで既定の見積もり）
+    
+    # 数式を監視付きのワーカープロセスで描画する（描画が終わらない・メモリを使い果たす
+    # 数式があっても変換全体を止めない）。制限を超えた数式はエラー画像にする
+    'math_isolation': False,
+    'math_isolation_workers': 1,
+    'math_render_timeout': 10.0,  # 1数式あたりの制限時間（秒）
+    'math_render_max_rss': 1024 * 1024 * 1024,  # ワーカーのメモリ上限（バイト、Noneで無制限）
+    
+    # 数式画像キャッシュの上限（バイト、0で無効）
+    'math_cache_max_bytes': 64 * 1024 * 1024,
+    
+    # 数式画像の永続ストア（Noneで無効）
+    'math_store_path': '~/.mathconverter/formula_store.sqlite3',
+    'math_store_max_bytes': 512 * 1024 * 1024,
+    
+    # 事前レンダリング済みバンドル（'auto'で既定の場所を探す、Noneで無効）
+    'math_bundle_path': 'auto',
+    
+    # 数式の並列プリフェッチ（ワーカー数はNoneでCPU数）
+    'math_prefetch': True,
+    'math_prefetch_workers': None,
+    'math_prefetch_min_formulas': 16,
+    # 問題をイテレーターで渡したときに、まとめて描画する問題数
+    'math_prefetch_window': 50,
+    
+    # GUIの起動時に描画エンジンをバックグラウンドで準備（最初の変換を速くする）
+    'math_warmup': True,
+    
+    # HTMLの解析エンジン（'html.parser', 'lxml', 'lxml-xpath'）
+    # lxmlは速いが、入れ子の誤ったHTML（<p>内の<div>など）の直し方がhtml.parserと異なる
+    'html_parser_engine': 'html.parser',
+    # 問題のHTMLを問題データ（raw_html）に残す（文書の生成では使わない）
+    'html_keep_raw_html': False,
+    
     # インライン数式の高さ設定（ポイント単位）
     'inline_math_height': 8,
+    'choice_math_height': None,  # Noneでインライン数式と同じ
     'display_math_width': 2.5,
     
+    # 数式画像の文書上の実効解像度（ppi）
+    # 上の大きさに縮小したときにこの解像度になるよう描画解像度を下げる
+    # （Noneで常にmath_dpiで描画）
+    'math_target_ppi': 300,
+    
     # テキストスタイル
     'title_font': 'MS Gothic',
     'title_size': 16,
@@ -51,3 +119,35 @@ TEMPLATES = {
         'answer_space': True,
     }
 }
+
+# 数式画像の見た目に影響する設定キー
+MATH_STYLE_KEYS = (
+    'math_dpi',
+    'math_font_size',
+    'math_color',
+    'math_background',
+    'math_engine',
+    'math_png_encoding',
+)
+
+# 'auto'のとき数式画像の見た目に影響する設定キー（エンジンの選び方）
+AUTO_ENGINE_STYLE_KEYS = (
+    'math_auto_engines',
+    'math_backend_costs',
+)
+
+# SVGモードのとき数式画像（代替PNG）の見た目に影響する設定キー
+SVG_FALLBACK_STYLE_KEYS = (
+    'math_svg_fallback_ppi',
+    'math_svg_fallback_encoding',
+)
+
+def style_fingerprint(config: dict) -> str:
+    """数式関連の設定から指紋（短いハッシュ）を生成"""
+    values = {key: config.get(key) for key in MATH_STYLE_KEYS}
+    if config.get('math_engine') == 'auto':
+        values.update({key: config.get(key) for key in AUTO_ENGINE_STYLE_KEYS})
+    if config.get('math_format') == 'svg':
+        values.update({key: config.get(key) for key in SVG_FALLBACK_STYLE_KEYS})
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
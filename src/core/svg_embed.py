@@ -0,0 +1,63 @@
+"""Word文書へのSVG画像の埋め込み
+
+Word 2016以降は、画像（a:blip）の拡張要素asvg:svgBlipでSVGパーツを参照する。
+SVGに対応しないアプリケーションはa:blipが参照するPNGを代わりに表示するため、
+python-docxで通常どおりPNGを挿入し、そこへSVGを添付する。
+"""
+import hashlib
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.part import Part
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from lxml import etree
+
+# a:blipの拡張要素（Office 2016のSVG拡張）
+SVG_BLIP_URI = '{96DAC541-7B7A-43D3-8B79-37D633B846F1}'
+ASVG_NAMESPACE = 'http://schemas.microsoft.com/office/drawing/2016/SVG/main'
+SVG_CONTENT_TYPE = 'image/svg+xml'
+SVG_PARTNAME_TEMPLATE = '/word/media/image%d.svg'
+
+class SvgEmbedder:
+    """挿入済みの画像にSVGを添付する（文書ごとに作成）
+
+    同じSVGは1つのパーツを共有する。
+    """
+
+    def __init__(self):
+        self._parts = {}
+
+    def attach(self, inline_shape, svg: bytes, part):
+        """
+        画像にSVGを添付
+
+        Args:
+            inline_shape: run.add_pictureが返したInlineShape（PNGの代替画像）
+            svg (bytes): SVGデータ
+            part: 画像を含むパーツ（run.part）
+        """
+        rel_id = part.relate_to(self._get_part(svg, part.package), RT.IMAGE)
+
+        blip = inline_shape._inline.graphic.graphicData.pic.blipFill.blip
+        ext_list = blip.find(qn('a:extLst'))
+        if ext_list is None:
+            ext_list = OxmlElement('a:extLst')
+            blip.append(ext_list)
+
+        ext = OxmlElement('a:ext')
+        ext.set('uri', SVG_BLIP_URI)
+        svg_blip = etree.SubElement(
+            ext, f'{{{ASVG_NAMESPACE}}}svgBlip', nsmap={'asvg': ASVG_NAMESPACE}
+        )
+        svg_blip.set(qn('r:embed'), rel_id)
+        ext_list.append(ext)
+
+    def _get_part(self, svg: bytes, package) -> Part:
+        """SVGのパーツ（同じ内容なら共有）"""
+        digest = hashlib.sha1(svg).hexdigest()
+        svg_part = self._parts.get(digest)
+        if svg_part is None:
+            partname = package.next_partname(SVG_PARTNAME_TEMPLATE)
+            svg_part = Part(partname, SVG_CONTENT_TYPE, svg, package)
+            self._parts[digest] = svg_part
+        return svg_part
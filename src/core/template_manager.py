@@ -1,6 +1,4 @@
 """テンプレート管理モジュール（修正版）"""
-from docx.shared import Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 
 class TemplateManager:
     def __init__(self, templates):
@@ -8,6 +6,10 @@ class TemplateManager:
     
     def apply_template(self, doc, template_name, **kwargs):
         """テンプレートを文書に適用"""
+        # 一覧の表示だけならpython-docxを読み込まない
+        from docx.shared import Pt
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        
         if template_name not in self.templates:
             raise ValueError(f"テンプレート '{template_name}' が見つかりません")
         
@@ -0,0 +1,183 @@
+"""単純な数式の文字描画レンダラー
+
+x^2 + 1 のように文字と記号だけで書ける数式を、mathtextの解析を通さず
+フォントの字形を並べて直接ラスタライズする。並べる文字はWordに文字で
+書き込むときと同じもの（plain_math.PlainMathConverterの結果）で、
+添字は小さくずらして置く。
+"""
+import threading
+from typing import List, Optional
+
+import numpy as np
+from matplotlib.colors import to_rgba
+from matplotlib.font_manager import FontProperties, findfont, get_font
+
+from .figure_renderer import MATHTEXT_LOCK, fit_dpi, get_shared_renderer
+from .plain_math import DEFAULT_PLAIN_COMMANDS, SUBSCRIPTS, SUPERSCRIPTS, PlainMathConverter
+from .png_encoder import encode_png
+
+# 字形を並べるフォント（matplotlibに同梱、数学記号とギリシャ文字を含む）
+TEXT_FONT_FAMILY = 'STIXGeneral'
+
+# 添字の大きさと上下のずれ（本文の文字の大きさに対する比）
+SCRIPT_SCALE = 0.7
+SUPERSCRIPT_RISE = 0.35
+SUBSCRIPT_DROP = 0.15
+
+# 上付き・下付き文字 -> 元の文字
+_SUPERSCRIPT_CHARACTERS = {script: char for char, script in SUPERSCRIPTS.items()}
+_SUBSCRIPT_CHARACTERS = {script: char for char, script in SUBSCRIPTS.items()}
+
+# 数式の周囲の余白（インチ）。他のレンダラーと同じ見た目にそろえる
+PAD_INCHES = 0.1
+
+# 目標の大きさに合わせる際、寸法を測るための解像度
+MEASURE_DPI = 72
+
+class TextRenderer:
+    """フォントの字形を直接並べる単純な数式のレンダラー"""
+
+    def __init__(self, commands=DEFAULT_PLAIN_COMMANDS, fallback=None):
+        self._converter = PlainMathConverter(commands)
+        # 斜体かどうか -> フォント
+        self._fonts = {
+            italic: get_font(findfont(
+                FontProperties(family=TEXT_FONT_FAMILY,
+                               style='italic' if italic else 'normal'),
+                fallback_to_default=False
+            ))
+            for italic in (False, True)
+        }
+        # SVGと代替画像の描画にはFigureRendererを使う
+        self._fallback = fallback or get_shared_renderer()
+
+    def supports(self, latex_str: str) -> bool:
+        """字形を並べるだけで描画できる数式か"""
+        return self._runs(latex_str) is not None
+
+    def _runs(self, latex_str: str):
+        """(文字列, 斜体か, 添字の種類) の並び（描画できない数式はNone）
+
+        Unicodeの上付き・下付き文字は元の文字に戻し、小さくずらして描画する。
+        """
+        segments = self._converter.convert(latex_str)
+        if segments is None:
+            return None
+
+        runs = []
+        for text, italic in segments:
+            for char in text:
+                script = None
+                if char in _SUPERSCRIPT_CHARACTERS:
+                    char, script = _SUPERSCRIPT_CHARACTERS[char], 'sup'
+                elif char in _SUBSCRIPT_CHARACTERS:
+                    char, script = _SUBSCRIPT_CHARACTERS[char], 'sub'
+                char_italic = char.isalpha() if script else italic
+                if not char.isspace() and self._fonts[char_italic].get_char_index(ord(char)) == 0:
+                    return None
+                if runs and runs[-1][1:] == (char_italic, script):
+                    runs[-1] = (runs[-1][0] + char, char_italic, script)
+                else:
+                    runs.append((char, char_italic, script))
+        return runs
+
+    def _layout(self, runs, font_size: float, dpi: float) -> np.ndarray:
+        """区切りごとに字形を描画し、ベースラインをそろえて並べた濃さの配列"""
+        em = font_size * dpi / 72
+        pieces = []
+        pen = 0.0
+        with MATHTEXT_LOCK:
+            for text, italic, script in runs:
+                font = self._fonts[italic]
+                font.set_size(font_size * (SCRIPT_SCALE if script else 1), dpi)
+                font.set_text(text, 0.0)
+                font.draw_glyphs_to_bitmap(antialiased=True)
+                image = np.asarray(font.get_image()).copy()
+                left = pen + font.get_bitmap_offset()[0] / 64
+                # ベースラインから字形の下端までの高さ（添字はずらす）
+                rise = {'sup': SUPERSCRIPT_RISE, 'sub': -SUBSCRIPT_DROP}.get(script, 0) * em
+                bottom = rise - font.get_descent() / 64
+                pieces.append((image, left, bottom))
+                pen += sum(font.load_char(ord(char)).horiAdvance for char in text) / 64
+
+        left = min(piece_left for _, piece_left, _ in pieces)
+        right = max(piece_left + image.shape[1] for image, piece_left, _ in pieces)
+        top = max(bottom + image.shape[0] for image, _, bottom in pieces)
+        bottom = min(piece_bottom for _, _, piece_bottom in pieces)
+
+        mask = np.zeros((int(np.ceil(top - bottom)), int(np.ceil(right - left))), np.uint8)
+        for image, piece_left, piece_bottom in pieces:
+            y = int(round(top - (piece_bottom + image.shape[0])))
+            x = int(round(piece_left - left))
+            area = mask[y:y + image.shape[0], x:x + image.shape[1]]
+            np.maximum(area, image[:area.shape[0], :area.shape[1]], out=area)
+        return mask
+
+    def _render(self, latex_str: str, font_size: float, color: str,
+                dpi: float, target) -> tuple:
+        """数式を描画して(RGBA配列, 解像度)を返す"""
+        runs = self._runs(latex_str)
+        if runs is None:
+            raise ValueError(f"文字で描画できない数式です: {latex_str[:50]}")
+
+        if target is not None:
+            mask = self._layout(runs, font_size, MEASURE_DPI)
+            size = (mask.shape[1] / MEASURE_DPI + 2 * PAD_INCHES,
+                    mask.shape[0] / MEASURE_DPI + 2 * PAD_INCHES)
+            dpi = fit_dpi(size, target, dpi)
+        mask = self._layout(runs, font_size, dpi)
+        height, width = mask.shape
+        pad = int(round(PAD_INCHES * dpi))
+
+        # 数式の色で塗り、描画結果を透明度として使う
+        r, g, b, a = to_rgba(color)
+        rgba = np.zeros((height + 2 * pad, width + 2 * pad, 4), np.uint8)
+        rgba[..., 0] = round(r * 255)
+        rgba[..., 1] = round(g * 255)
+        rgba[..., 2] = round(b * 255)
+        rgba[pad:pad + height, pad:pad + width, 3] = (mask * a).astype(np.uint8)
+        return rgba, dpi
+
+    def render_png(self, latex_str: str, font_size: float, color: str,
+                   dpi: float, target=None, encoding: str = 'rgba') -> bytes:
+        """
+        数式をPNGに描画
+
+        Raises:
+            ValueError: 文字で描画できない数式の場合
+        """
+        rgba, dpi = self._render(latex_str, font_size, color, dpi, target)
+        return encode_png(rgba, dpi, encoding)
+
+    def render_many_png(self, latex_list: List[str], font_size: float, color: str,
+                        dpi: float, target=None,
+                        encoding: str = 'rgba') -> List[Optional[bytes]]:
+        """複数の数式を1つずつ描画（描画できない数式はNone）"""
+        results = []
+        for latex_str in latex_list:
+            try:
+                results.append(self.render_png(latex_str, font_size, color, dpi,
+                                               target, encoding))
+            except Exception:
+                results.append(None)
+        return results
+
+    def render_svg(self, latex_str: str, font_size: float, color: str) -> bytes:
+        """数式をSVGに描画（FigureRendererのSVG出力を使う）"""
+        return self._fallback.render_svg(latex_str, font_size, color)
+
+    def render_error_png(self, dpi: float) -> bytes:
+        """数式エラーを示す代替画像を描画"""
+        return self._fallback.render_error_png(dpi)
+
+# プロセス内で共有するレンダラー
+_shared_renderer = None
+_shared_lock = threading.Lock()
+
+def get_shared_text_renderer() -> TextRenderer:
+    """既定のコマンド一覧で共有するレンダラーを取得"""
+    global _shared_renderer
+    with _shared_lock:
+        if _shared_renderer is None:
+            _shared_renderer = TextRenderer()
+        return _shared_renderer
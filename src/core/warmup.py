@@ -0,0 +1,118 @@
+"""描画エンジンのバックグラウンド準備
+
+GUIの起動直後に、変換で使うモジュール（matplotlib, python-docx など）の読み込み、
+フォントと数式パーサーの初期化、代表的な数式の描画を別スレッドで済ませておく。
+描画結果はプロセス内で共有するキャッシュに入るため、最初の変換から速く動く。
+準備はいつでも取り消せる（描画中の1数式が終わった時点で止まる）。
+"""
+import threading
+import time
+from typing import Optional
+
+# 変換の開始時に準備が止まるまで待つ秒数（描画中の1数式が終わるまで）
+CANCEL_TIMEOUT = 5.0
+
+# 準備で描画する数式: (LaTeX, 文脈)
+# よく使う構文（分数・根号・総和・積分・括弧・ギリシャ文字・添字）とフォントを一通り含む
+WARMUP_FORMULAS = (
+    (r'x^2 + 1', 'inline'),
+    (r'\frac{a}{b}', 'inline'),
+    (r'\sqrt{2}', 'inline'),
+    (r'\alpha + \beta = \gamma', 'inline'),
+    (r'a_n = a_1 + (n-1)d', 'inline'),
+    (r'\sum_{k=1}^{n} k = \frac{n(n+1)}{2}', 'display'),
+    (r'\int_{0}^{1} f(x)\,dx', 'display'),
+    (r'\left( \frac{1}{2} \right)^{n}', 'display'),
+    (r'\lim_{x \to \infty} \left(1 + \frac{1}{x}\right)^{x} = e', 'display'),
+    (r'\overrightarrow{AB} \cdot \overrightarrow{AC}', 'display'),
+    (r'\sin\theta \leq 1', 'choice'),
+    (r'\mathrm{A}', 'choice'),
+)
+
+class RendererWarmup:
+    """描画エンジンを別スレッドで準備する"""
+
+    def __init__(self, config: dict, formulas=WARMUP_FORMULAS):
+        """
+        Args:
+            config: 変換で使う設定（同じ設定のMathConverterとキャッシュを準備する）
+            formulas: 描画しておく数式（(LaTeX, 文脈)の並び）
+        """
+        self.config = config
+        self.formulas = tuple(formulas)
+        self.rendered = 0
+        self.elapsed = None
+        self.error = None
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'RendererWarmup':
+        """準備を始める（すぐに戻る）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='renderer-warmup',
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def cancel(self, timeout: Optional[float] = None):
+        """
+        準備を取り消す
+
+        Args:
+            timeout: 止まるまで待つ秒数（Noneなら待たない）
+        """
+        self._cancelled.set()
+        if timeout is not None:
+            self.wait(timeout)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """準備が終わるまで待つ（終わっていればTrue）"""
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self._warm_up()
+        except Exception as e:
+            # 準備に失敗しても変換は通常どおり動く
+            self.error = e
+            print(f"描画エンジンの準備に失敗しました: {str(e)}")
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+    def _warm_up(self):
+        if self.cancelled:
+            return
+        # 変換で使うモジュールを読み込む（HTMLの解析とWord文書の生成を含む）
+        from .html_parser import HTMLParser
+        from .math_converter import MathConverter
+        from .word_generator import WordGenerator
+
+        if self.cancelled:
+            return
+        # ストア・バンドル・レンダラー（隔離描画ならワーカー）を用意する
+        converter = MathConverter(self.config)
+        svg = self.config.get('math_format', 'png') == 'svg'
+
+        for latex_str, context in self.formulas:
+            if self.cancelled:
+                return
+            converter.latex_to_image(latex_str, context)
+            if svg:
+                converter.latex_to_svg(latex_str)
+            self.rendered += 1
+            # 描画の合間にメインスレッドへGILを譲る
+            time.sleep(0)
+
+def start_warmup(config: dict) -> Optional[RendererWarmup]:
+    """設定で有効ならバックグラウンドの準備を始める（無効ならNone）"""
+    if not config.get('math_warmup', True):
+        return None
+    return RendererWarmup(config).start()
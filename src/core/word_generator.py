@@ -3,30 +3,231 @@ from docx import Document
 from docx.shared import Pt, Cm, RGBColor, Inches
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.oxml.ns import qn
-from typing import List, Dict, Any
-import re
+from collections.abc import Sequence
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+import io
+
+from .formula_collector import iter_formulas_with_context
+from .latex_normalizer import canonicalize_latex
+from .omml_converter import OmmlConverter
+from .plain_math import DEFAULT_PLAIN_COMMANDS, PlainMathConverter
+from .problem import Problem, Token, as_problem
+from .render_pool import RenderPool
+from .svg_embed import SvgEmbedder
+
+def _windows(problems: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Problem]]:
+    """問題をsize問ずつのリストに分ける（必要になるまで読まない）"""
+    iterator = map(as_problem, problems)
+    while True:
+        window = list(islice(iterator, max(1, size)))
+        if not window:
+            return
+        yield window
 
 class WordGenerator:
-    def __init__(self, style_config: dict, math_converter):
+    def __init__(self, style_config: dict, math_converter, render_pool: RenderPool = None):
+        """
+        Args:
+            style_config: スタイル設定
+            math_converter: MathConverter
+            render_pool: プリフェッチに使うプール（GUIのように文書をまたいで使い回す場合。
+                Noneなら必要になったときに作り、close()で終了する）
+        """
         self.config = style_config
         self.math_converter = math_converter
         self.problem_counter = 0
+        
+        # 並列プリフェッチ（渡されたプールは呼び出し側が終了する）
+        self._render_pool = render_pool
+        self._owns_render_pool = render_pool is None
+        self._prefetched = {}
+        
+        # SVG埋め込み（文書ごと）
+        self._svg_embedder = None
+        
+        # Wordの数式への変換（MathMLの数式と、math_mode が 'omml' のときのLaTeX）
+        self._omml_converter = OmmlConverter(style_config.get('body_font'))
+        self._mathml_sources = {}
+        
+        # 単純なインライン数式の文字化
+        self._plain_converter = None
+        if style_config.get('math_plain_text', False):
+            self._plain_converter = PlainMathConverter(
+                style_config.get('math_plain_commands') or DEFAULT_PLAIN_COMMANDS
+            )
+        
+        # 生成中の文書での数式の書き込み方ごとの件数（'text', 'omml', 'image'）
+        self._math_counts = {'text': 0, 'omml': 0, 'image': 0}
     
-    def create_document(self, problems: List[Dict[str, Any]]) -> Document:
-        """複数の問題からWord文書を生成"""
+    def create_document(self, problems: Iterable[Dict[str, Any]]) -> Document:
+        """
+        複数の問題からWord文書を生成
+        
+        problemsはProblemまたは従来の辞書の並びで、リストのほか、
+        HTMLParser.iter_problemsのようなイテレーターでもよい。
+        イテレーターは math_prefetch_window 問ずつ読み進め、その中の数式を描画してから
+        書き込むため、解析・描画・組み立てが交互に進み、全体を読み込まずに済む。
+        """
         doc = Document()
         self._apply_global_style(doc)
+        self.problem_counter = 0
+        self._math_counts = {'text': 0, 'omml': 0, 'image': 0}
         
-        for i, problem in enumerate(problems):
-            self.problem_counter = i + 1
-            self._add_problem(doc, problem)
-            
-            # 大問間の間隔（最後の問題以外）
-            if i < len(problems) - 1:
-                doc.add_paragraph()
+        if self.config.get('math_format', 'png') == 'svg':
+            self._svg_embedder = SvgEmbedder()
+        
+        # リストはまとめて、イテレーターは決まった問題数ずつ処理する
+        if isinstance(problems, Sequence):
+            windows = [[as_problem(problem) for problem in problems]]
+        else:
+            windows = _windows(problems, self.config.get('math_prefetch_window', 50))
+        
+        try:
+            for window in windows:
+                # MathMLで入力された数式（LaTeX -> MathML）
+                for problem in window:
+                    self._mathml_sources.update(problem.mathml or {})
+                
+                # 数式をまとめて先に描画しておく
+                self._prefetched = {}
+                self._prefetch_formulas(window)
+                
+                for problem in window:
+                    # 大問間の間隔（最初の問題の前には入れない）
+                    if self.problem_counter:
+                        doc.add_paragraph()
+                    self.problem_counter += 1
+                    self._add_problem(doc, problem)
+        finally:
+            self._prefetched = {}
+            self._svg_embedder = None
+            self._mathml_sources = {}
         
         return doc
     
+    def _prefetch_formulas(self, problems: List[Problem]):
+        """文書中の異なる数式をまとめて描画（多ければ複数プロセスで）"""
+        if not self.config.get('math_prefetch', False):
+            return
+        
+        # 描画済みのものを除いた異なる数式（置かれる場所ごと）
+        pending = {}
+        seen = set()
+        for latex_str, context in iter_formulas_with_context(problems):
+            canonical = canonicalize_latex(latex_str)
+            if not canonical or (canonical, context) in seen:
+                continue
+            seen.add((canonical, context))
+            # 文字やWordの数式にするものは描画しない
+            if context != 'display' and self._to_plain(latex_str) is not None:
+                continue
+            if self._to_omml(latex_str) is not None:
+                continue
+            if self.math_converter.lookup(canonical, context) is None:
+                pending.setdefault(context, []).append(canonical)
+        
+        # 少数ならプロセス起動のほうが高くつくため、このプロセスでまとめて描画
+        # （隔離描画ではMathConverterのワーカーが制限付きで描画する）
+        total = sum(len(formulas) for formulas in pending.values())
+        if (total < self.config.get('math_prefetch_min_formulas', 16)
+                or self.math_converter.isolated):
+            for context, formulas in pending.items():
+                images = self.math_converter.render_many(formulas, context)
+                for canonical, buf in zip(formulas, images):
+                    self._prefetched[canonical, context] = buf.getvalue()
+            return
+        
+        pool = self._get_render_pool()
+        for context, formulas in pending.items():
+            for canonical, data in pool.render(formulas, context).items():
+                # 失敗した数式は組み立て時に通常の経路でエラー画像になる
+                if data is not None:
+                    self.math_converter.add_rendered(canonical, data, context)
+                    self._prefetched[canonical, context] = data
+    
+    def _get_render_pool(self) -> RenderPool:
+        """初回利用時にプールを作成（以降の文書でも再利用）"""
+        if self._render_pool is None:
+            self._render_pool = RenderPool(
+                self.config, self.config.get('math_prefetch_workers')
+            )
+        return self._render_pool
+    
+    def close(self):
+        """プリフェッチ用のワーカーを終了（渡されたプールはそのまま）"""
+        if self._render_pool is not None and self._owns_render_pool:
+            self._render_pool.close()
+            self._render_pool = None
+    
+    def _math_image(self, latex_str: str, context: str):
+        """数式画像を取得（プリフェッチ済みならそれを使う）"""
+        if self._prefetched:
+            data = self._prefetched.get((canonicalize_latex(latex_str), context))
+            if data is not None:
+                return io.BytesIO(data)
+        return self.math_converter.latex_to_image(latex_str, context)
+    
+    def math_stats(self) -> dict:
+        """直前に生成した文書の数式の件数（書き込み方ごと）と文字にした割合"""
+        total = sum(self._math_counts.values())
+        return dict(self._math_counts, total=total,
+                    text_rate=self._math_counts['text'] / total if total else 0.0)
+    
+    def _to_plain(self, latex_str: str):
+        """文字にできる数式なら (文字列, 斜体か) の並び"""
+        if self._plain_converter is None:
+            return None
+        return self._plain_converter.convert(latex_str)
+    
+    def _to_omml(self, latex_str: str, display: bool = False, font_size: float = None):
+        """Wordの数式にできればその要素（MathMLの数式はMathMLから直接変換する）"""
+        markup = self._mathml_sources.get(latex_str)
+        if markup is not None:
+            omath = self._omml_converter.convert_mathml(markup, display, font_size)
+            if omath is not None:
+                return omath
+        
+        if self.config.get('math_mode', 'image') == 'omml':
+            return self._omml_converter.convert(latex_str, display, font_size)
+        return None
+    
+    def _add_math(self, paragraph, latex_str: str, context: str, **size):
+        """数式を段落に追加（Wordの数式にできればそれ、それ以外は画像）"""
+        # 選択肢は文字の大きさを指定しているので合わせる（ほかは段落に従う）
+        font_size = self.config.get('choice_size') if context == 'choice' else None
+        
+        segments = self._to_plain(latex_str)
+        if segments is not None:
+            for text, italic in segments:
+                run = paragraph.add_run(text)
+                run.font.name = self.config.get('math_text_font', 'Cambria Math')
+                run.italic = italic
+                if font_size:
+                    run.font.size = Pt(font_size)
+            self._math_counts['text'] += 1
+            return
+        
+        omath = self._to_omml(latex_str, font_size=font_size)
+        if omath is not None:
+            paragraph._p.append(omath)
+            self._math_counts['omml'] += 1
+            return
+        
+        run = paragraph.add_run()
+        self._add_math_picture(run, latex_str, context, **size)
+        self._math_counts['image'] += 1
+    
+    def _add_math_picture(self, run, latex_str: str, context: str, **size):
+        """数式画像をrunに挿入（SVGモードではPNGを代替画像としてSVGを添付）"""
+        shape = run.add_picture(self._math_image(latex_str, context), **size)
+        
+        if self._svg_embedder is not None:
+            svg = self.math_converter.latex_to_svg(latex_str)
+            if svg is not None:
+                self._svg_embedder.attach(shape, svg, run.part)
+        return shape
+    
     def _apply_global_style(self, doc: Document):
         """文書全体のスタイル設定"""
         sections = doc.sections
@@ -48,11 +249,11 @@ class WordGenerator:
             style.font.size = Pt(self.config['title_size'])
             style.font.bold = self.config['title_bold']
     
-    def _add_problem(self, doc: Document, problem: Dict[str, Any]):
+    def _add_problem(self, doc: Document, problem: Problem):
         """問題を文書に追加"""
         # タイトル
-        if problem['title']:
-            title = doc.add_heading(problem['title'], level=1)
+        if problem.title:
+            title = doc.add_heading(problem.title, level=1)
             self._apply_title_style(title)
         else:
             title = doc.add_heading(f'大問{self.problem_counter}', level=1)
@@ -61,17 +262,17 @@ class WordGenerator:
         # 問題文（テキストと数式が混在）
         current_para = None
         
-        for element in problem['text']:
-            if element['type'] == 'text':
+        for kind, content in problem.text:
+            if kind == 'text':
                 # テキスト要素
                 if current_para is None:
                     current_para = doc.add_paragraph()
                     self._apply_body_style(current_para)
                 
                 # テキストを追加
-                run = current_para.add_run(element['content'])
+                run = current_para.add_run(content)
                 
-            elif element['type'] == 'math':
+            elif kind == 'math':
                 # インライン数式
                 if current_para is None:
                     current_para = doc.add_paragraph()
@@ -79,14 +280,13 @@ class WordGenerator:
                 
                 # 数式画像を追加（小さめに）
                 try:
-                    img_stream = self.math_converter.latex_to_image(element['content'])
-                    run = current_para.add_run()
                     # インライン数式の高さを設定から取得
                     inline_height = self.config.get('inline_math_height', 14)
-                    run.add_picture(img_stream, height=Pt(inline_height))
+                    self._add_math(current_para, content, 'inline',
+                                   height=Pt(inline_height))
                 except Exception as e:
                     # エラー時はテキストで表示
-                    run = current_para.add_run(f"[{element['content']}]")
+                    run = current_para.add_run(f"[{content}]")
                     run.font.color.rgb = RGBColor(255, 0, 0)
         
         # 段落が作成されていれば、終了
@@ -94,12 +294,12 @@ class WordGenerator:
             current_para = None
         
         # 独立した数式
-        for equation in problem['equations']:
+        for equation in problem.equations:
             self._add_display_math(doc, equation)
         
         # 選択肢
-        if problem['choices']:
-            self._add_choices(doc, problem['choices'])
+        if problem.choice_tokens:
+            self._add_choices(doc, problem.choice_tokens)
     
     def _apply_title_style(self, paragraph):
         """タイトルスタイルを適用"""
@@ -122,23 +322,30 @@ class WordGenerator:
         """独立した数式を追加（中央揃え）"""
         para = doc.add_paragraph()
         para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-        run = para.add_run()
+        para.paragraph_format.space_after = Pt(12)
+        
+        # Wordの数式にできればそれを使う
+        omath_para = self._to_omml(latex_str, display=True)
+        if omath_para is not None:
+            para._p.append(omath_para)
+            self._math_counts['omml'] += 1
+            return
         
+        run = para.add_run()
         try:
             # 数式を画像化
-            img_stream = self.math_converter.latex_to_image(latex_str)
             # ディスプレイ数式の幅を設定から取得
             display_width = self.config.get('display_math_width', 2.5)
-            run.add_picture(img_stream, width=Inches(display_width))
+            self._add_math_picture(run, latex_str, 'display',
+                                   width=Inches(display_width))
+            self._math_counts['image'] += 1
         except Exception as e:
             # エラー時
             run.text = f"[数式エラー: {latex_str[:30]}...]"
             run.font.color.rgb = RGBColor(255, 0, 0)
-        
-        para.paragraph_format.space_after = Pt(12)
     
-    def _add_choices(self, doc: Document, choices: List[str]):
-        """選択肢を追加"""
+    def _add_choices(self, doc: Document, choices: List[Tuple[Token, ...]]):
+        """選択肢を追加（選択肢ごとの (種類, 内容) の並び）"""
         for i, choice in enumerate(choices, 1):
             # 選択肢にもインライン数式が含まれる可能性がある
             para = doc.add_paragraph()
@@ -153,41 +360,23 @@ class WordGenerator:
             # 選択肢テキストを解析してインライン数式を処理
             self._add_text_with_inline_math(para, choice)
     
-    def _add_text_with_inline_math(self, paragraph, text: str):
-        """テキスト内のインライン数式を処理して段落に追加"""
-        # インライン数式パターン: \(...\) または $...$
-        pattern = r'\\\((.+?)\\\)|\$([^$]+)\$'
-        
-        last_end = 0
-        for match in re.finditer(pattern, text):
-            # 数式の前のテキスト
-            if match.start() > last_end:
-                plain_text = text[last_end:match.start()]
-                run = paragraph.add_run(plain_text)
+    def _add_text_with_inline_math(self, paragraph, tokens: Tuple[Token, ...]):
+        """解析時に分けた選択肢の文字列とインライン数式を段落に追加"""
+        for kind, content in tokens:
+            if kind == 'text':
+                run = paragraph.add_run(content)
                 run.font.name = self.config['choice_font']
                 run._element.rPr.rFonts.set(qn('w:eastAsia'), self.config['choice_font'])
                 run.font.size = Pt(self.config['choice_size'])
+                continue
             
-            # 数式部分
-            latex_str = match.group(1) or match.group(2)
-            if latex_str:
-                try:
-                    img_stream = self.math_converter.latex_to_image(latex_str.strip())
-                    run = paragraph.add_run()
-                    # 選択肢内のインライン数式も小さめに
-                    inline_height = self.config.get('inline_math_height', 14)
-                    run.add_picture(img_stream, height=Pt(inline_height))
-                except Exception as e:
-                    # エラー時はテキストで表示
-                    run = paragraph.add_run(f"[{latex_str}]")
-                    run.font.color.rgb = RGBColor(255, 0, 0)
-            
-            last_end = match.end()
-        
-        # 残りのテキスト
-        if last_end < len(text):
-            plain_text = text[last_end:]
-            run = paragraph.add_run(plain_text)
-            run.font.name = self.config['choice_font']
-            run._element.rPr.rFonts.set(qn('w:eastAsia'), self.config['choice_font'])
-            run.font.size = Pt(self.config['choice_size'])
+            try:
+                # 選択肢内のインライン数式も小さめに（指定がなければインライン数式と同じ）
+                choice_height = (self.config.get('choice_math_height')
+                                 or self.config.get('inline_math_height', 14))
+                self._add_math(paragraph, content, 'choice',
+                               height=Pt(choice_height))
+            except Exception as e:
+                # エラー時はテキストで表示
+                run = paragraph.add_run(f"[{content}]")
+                run.font.color.rgb = RGBColor(255, 0, 0)
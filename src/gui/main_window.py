@@ -1,37 +1,40 @@
 """メインGUIウィンドウ"""
 import sys
+import multiprocessing
 from pathlib import Path
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QTextEdit, QFileDialog, QComboBox,
     QGroupBox, QMessageBox, QProgressBar, QListWidget, QSplitter
 )
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
 from PySide6.QtGui import QFont, QTextCursor
 
 # 親ディレクトリのモジュールをインポート
 sys.path.append(str(Path(__file__).parent.parent))
 
-from core import STYLE_CONFIG, HTMLParser, MathConverter, WordGenerator
-from validators.html_validator import HTMLValidator
-from batch.unified_converter import UnifiedMathConverter
+# 重い依存（matplotlib, python-docx など）は使うときに読み込む
+from core import STYLE_CONFIG
+from core.frozen_env import configure_matplotlib_dir
 
 class ConversionThread(QThread):
     """変換処理を別スレッドで実行"""
     progress = Signal(int, str)
     finished = Signal(bool, str)
     
-    def __init__(self, input_files, output_file, mode='single'):
+    def __init__(self, input_files, output_file, mode='single', render_pool=None):
         super().__init__()
         self.input_files = input_files
         self.output_file = output_file
         self.mode = mode
+        self.render_pool = render_pool
     
     def run(self):
         try:
             if self.mode == 'unified':
                 # 統合変換
-                converter = UnifiedMathConverter()
+                from batch.unified_converter import UnifiedMathConverter
+                converter = UnifiedMathConverter(render_pool=self.render_pool)
                 
                 all_problems = []
                 for i, html_file in enumerate(self.input_files, 1):
@@ -61,9 +64,10 @@ class ConversionThread(QThread):
             
             else:
                 # 単一ファイル変換
+                from core import HTMLParser, MathConverter, WordGenerator
                 parser = HTMLParser()
                 math_converter = MathConverter(STYLE_CONFIG)
-                generator = WordGenerator(STYLE_CONFIG, math_converter)
+                generator = WordGenerator(STYLE_CONFIG, math_converter, self.render_pool)
                 
                 self.progress.emit(25, "HTMLを解析中...")
                 
@@ -92,6 +96,30 @@ class MainWindow(QMainWindow):
         self.output_file = ""
         
         self.init_ui()
+        
+        # 数式の並列描画のワーカー（最初の変換で起動し、ウィンドウを閉じるまで使い回す）
+        from core.render_pool import RenderPool
+        self.render_pool = RenderPool(STYLE_CONFIG, STYLE_CONFIG.get('math_prefetch_workers'))
+        
+        # ウィンドウの表示後に描画エンジンを準備する
+        self.warmup = None
+        QTimer.singleShot(0, self.start_warmup)
+    
+    def start_warmup(self):
+        """描画エンジンの準備をバックグラウンドで始める（ウィンドウの表示後に呼ばれる）"""
+        from core.warmup import start_warmup
+        self.warmup = start_warmup(STYLE_CONFIG)
+    
+    def cancel_warmup(self):
+        """描画エンジンの準備を取り消し、描画中の数式が終わるまで待つ（変換の開始時・ウィンドウを閉じるとき）"""
+        if self.warmup is not None:
+            from core.warmup import CANCEL_TIMEOUT
+            self.warmup.cancel(timeout=CANCEL_TIMEOUT)
+    
+    def closeEvent(self, event):
+        self.cancel_warmup()
+        self.render_pool.close()
+        super().closeEvent(event)
     
     def init_ui(self):
         """UIを初期化"""
@@ -335,6 +363,7 @@ class MainWindow(QMainWindow):
         
         self.log("\n=== HTML検証開始 ===")
         
+        from validators.html_validator import HTMLValidator
         validator = HTMLValidator()
         
         for file_path in self.input_files:
@@ -389,6 +418,9 @@ class MainWindow(QMainWindow):
             if reply == QMessageBox.No:
                 return
         
+        # 準備の残りは変換と競合するので取り消す
+        self.cancel_warmup()
+        
         # UIを無効化
         self.btn_convert.setEnabled(False)
         self.progress_bar.setVisible(True)
@@ -400,7 +432,8 @@ class MainWindow(QMainWindow):
         self.conversion_thread = ConversionThread(
             self.input_files,
             self.output_file,
-            mode
+            mode,
+            self.render_pool
         )
         self.conversion_thread.progress.connect(self.on_progress)
         self.conversion_thread.finished.connect(self.on_finished)
@@ -459,6 +492,11 @@ class MainWindow(QMainWindow):
         self.log_text.setTextCursor(cursor)
 
 def main():
+    # 凍結アプリではmatplotlibの設定ディレクトリを固定の場所に（描画ワーカーも同じ）
+    configure_matplotlib_dir()
+    
+    # 数式の並列描画ワーカー（凍結アプリ）用
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     
     # スタイルシート
@@ -1,5 +1,6 @@
 """クリップボード変換GUI（改善版）"""
 import sys
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
 import pyperclip
@@ -7,18 +8,44 @@ from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QTextEdit, QComboBox, QFileDialog, QMessageBox
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QFont
 
 sys.path.append(str(Path(__file__).parent))
 
-from core import STYLE_CONFIG, TEMPLATES, HTMLParser, MathConverter, WordGenerator, TemplateManager
+# 重い依存（matplotlib, python-docx など）は使うときに読み込む
+from core import STYLE_CONFIG, TEMPLATES
+from core.frozen_env import configure_matplotlib_dir
 
 class ClipboardConverterGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.html_content = ""
         self.init_ui()
+        
+        # 数式の並列描画のワーカー（最初の変換で起動し、ウィンドウを閉じるまで使い回す）
+        from core.render_pool import RenderPool
+        self.render_pool = RenderPool(STYLE_CONFIG, STYLE_CONFIG.get('math_prefetch_workers'))
+        
+        # ウィンドウの表示後に描画エンジンを準備する
+        self.warmup = None
+        QTimer.singleShot(0, self.start_warmup)
+    
+    def start_warmup(self):
+        """描画エンジンの準備をバックグラウンドで始める（ウィンドウの表示後に呼ばれる）"""
+        from core.warmup import start_warmup
+        self.warmup = start_warmup(STYLE_CONFIG)
+    
+    def cancel_warmup(self):
+        """描画エンジンの準備を取り消し、描画中の数式が終わるまで待つ（変換の開始時・ウィンドウを閉じるとき）"""
+        if self.warmup is not None:
+            from core.warmup import CANCEL_TIMEOUT
+            self.warmup.cancel(timeout=CANCEL_TIMEOUT)
+    
+    def closeEvent(self, event):
+        self.cancel_warmup()
+        self.render_pool.close()
+        super().closeEvent(event)
     
     def init_ui(self):
         self.setWindowTitle("クリップボード変換")
@@ -95,6 +122,7 @@ class ClipboardConverterGUI(QMainWindow):
             
             self.preview_text.setPlainText(preview)
             
+            from core import HTMLParser
             parser = HTMLParser()
             try:
                 problems = parser.parse(self.html_content)
@@ -143,9 +171,13 @@ class ClipboardConverterGUI(QMainWindow):
             if not output_file:
                 return
             
+            # 準備の残りは変換と競合するので取り消す
+            self.cancel_warmup()
+            
+            from core import HTMLParser, MathConverter, WordGenerator, TemplateManager
             parser = HTMLParser()
             math_converter = MathConverter(STYLE_CONFIG)
-            word_generator = WordGenerator(STYLE_CONFIG, math_converter)
+            word_generator = WordGenerator(STYLE_CONFIG, math_converter, self.render_pool)
             template_manager = TemplateManager(TEMPLATES)
             
             problems = parser.parse(self.html_content)
@@ -196,6 +228,11 @@ class ClipboardConverterGUI(QMainWindow):
             )
 
 def main():
+    # 凍結アプリではmatplotlibの設定ディレクトリを固定の場所に（描画ワーカーも同じ）
+    configure_matplotlib_dir()
+    
+    # 数式の並列描画ワーカー（凍結アプリ）用
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = ClipboardConverterGUI()
     window.show()
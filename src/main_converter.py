@@ -1,7 +1,8 @@
 """メイン変換スクリプト"""
 import sys
 from pathlib import Path
-from core import STYLE_CONFIG, HTMLParser, MathConverter, WordGenerator
+# 重い依存（matplotlib, python-docx など）は使うときに読み込む
+from core import STYLE_CONFIG
 
 def convert_html_to_word(html_file: str, output_file: str = None):
     """HTMLファイルをWord文書に変換"""
@@ -19,6 +20,7 @@ def convert_html_to_word(html_file: str, output_file: str = None):
             html_content = f.read()
         
         # パーサーとコンバーターを初期化
+        from core import HTMLParser, MathConverter, WordGenerator
         parser = HTMLParser()
         math_converter = MathConverter(STYLE_CONFIG)
         word_generator = WordGenerator(STYLE_CONFIG, math_converter)
@@ -30,7 +32,10 @@ def convert_html_to_word(html_file: str, output_file: str = None):
         
         # Word文書を生成
         print("Word文書を生成中...")
-        doc = word_generator.create_document(problems)
+        try:
+            doc = word_generator.create_document(problems)
+        finally:
+            word_generator.close()
         
         # 保存
         doc.save(output_file)
@@ -1,7 +1,8 @@
 """テンプレート機能付き変換スクリプト"""
 import sys
 from pathlib import Path
-from core import STYLE_CONFIG, TEMPLATES, HTMLParser, MathConverter, WordGenerator, TemplateManager
+# 重い依存（matplotlib, python-docx など）は使うときに読み込む
+from core import STYLE_CONFIG, TEMPLATES, TemplateManager
 
 def convert_with_template(html_file: str, output_file: str, template_name: str = 'standard', **kwargs):
     """テンプレートを使用してHTMLをWord文書に変換"""
@@ -15,6 +16,7 @@ def convert_with_template(html_file: str, output_file: str, template_name: str =
             html_content = f.read()
         
         # 初期化
+        from core import HTMLParser, MathConverter, WordGenerator
         parser = HTMLParser()
         math_converter = MathConverter(STYLE_CONFIG)
         word_generator = WordGenerator(STYLE_CONFIG, math_converter)
@@ -27,7 +29,10 @@ def convert_with_template(html_file: str, output_file: str, template_name: str =
         
         # Word文書を生成
         print("Word文書を生成中...")
-        doc = word_generator.create_document(problems)
+        try:
+            doc = word_generator.create_document(problems)
+        finally:
+            word_generator.close()
         
         # テンプレートを適用
         print(f"テンプレート '{template_name}' を適用中...")
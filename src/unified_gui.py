@@ -1,5 +1,7 @@
 """統合GUI - シンプル洗練版"""
+import os
 import sys
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
 import pyperclip
@@ -8,31 +10,35 @@ from PySide6.QtWidgets import (
     QPushButton, QLabel, QTextEdit, QComboBox, QFileDialog, QMessageBox,
     QRadioButton, QButtonGroup, QListWidget, QProgressBar, QFrame
 )
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
 from PySide6.QtGui import QFont, QTextCursor
 
 sys.path.append(str(Path(__file__).parent))
 
-from core import STYLE_CONFIG, TEMPLATES, HTMLParser, MathConverter, WordGenerator, TemplateManager
+# 重い依存（matplotlib, python-docx など）は使うときに読み込む
+from core import STYLE_CONFIG, TEMPLATES
+from core.frozen_env import configure_matplotlib_dir
 
 class ConversionThread(QThread):
     progress = Signal(int, str)
     finished = Signal(bool, str)
     
-    def __init__(self, html_content, output_file, template_name, **kwargs):
+    def __init__(self, html_content, output_file, template_name, render_pool=None, **kwargs):
         super().__init__()
         self.html_content = html_content
         self.output_file = output_file
         self.template_name = template_name
+        self.render_pool = render_pool
         self.kwargs = kwargs
     
     def run(self):
         try:
             self.progress.emit(25, "HTMLを解析中...")
             
+            from core import HTMLParser, MathConverter, WordGenerator, TemplateManager
             parser = HTMLParser()
             math_converter = MathConverter(STYLE_CONFIG)
-            generator = WordGenerator(STYLE_CONFIG, math_converter)
+            generator = WordGenerator(STYLE_CONFIG, math_converter, self.render_pool)
             template_manager = TemplateManager(TEMPLATES)
             
             problems = parser.parse(self.html_content)
@@ -63,6 +69,30 @@ class UnifiedConverterGUI(QMainWindow):
         self.html_content = ""
         self.input_files = []
         self.init_ui()
+        
+        # 数式の並列描画のワーカー（最初の変換で起動し、ウィンドウを閉じるまで使い回す）
+        from core.render_pool import RenderPool
+        self.render_pool = RenderPool(STYLE_CONFIG, STYLE_CONFIG.get('math_prefetch_workers'))
+        
+        # ウィンドウの表示後に描画エンジンを準備する
+        self.warmup = None
+        QTimer.singleShot(0, self.start_warmup)
+    
+    def start_warmup(self):
+        """描画エンジンの準備をバックグラウンドで始める（ウィンドウの表示後に呼ばれる）"""
+        from core.warmup import start_warmup
+        self.warmup = start_warmup(STYLE_CONFIG)
+    
+    def cancel_warmup(self):
+        """描画エンジンの準備を取り消し、描画中の数式が終わるまで待つ（変換の開始時・ウィンドウを閉じるとき）"""
+        if self.warmup is not None:
+            from core.warmup import CANCEL_TIMEOUT
+            self.warmup.cancel(timeout=CANCEL_TIMEOUT)
+    
+    def closeEvent(self, event):
+        self.cancel_warmup()
+        self.render_pool.close()
+        super().closeEvent(event)
     
     def init_ui(self):
         self.setWindowTitle("数学問題変換システム")
@@ -500,6 +530,7 @@ class UnifiedConverterGUI(QMainWindow):
             
             self.preview_text.setPlainText(preview)
             
+            from core import HTMLParser
             parser = HTMLParser()
             problems = parser.parse(self.html_content)
             
@@ -556,6 +587,8 @@ class UnifiedConverterGUI(QMainWindow):
         elif template_name == 'homework':
             kwargs['date'] = datetime.now().strftime('%Y年%m月%d日')
         
+        # 準備の残りは変換と競合するので取り消す
+        self.cancel_warmup()
         self.btn_convert.setEnabled(False)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
@@ -564,6 +597,7 @@ class UnifiedConverterGUI(QMainWindow):
             self.html_content,
             output_file,
             template_name,
+            self.render_pool,
             **kwargs
         )
         self.conversion_thread.progress.connect(self.on_progress)
@@ -598,11 +632,35 @@ class UnifiedConverterGUI(QMainWindow):
         else:
             QMessageBox.critical(self, "エラー", message)
 
+def _startup_probe():
+    """起動時間の計測用（bench_startup.pyが環境変数で指定）: 数式を1つ描画して終了"""
+    from core import MathConverter
+    probe_config = dict(STYLE_CONFIG, math_cache_max_bytes=0, math_store_path=None,
+                        math_bundle_path=None)
+    MathConverter(probe_config).latex_to_image(r'\frac{a}{b}')
+    sys.exit(0)
+
 def main():
+    # 凍結アプリではmatplotlibの設定ディレクトリを固定の場所に（描画ワーカーも同じ）
+    configure_matplotlib_dir()
+    
+    # 数式の並列描画ワーカー（凍結アプリ）用
+    multiprocessing.freeze_support()
+    
+    # 事前レンダリング済みの数式バンドルを読み込む（設定と一致しないものは無視）
+    # 準備が有効ならウィンドウの表示後にバックグラウンドで読み込む
+    if not STYLE_CONFIG.get('math_warmup', True):
+        from core.math_converter import preload_bundle
+        preload_bundle(STYLE_CONFIG)
+    
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
     window = UnifiedConverterGUI()
     window.show()
+    
+    if os.environ.get('MATHCONVERTER_STARTUP_PROBE'):
+        _startup_probe()
+    
     sys.exit(app.exec())
 
 if __name__ == '__main__':
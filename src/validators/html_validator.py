@@ -1,12 +1,23 @@
 """HTML構造の検証モジュール"""
-from bs4 import BeautifulSoup
+import sys
+from pathlib import Path
 from typing import List, Dict, Tuple
 import re
 
+# 親ディレクトリのモジュールをインポート
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.html_parser import PARSER_ENGINES, make_soup
+from core.style_config import STYLE_CONFIG
+
 class HTMLValidator:
     """HTML構造を検証するクラス"""
     
-    def __init__(self):
+    def __init__(self, engine: str = None):
+        # 解析エンジン（省略時は設定の html_parser_engine）
+        self.engine = engine or STYLE_CONFIG.get('html_parser_engine', 'html.parser')
+        if self.engine not in PARSER_ENGINES:
+            raise ValueError(f"HTMLの解析エンジン '{self.engine}' が見つかりません")
         self.errors = []
         self.warnings = []
         self.latex_pattern = re.compile(r'\$\$(.*?)\$\$|\\\((.*?)\\\)')
@@ -22,7 +33,7 @@ class HTMLValidator:
         self.warnings = []
         
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = make_soup(html_content, self.engine)
         except Exception as e:
             self.errors.append(f"HTML解析エラー: {str(e)}")
             return False, self.errors, self.warnings
@@ -151,8 +162,6 @@ def validate_html_file(file_path: str) -> bool:
 
 # 使用例
 if __name__ == '__main__':
-    import sys
-    
     if len(sys.argv) < 2:
         print("使用方法: python html_validator.py <HTMLファイル>")
         sys.exit(1)
@@ -0,0 +1,141 @@
+"""スレッドセーフなレンダラーのテスト"""
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import matplotlib
+import numpy as np
+from matplotlib.mathtext import MathTextParser
+from PIL import Image
+
+from core import STYLE_CONFIG, MathConverter
+from core.figure_renderer import (
+    FigureRenderer, TrimmedFigureRenderer, FORMULA_FIGSIZE, MATHTEXT_LOCK
+)
+from core.mathtext_renderer import MathtextRenderer
+
+FORMULAS = [
+    'x^2 + y^2 = r^2',
+    r'\frac{a}{b}',
+    r'\frac{x^2 + 1}{x - 1}',
+    r'\frac{S_{OAB}}{S_{OCA}}',
+    r'\frac{BP}{PC} \cdot \frac{CQ}{QA} \cdot \frac{AR}{RB} = 1',
+    r'\sqrt{2}',
+    r'\alpha + \beta',
+    r'\sum_{k=1}^{n} k',
+]
+
+def test_threads_match_sequential():
+    """複数スレッドから同時に描画しても逐次描画と同じ結果になる"""
+    renderer = FigureRenderer(pool_size=4)
+
+    def render(latex_str):
+        return renderer.render_png(latex_str, 40, 'black', 100)
+
+    expected = [render(latex_str) for latex_str in FORMULAS]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(3):
+            results = list(executor.map(render, FORMULAS * 2))
+            assert results == expected * 2
+
+    # 図はプールの上限までしか保持しない
+    assert len(renderer._idle[FORMULA_FIGSIZE]) <= 4
+
+def test_lock_covers_only_parsing():
+    """ロックするのは数式の解析だけで、図の描画や書き出しは待たない"""
+    renderer = TrimmedFigureRenderer()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with MATHTEXT_LOCK:
+            # 数式を含まない代替画像は解析中でも描画できる
+            error_image = executor.submit(renderer.render_error_png, 100).result(timeout=30)
+            assert error_image[:4] == b'\x89PNG'
+            # 数式の描画は解析のロックを待つ
+            future = executor.submit(renderer.render_png, 'x^2', 40, 'black', 100)
+            time.sleep(0.2)
+            assert not future.done()
+        assert future.result(timeout=30)[:4] == b'\x89PNG'
+
+def _pixels(png: bytes) -> np.ndarray:
+    with Image.open(io.BytesIO(png)) as img:
+        return np.asarray(img.convert('RGBA'))
+
+def test_rc_is_applied_per_render():
+    """mathtext.defaultは描画ごとに適用し、matplotlibのグローバル設定は変えない"""
+    saved = matplotlib.rcParams['mathtext.default']
+    parse = MathTextParser.parse
+    images = {}
+    for default in ('regular', 'it'):
+        rc = {'mathtext.default': default}
+        images[default] = [renderer.render_png('ABC', 40, 'black', 100)
+                           for renderer in (FigureRenderer(rc), TrimmedFigureRenderer(rc),
+                                            MathtextRenderer(rc))]
+        assert matplotlib.rcParams['mathtext.default'] == saved
+    assert MathTextParser.parse is parse
+    # 既定のフォントの違いが画像に出る
+    for regular, italic in zip(images['regular'], images['it']):
+        assert regular != italic
+
+def test_trimmed_matches_figure():
+    """1回描画の切り抜きは従来方式と画素単位で一致する"""
+    figure = FigureRenderer()
+    trimmed = TrimmedFigureRenderer()
+
+    for font_size, dpi in [(40, 100), (12, 300), (STYLE_CONFIG['math_font_size'], 150)]:
+        for latex_str in FORMULAS:
+            expected = _pixels(figure.render_png(latex_str, font_size, 'black', dpi))
+            actual = _pixels(trimmed.render_png(latex_str, font_size, 'black', dpi))
+
+            assert actual.shape == expected.shape, (latex_str, font_size, dpi)
+            diff = np.abs(actual.astype(int) - expected.astype(int))
+            assert diff.max() == 0, (latex_str, font_size, dpi)
+
+def test_render_many_matches_single():
+    """まとめて描画しても1つずつ描画した結果と同じで、失敗は他に影響しない"""
+    renderer = TrimmedFigureRenderer()
+    latex_list = FORMULAS[:4] + [r'\frac{'] + FORMULAS[4:]
+
+    results = renderer.render_many_png(latex_list, 40, 'black', 100)
+
+    assert results[4] is None
+    expected = [renderer.render_png(latex_str, 40, 'black', 100) for latex_str in FORMULAS]
+    assert results[:4] + results[5:] == expected
+
+def test_converter_render_many():
+    """MathConverter.render_manyは入力順に画像を返す"""
+    config = dict(STYLE_CONFIG, math_cache_max_bytes=0, math_store_path=None,
+                  math_bundle_path=None)
+    converter = MathConverter(config)
+
+    latex_list = ['x^{2}', r'\frac{', 'x^2', r'\sqrt{2}']
+    images = converter.render_many(latex_list)
+
+    assert len(images) == 4
+    assert images[0].getvalue() == images[2].getvalue()
+    assert images[0].getvalue() == converter.latex_to_image('x^2').getvalue()
+    assert images[1].getvalue() == converter._create_error_image(r'\frac{').getvalue()
+    assert images[3].getvalue() == converter.latex_to_image(r'\sqrt{2}').getvalue()
+
+def test_converter_uses_renderer():
+    """MathConverterの描画と代替画像"""
+    config = dict(STYLE_CONFIG, math_cache_max_bytes=0, math_store_path=None,
+                  math_bundle_path=None)
+    converter = MathConverter(config, renderer=FigureRenderer())
+
+    assert converter.test_conversion(r'\frac{a}{b}')
+    # 解析できない数式は代替画像になる
+    assert converter.latex_to_image(r'\frac{').getvalue().startswith(b'\x89PNG')
+
+if __name__ == '__main__':
+    test_threads_match_sequential()
+    test_lock_covers_only_parsing()
+    test_rc_is_applied_per_render()
+    test_trimmed_matches_figure()
+    test_render_many_matches_single()
+    test_converter_render_many()
+    test_converter_uses_renderer()
+    print("✓ レンダラーテスト完了")
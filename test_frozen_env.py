@@ -0,0 +1,66 @@
+"""凍結アプリの起動準備（フォントキャッシュの同梱と設定ディレクトリ）のテスト"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC = Path(__file__).parent / 'src'
+sys.path.insert(0, str(SRC))
+
+from core.frozen_env import FONT_CACHE_DIRNAME, configure_matplotlib_dir
+
+# 凍結アプリを装って設定し、matplotlibがフォント一覧を作り直さないか確かめる
+FROZEN_SCRIPT = """
+import os, sys, time
+sys.frozen = True
+sys._MEIPASS = sys.argv[1]
+from core.frozen_env import configure_matplotlib_dir
+path = configure_matplotlib_dir(sys.argv[2])
+assert path is not None and os.environ['MPLCONFIGDIR'] == str(path)
+cache = next(path.glob('fontlist-v*.json'))
+mtime = cache.stat().st_mtime_ns
+from matplotlib import font_manager
+font_manager.findfont(font_manager.FontProperties(family='STIXGeneral'),
+                      fallback_to_default=False, rebuild_if_missing=False)
+assert cache.stat().st_mtime_ns == mtime, 'フォント一覧が作り直された'
+"""
+
+def _run(*args):
+    env = {name: value for name, value in os.environ.items() if name != 'MPLCONFIGDIR'}
+    result = subprocess.run([sys.executable, *args], cwd=SRC, env=env,
+                            capture_output=True, text=True, encoding='utf-8')
+    assert result.returncode == 0, result.stdout + result.stderr
+
+def test_not_frozen():
+    """通常の実行では何もしない"""
+    before = os.environ.get('MPLCONFIGDIR')
+    assert configure_matplotlib_dir(tempfile.gettempdir()) is None
+    assert os.environ.get('MPLCONFIGDIR') == before
+
+def test_bundled_font_cache():
+    """生成したキャッシュは同梱フォントだけを相対パスで持ち、凍結アプリでそのまま使われる"""
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle = Path(tmp) / 'bundle'
+        _run(str(SRC / 'batch' / 'build_font_cache.py'), str(bundle / FONT_CACHE_DIRNAME))
+
+        caches = list((bundle / FONT_CACHE_DIRNAME).iterdir())
+        assert len(caches) == 1 and caches[0].name.startswith('fontlist-v')
+        with open(caches[0], 'r', encoding='utf-8') as f:
+            font_list = json.load(f)
+        fonts = font_list['ttflist']
+        assert fonts
+        # AFMフォントは同梱しない
+        assert font_list['afmlist'] == []
+        assert all(not Path(font['fname']).is_absolute() for font in fonts)
+        assert any(font['name'] == 'STIXGeneral' for font in fonts)
+
+        config_dir = Path(tmp) / 'home' / 'matplotlib'
+        _run('-c', FROZEN_SCRIPT, str(bundle), str(config_dir))
+        assert (config_dir / caches[0].name).read_bytes() == caches[0].read_bytes()
+
+if __name__ == '__main__':
+    test_not_frozen()
+    test_bundled_font_cache()
+    print("✓ 凍結アプリの起動準備テスト完了")
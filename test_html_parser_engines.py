@@ -0,0 +1,137 @@
+"""HTMLの解析エンジンのテスト（data/inputの解析結果をゴールデンファイルと比べる）
+
+ゴールデンファイルの更新（html.parserの結果で作り直す）:
+    python test_html_parser_engines.py --update
+"""
+import io
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from core.html_parser import PARSER_ENGINES, HTMLParser, make_soup
+from validators.html_validator import HTMLValidator
+from test_mathml_input import HTML as MATHML_HTML
+
+INPUT_FOLDER = ROOT / 'data' / 'input'
+GOLDEN_FOLDER = ROOT / 'data' / 'golden'
+
+# ゴールデンファイルのない入力（html.parserの結果と比べる）
+EXTRA_CASES = {
+    'mathml': MATHML_HTML,
+    # div.problemがなくh2で分割する（移動した要素の後ろの文字列・入れ子のdiv）
+    'headers': ('<h2>問1</h2><p>x $a$ <b>y</b></p><div class="math"><p>in</p> $$b$$ </div>'
+                '<h2>問2</h2><ul><li> 1 </li><li>$c$<!--注--> d</li></ul>tail'
+                '<p>q &amp; &lt; r</p>'),
+    # 空白のまとめ方・ルビ・script・複数のclass・引用符を含む属性
+    'text': ('<div class="problem"><h3 class=" problem-title  x">T<rt>x</rt></h3>'
+             '<p class="problem-text">漢<ruby>字<rt>じ</rt></ruby> <script>a<b</script>'
+             '\\(x\\) <span title=\'a"b\'>  </span></p><pre>  \\(y\\)  </pre>'
+             '<ol class="choices"><li>  </li><li><br>\\(z\\)</li></ol></div>'),
+    # 最初のh2より前の要素・入れ子のリスト（内側のliは外側のリストにも含まれる）
+    'nested_lists': ('<p>前置き</p><h2>問1</h2><p>本文 $x$</p><ul><li>a<ol class="choices">'
+                     '<li>1</li><li>2</li></ol></li><li>b</li></ul>'
+                     '<h2>問2</h2><ul><li>c<ul><li>d</li></ul></li></ul>'),
+    # 問題のdivの入れ子（内側はdiv.mathでもある）
+    'nested_problems': ('<div class="problem"><h3>外</h3><div class="problem math">'
+                        '<h3 class="problem-title">内</h3><math><mi>y</mi></math></div></div>'),
+    'empty': '',
+}
+
+def parse_result(html_content: str, engine: str) -> dict:
+    """解析結果と検証結果"""
+    validator = HTMLValidator(engine)
+    is_valid, errors, warnings = validator.validate(html_content)
+    return {
+        # 書き出しも比べるため問題のHTMLを残す
+        'problems': [dict(problem) for problem in
+                     HTMLParser(engine, keep_raw_html=True).parse(html_content)],
+        'validation': {'valid': is_valid, 'errors': errors, 'warnings': warnings},
+    }
+
+def _read(path: Path) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def test_golden():
+    """どのエンジンでもdata/inputの解析結果がゴールデンファイルと一致する"""
+    for html_file in sorted(INPUT_FOLDER.glob('*.html')):
+        with open(GOLDEN_FOLDER / f'{html_file.stem}.json', 'r', encoding='utf-8') as f:
+            golden = json.load(f)
+        html_content = _read(html_file)
+        for engine in PARSER_ENGINES:
+            assert parse_result(html_content, engine) == golden, (html_file.name, engine)
+
+def test_engines_agree():
+    """細かな場合でもlxmlのエンジンの結果がhtml.parserと一致する"""
+    for name, html_content in EXTRA_CASES.items():
+        expected = parse_result(html_content, 'html.parser')
+        for engine in PARSER_ENGINES:
+            assert parse_result(html_content, engine) == expected, (name, engine)
+
+def test_iter_problems():
+    """少しずつ読んでもparseと同じ問題を同じ順に返す（読む大きさによらない）"""
+    cases = {html_file.name: _read(html_file) for html_file in sorted(INPUT_FOLDER.glob('*.html'))}
+    cases.update(EXTRA_CASES)
+    for engine in PARSER_ENGINES:
+        parser = HTMLParser(engine, keep_raw_html=True)
+        for name, html_content in cases.items():
+            expected = parser.parse(html_content)
+            for chunk_size in (1, 7, 4096):
+                for source in (io.BytesIO(html_content.encode('utf-8')), io.StringIO(html_content)):
+                    problems = list(parser.iter_problems(source, chunk_size))
+                    assert problems == expected, (name, engine, chunk_size)
+
+def test_iter_problems_releases_tree():
+    """返した問題は木から取り除かれる（どのエンジンでも）"""
+    html_content = ''.join(f'<div class="problem"><h3>問{i}</h3><p>$x_{i}$</p></div>'
+                           for i in range(100))
+    for engine in PARSER_ENGINES:
+        parser = HTMLParser(engine)
+        problems = parser.iter_problems(io.StringIO(html_content), 64)
+        checked = 0
+        for i, problem in enumerate(problems):
+            assert problem['title'] == f'問{i}', engine
+            # 解析はエンジンごとの内側のジェネレーターで行っている
+            inner = problems.gi_yieldfrom
+            frame = inner.gi_frame if inner is not None else None
+            if frame is None:
+                continue
+            # 残るのは直前の問題（空）・返している問題・読みかけの問題だけ
+            if 'element' in frame.f_locals:
+                assert len(frame.f_locals['element'].getparent()) <= 3
+            elif 'soup' in frame.f_locals:
+                assert len(frame.f_locals['soup'].find_all('div', class_='problem')) <= 3, engine
+            checked += 1
+        assert checked, engine
+
+def test_unknown_engine():
+    for create in (HTMLParser, HTMLValidator, lambda engine: make_soup('', engine)):
+        try:
+            create('html5lib')
+        except ValueError:
+            continue
+        raise AssertionError("存在しないエンジンが使えてしまう")
+
+def update_golden():
+    """html.parserの結果でゴールデンファイルを作り直す"""
+    GOLDEN_FOLDER.mkdir(exist_ok=True)
+    for html_file in sorted(INPUT_FOLDER.glob('*.html')):
+        result = parse_result(_read(html_file), 'html.parser')
+        with open(GOLDEN_FOLDER / f'{html_file.stem}.json', 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"更新: {html_file.stem}.json")
+
+if __name__ == '__main__':
+    if '--update' in sys.argv:
+        update_golden()
+        sys.exit(0)
+    test_golden()
+    test_engines_agree()
+    test_iter_problems()
+    test_iter_problems_releases_tree()
+    test_unknown_engine()
+    print("✓ HTML解析エンジンテスト完了")
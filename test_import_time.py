@@ -0,0 +1,63 @@
+"""起動時の読み込み時間のテスト（-X importtime）"""
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).parent / 'src'
+sys.path.insert(0, str(SRC))
+
+import core
+
+# import core の累積時間の上限（ミリ秒、3回のうち最短で判定）
+IMPORT_BUDGET_MS = 100
+
+# 起動時に読み込まない重いパッケージ
+HEAVY_MODULES = ('matplotlib', 'numpy', 'PIL', 'docx', 'bs4', 'lxml')
+
+def _import_times(*args) -> dict:
+    """-X importtime で実行し、モジュールごとの累積時間（マイクロ秒）を返す"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=SRC,
+                            capture_output=True, text=True, encoding='utf-8')
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+def _heavy(times: dict) -> list:
+    return sorted(name for name in times if name.split('.')[0] in HEAVY_MODULES)
+
+def test_core_import_budget():
+    """import core では重いパッケージを読み込まず、時間も上限内"""
+    runs = [_import_times('-c', 'import core') for _ in range(3)]
+    assert _heavy(runs[0]) == []
+    elapsed_ms = min(times['core'] for times in runs) / 1000
+    assert elapsed_ms < IMPORT_BUDGET_MS, f"import core: {elapsed_ms:.1f}ms"
+
+def test_cli_startup_is_light():
+    """使用方法・テンプレート一覧・--help の表示では重いパッケージを読み込まない"""
+    for args in (['main_converter.py'], ['template_converter.py'],
+                 ['batch/batch_converter.py', '--help']):
+        assert _heavy(_import_times(*args)) == [], args
+
+def test_lazy_attributes():
+    """クラスは参照したときに読み込まれる"""
+    from core import MathConverter
+    from core.math_converter import MathConverter as defined
+
+    assert MathConverter is defined
+    assert 'WordGenerator' in dir(core)
+    try:
+        core.Unknown
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("存在しない名前が参照できてしまう")
+
+if __name__ == '__main__':
+    test_core_import_budget()
+    test_cli_startup_is_light()
+    test_lazy_attributes()
+    print("✓ 読み込み時間テスト完了")
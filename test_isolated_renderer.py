@@ -0,0 +1,91 @@
+"""数式の隔離レンダリングのテスト"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core import STYLE_CONFIG, MathConverter
+from core.figure_renderer import get_shared_trimmed_renderer
+from core.isolated_renderer import IsolatedRenderer, RenderAborted, process_rss
+from core.math_cache import MathImageCache
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None,
+              math_prefetch=False, math_isolation=True, math_render_timeout=0.3)
+
+# 描画に時間のかかる数式（入れ子の深い\left(…\right)の並び、1秒以上かかる）
+SLOW_FORMULA = (r'\left(' * 30 + 'x' + r'\right)' * 30) * 3
+
+def _aborted(call) -> str:
+    """描画が打ち切られた理由"""
+    try:
+        call()
+    except RenderAborted as e:
+        return e.reason
+    raise AssertionError("描画が打ち切られませんでした")
+
+def test_same_output_as_in_process():
+    """ワーカーでも同じプロセスで描画したのと同じ画像になる"""
+    args = (r'\frac{a}{b}', 250, 'black', 300, ('height', 33.3), 'palette4')
+    with IsolatedRenderer('trim') as renderer:
+        assert renderer.render_png(*args) == get_shared_trimmed_renderer().render_png(*args)
+        assert renderer.render_many_png(['x', r'\frac{a}{'], *args[1:])[1] is None
+        assert renderer.stats()['restarts'] == 0
+
+def test_timeout_restarts_worker():
+    """制限時間を超えたワーカーは作り直し、その数式を記録する"""
+    with IsolatedRenderer('trim', timeout=0.3) as renderer:
+        assert _aborted(lambda: renderer.render_png(SLOW_FORMULA, 250, 'black', 300)) == 'timeout'
+        # 作り直したワーカーで続けて描画できる
+        assert renderer.render_png('x', 250, 'black', 300)[:4] == b'\x89PNG'
+        # まとめた描画では原因の数式だけが失敗する
+        results = renderer.render_many_png(['y', SLOW_FORMULA], 250, 'black', 300)
+        assert results[0] is not None and results[1] is None
+
+        stats = renderer.stats()
+        assert stats['timeout'] == 2
+        assert stats['restarts'] == 3
+        assert [failure['latex'] for failure in stats['failures']] == [SLOW_FORMULA] * 2
+
+def test_dead_idle_worker_is_replaced():
+    """待機中に終了したワーカーは作り直し、次の描画は成功する"""
+    with IsolatedRenderer('trim') as renderer:
+        expected = renderer.render_png('x', 250, 'black', 300)
+        worker = renderer._idle[-1]
+        worker.process.kill()
+        worker.process.join()
+
+        assert renderer.render_png('x', 250, 'black', 300) == expected
+        assert renderer.render_error_png(300)[:4] == b'\x89PNG'
+        stats = renderer.stats()
+        assert stats['restarts'] == 1 and stats['crash'] == 1
+        assert stats['failures'] == []
+
+def test_memory_ceiling():
+    """常駐メモリの上限を超えたワーカーは打ち切る"""
+    if process_rss(os.getpid()) is None:
+        return
+    with IsolatedRenderer('trim', max_rss=1024 * 1024) as renderer:
+        assert _aborted(lambda: renderer.render_png('x', 250, 'black', 300)) == 'memory'
+        assert renderer.stats()['memory'] == 1
+
+def test_converter_uses_error_image():
+    """隔離描画では打ち切った数式がエラー画像になり、統計に残る"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+    assert converter.isolated
+
+    error_image = get_shared_trimmed_renderer().render_error_png(converter.dpi)
+    assert converter.latex_to_image(SLOW_FORMULA).getvalue() == error_image
+    assert converter.latex_to_image('x^2').getvalue() != error_image
+    assert converter.render_stats()['failures'][-1] == {'latex': SLOW_FORMULA,
+                                                         'reason': 'timeout'}
+
+    assert MathConverter(dict(CONFIG, math_isolation=False)).render_stats() == {}
+
+if __name__ == '__main__':
+    test_same_output_as_in_process()
+    test_timeout_restarts_worker()
+    test_dead_idle_worker_is_replaced()
+    test_memory_ceiling()
+    test_converter_uses_error_image()
+    print("✓ 隔離レンダリングテスト完了")
@@ -0,0 +1,54 @@
+"""LaTeX正規化のテスト"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core import STYLE_CONFIG, MathConverter
+from core.latex_normalizer import canonicalize_latex, tokenize_latex
+
+# 同じ描画結果になる表記のグループ
+EQUIVALENT_GROUPS = [
+    ['x^2+1', 'x^{2} + 1', 'x ^2+ 1', '$x^2+1$', r'\(x^2+1\)', '$$x^{2}+1$$'],
+    [r'\left( a+b \right)', r'\left(a+b\right)', r'\left (a + b\right )'],
+    [r'\left\{ x \right\}', r'\left\lbrace x\right\rbrace'],
+    [r'a \le b', r'a\leq b', r'a \leq  b'],
+    [r'\text{cm}^{2}', r'\mathrm{cm}^2'],
+    [r'\frac{a}{b}', r'\frac{a} {b}', r' \frac {a}{b} '],
+]
+
+def test_equivalent_forms():
+    """表記ゆれが同じキーになる"""
+    for group in EQUIVALENT_GROUPS:
+        keys = {canonicalize_latex(latex) for latex in group}
+        assert len(keys) == 1, (group, keys)
+
+def test_distinct_forms():
+    """描画が異なる数式は別のキーのまま"""
+    assert canonicalize_latex('x^{10}') != canonicalize_latex('x^10')
+    assert canonicalize_latex(r'\alpha x') != canonicalize_latex(r'\alphax')
+    assert canonicalize_latex(r'\alpha x') == r'\alpha x'
+
+def test_tokenizer():
+    """制御語・制御記号・空白の分割"""
+    assert tokenize_latex(r'\frac{a}{b}\,x') == [
+        '\\frac', '{', 'a', '}', '{', 'b', '}', '\\,', 'x'
+    ]
+    assert tokenize_latex('a  b') == ['a', '  ', 'b']
+
+def test_canonical_renders_same():
+    """正規化後の数式は従来と同じ画像になる"""
+    converter = MathConverter(
+        dict(STYLE_CONFIG, math_cache_max_bytes=0, math_store_path=None)
+    )
+    for latex in ('x^{2} + 1', r'\left( a+b \right)', r'\frac{BP}{PC} \cdot 1'):
+        original = converter._render_png(latex.strip())
+        canonical = converter._render_png(canonicalize_latex(latex))
+        assert original == canonical, latex
+
+if __name__ == '__main__':
+    test_equivalent_forms()
+    test_distinct_forms()
+    test_tokenizer()
+    test_canonical_renders_same()
+    print("✓ 正規化テスト完了")
@@ -0,0 +1,87 @@
+"""数式画像キャッシュのテスト"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import core.math_cache
+from core import STYLE_CONFIG, MathConverter
+from core.math_cache import MathImageCache, get_shared_cache
+
+def test_lru_eviction_by_bytes():
+    """バイト数上限によるLRU破棄"""
+    cache = MathImageCache(max_bytes=10)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+
+    # aを参照してbを最古にする
+    assert cache.get('a') == b'1234'
+    cache.put('c', b'1234')
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] == 8
+    assert stats['hits'] == 1
+
+    # 上限を超える1件は保持しない
+    cache.put('big', b'x' * 11)
+    assert 'big' not in cache
+
+def test_shared_cache_resize():
+    """共有キャッシュの上限を変えると既存のキャッシュに反映される"""
+    saved = core.math_cache._shared_cache
+    core.math_cache._shared_cache = None
+    try:
+        cache = get_shared_cache(max_bytes=12)
+        for key in 'abc':
+            cache.put(key, b'1234')
+        assert len(cache) == 3
+
+        # 上限を下げると古い順に破棄される
+        assert get_shared_cache(max_bytes=8) is cache
+        assert cache.max_bytes == 8
+        assert 'a' not in cache and 'b' in cache and 'c' in cache
+        assert cache.stats()['evictions'] == 1
+
+        # 同じ上限ならそのまま
+        assert get_shared_cache(max_bytes=8) is cache and len(cache) == 2
+    finally:
+        core.math_cache._shared_cache = saved
+
+def test_converter_hits():
+    """同じ数式の2回目はキャッシュから返す"""
+    converter = MathConverter(STYLE_CONFIG, cache=MathImageCache())
+
+    first = converter.latex_to_image(r'\frac{a}{b}').getvalue()
+    second = converter.latex_to_image(r'$\frac{a}{b}$').getvalue()
+
+    assert first == second
+    stats = converter.cache_stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+
+    # 色が異なれば別キー
+    config = dict(STYLE_CONFIG, math_color='red')
+    red = MathConverter(config, cache=converter.cache)
+    red.latex_to_image(r'\frac{a}{b}')
+    assert red.cache_stats()['misses'] == 2
+
+def test_cache_disabled():
+    """上限0でキャッシュ無効"""
+    config = dict(STYLE_CONFIG, math_cache_max_bytes=0)
+    converter = MathConverter(config)
+
+    assert converter.cache is None
+    assert converter.cache_stats() == {}
+    assert converter.test_conversion('x^2')
+
+if __name__ == '__main__':
+    test_lru_eviction_by_bytes()
+    test_shared_cache_resize()
+    test_converter_hits()
+    test_cache_disabled()
+    print("✓ キャッシュテスト完了")
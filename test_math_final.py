@@ -6,6 +6,25 @@ sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
 from core import STYLE_CONFIG, HTMLParser, MathConverter, WordGenerator
 
+# 個別テストの数式（LaTeX, 説明）
+TEST_CASES = [
+    # 基本的な数式
+    ('x^2 + y^2 = r^2', '基本的な2次式'),
+    
+    # 分数
+    (r'\frac{a}{b}', '単純な分数'),
+    (r'\frac{x^2 + 1}{x - 1}', '複雑な分数'),
+    
+    # テキストを含む分数
+    (r'\frac{BP}{PC}', '文字の分数'),
+    (r'\frac{S_{OAB}}{S_{OCA}}', '添字付き分数'),
+    
+    # 複雑な式
+    (r'\frac{BP}{PC} \cdot \frac{CQ}{QA} \cdot \frac{AR}{RB} = 1', 'チェバの定理'),
+    (r'\frac{m}{m+n}', '内分点の公式'),
+    (r'\frac{mb + na}{m+n}', '座標の内分点'),
+]
+
 def test_individual_formulas():
     """個別の数式をテスト"""
     print("="*60)
@@ -14,26 +33,8 @@ def test_individual_formulas():
     
     converter = MathConverter(STYLE_CONFIG)
     
-    test_cases = [
-        # 基本的な数式
-        ('x^2 + y^2 = r^2', '基本的な2次式'),
-        
-        # 分数
-        (r'\frac{a}{b}', '単純な分数'),
-        (r'\frac{x^2 + 1}{x - 1}', '複雑な分数'),
-        
-        # テキストを含む分数
-        (r'\frac{BP}{PC}', '文字の分数'),
-        (r'\frac{S_{OAB}}{S_{OCA}}', '添字付き分数'),
-        
-        # 複雑な式
-        (r'\frac{BP}{PC} \cdot \frac{CQ}{QA} \cdot \frac{AR}{RB} = 1', 'チェバの定理'),
-        (r'\frac{m}{m+n}', '内分点の公式'),
-        (r'\frac{mb + na}{m+n}', '座標の内分点'),
-    ]
-    
     print("\n各数式の変換テスト:")
-    for latex, description in test_cases:
+    for latex, description in TEST_CASES:
         print(f"\n  テスト: {description}")
         print(f"  LaTeX: {latex}")
         
@@ -0,0 +1,79 @@
+"""文書上の大きさに合わせた数式描画のテスト"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from PIL import Image
+
+from core import STYLE_CONFIG, MathConverter
+from core.figure_renderer import DPI_STEPS
+from core.math_cache import MathImageCache
+
+CONFIG = dict(STYLE_CONFIG, math_target_ppi=300, inline_math_height=8,
+              choice_math_height=None, display_math_width=2.5,
+              math_store_path=None, math_bundle_path=None)
+
+FORMULAS = ['x^2', r'\frac{a}{b}', r'\frac{BP}{PC} \cdot \frac{CQ}{QA} = 1']
+
+# 解像度の刻みによる大きさの上振れ（＋ラスタライズの端数や縁取りとして数ピクセル）
+STEP = 2 ** (1 / DPI_STEPS)
+
+def _size(buf):
+    with Image.open(buf) as img:
+        return img.size
+
+def _check_targets(engine: str):
+    converter = MathConverter(dict(CONFIG, math_engine=engine), cache=MathImageCache())
+    inline = 8 / 72 * 300
+    display = 2.5 * 300
+
+    for latex_str in FORMULAS:
+        width, height = _size(converter.latex_to_image(latex_str, 'inline'))
+        assert inline <= height + 1 <= inline * STEP + 6, (engine, latex_str, height)
+
+        # math_dpiが上限のため、従来の大きさより大きくはしない
+        legacy_width, _ = _size(converter.latex_to_image(latex_str))
+        width, height = _size(converter.latex_to_image(latex_str, 'display'))
+        if legacy_width < display:
+            assert width == legacy_width, (engine, latex_str, width)
+        else:
+            assert display <= width + 1 <= display * STEP + 6, (engine, latex_str, width)
+
+def test_context_sizes():
+    """文脈ごとに目標の大きさ（8pt・2.5インチを300ppi）で描画される"""
+    _check_targets('trim')
+    _check_targets('figure')
+    _check_targets('mathtext')
+
+def test_without_context_unchanged():
+    """文脈なし・目標解像度なしなら従来どおりmath_dpiで描画する"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+    legacy = MathConverter(dict(CONFIG, math_target_ppi=None), cache=MathImageCache())
+
+    data = converter.latex_to_image('x^2').getvalue()
+    assert data == legacy.latex_to_image('x^2').getvalue()
+    assert data == legacy.latex_to_image('x^2', 'inline').getvalue()
+
+def test_contexts_cached_separately():
+    """文脈ごとに別の画像としてキャッシュし、まとめて描画しても同じ結果になる"""
+    cache = MathImageCache()
+    converter = MathConverter(CONFIG, cache=cache)
+
+    inline = converter.latex_to_image('x^2', 'inline').getvalue()
+    display = converter.latex_to_image('x^2', 'display').getvalue()
+    assert inline != display
+    assert converter.latex_to_image('x^{2}', 'inline').getvalue() == inline
+    assert cache.stats()['misses'] == 2
+
+    fresh = MathConverter(CONFIG, cache=MathImageCache())
+    images = fresh.render_many(FORMULAS, 'inline')
+    assert images[0].getvalue() == inline
+    for latex_str, buf in zip(FORMULAS, images):
+        assert buf.getvalue() == converter.latex_to_image(latex_str, 'inline').getvalue()
+
+if __name__ == '__main__':
+    test_context_sizes()
+    test_without_context_unchanged()
+    test_contexts_cached_separately()
+    print("✓ 目標サイズテスト完了")
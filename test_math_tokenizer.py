@@ -0,0 +1,118 @@
+"""テキスト中の数式の分割のテスト"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core.html_parser import HTMLParser
+from core.math_tokenizer import split_math
+from core.problem import tokenize_choice
+
+# 開き記号 -> (閉じ記号, 種類)（先に書いたものを優先）
+DELIMITERS = [
+    ('$$', '$$', 'display'),
+    ('\\[', '\\]', 'display'),
+    ('\\(', '\\)', 'inline'),
+    ('$', '$', 'inline'),
+]
+
+def reference_split(text: str) -> list:
+    """1文字ずつ調べる素朴な実装（split_mathと同じ結果になるはず）"""
+    tokens = []
+    plain_text = ''
+    i = 0
+    while i < len(text):
+        if text.startswith('\\$', i):
+            plain_text += '$'
+            i += 2
+            continue
+        for opening, closing, kind in DELIMITERS:
+            if not text.startswith(opening, i):
+                continue
+            j = i + len(opening)
+            while j < len(text) and not text.startswith(closing, j):
+                j += 2 if text[j] == '\\' else 1
+            if j < len(text):
+                if plain_text:
+                    tokens.append(('text', plain_text))
+                plain_text = ''
+                tokens.append((kind, text[i + len(opening):j]))
+                i = j + len(closing)
+            else:
+                plain_text += opening
+                i += len(opening)
+            break
+        else:
+            step = 2 if text[i] == '\\' else 1
+            plain_text += text[i:i + step]
+            i += step
+    if plain_text:
+        tokens.append(('text', plain_text))
+    return tokens
+
+def test_split():
+    """区切り記号ごとの分け方"""
+    assert split_math('a $x$ b') == [('text', 'a '), ('inline', 'x'), ('text', ' b')]
+    assert split_math('$$x$$\\[y\\]') == [('display', 'x'), ('display', 'y')]
+    assert split_math('\\(a\\)$b$') == [('inline', 'a'), ('inline', 'b')]
+    # エスケープしたドル記号は文字（数式の中ではそのまま）
+    assert split_math('\\$5 と \\$3') == [('text', '$5 と $3')]
+    assert split_math('$\\$x$') == [('inline', '\\$x')]
+    assert split_math('\\(\\\\)\\)') == [('inline', '\\\\)')]
+    # 閉じていない開き記号は文字のまま
+    assert split_math('$$x$ y') == [('text', '$$x$ y')]
+    assert split_math('\\(x') == [('text', '\\(x')]
+    # ディスプレイ数式とインライン数式が重ならない
+    assert split_math('$a$$b$$c$') == [('inline', 'a'), ('inline', 'b'), ('inline', 'c')]
+    assert split_math('') == []
+
+def test_fuzz():
+    """ランダムな文字列で素朴な実装と一致する"""
+    rng = random.Random(0)
+    alphabet = ['$', '$', '\\', '(', ')', '[', ']', 'a', ' ']
+    for _ in range(20000):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 16)))
+        tokens = split_math(text)
+        assert tokens == reference_split(text), text
+        # 文字列は連続しない
+        assert all(a[0] != 'text' or b[0] != 'text' for a, b in zip(tokens, tokens[1:])), text
+
+def test_parser_and_collector_agree():
+    """問題文と選択肢で同じ数式が見つかる"""
+    parser = HTMLParser()
+    text = 'x $a$ と \\(b\\)、$$c$$ \\[d\\] \\$1'
+    parts = parser._split_text_and_math(text)
+    assert parts == [('text', 'x'), ('math', 'a'), ('text', 'と'), ('math', 'b'),
+                     ('text', '、'), ('math', 'c'), ('math', 'd'), ('text', '$1')]
+    assert [content for kind, content in tokenize_choice(text) if kind == 'math'] == \
+        ['a', 'b', 'c', 'd']
+
+def test_worst_case_inputs():
+    """閉じない開き記号や大量の$でも長さに比例する時間で終わる"""
+    n = 50000
+    cases = [
+        '$' * n,
+        'a$' * n,
+        '\\(' * n,
+        '\\[' * n,
+        '$$a' * n,
+        '\\' * n,
+        '\\$' * n,
+        '$ ' + '\\(x' * n,
+        '$x$ ' * n,
+    ]
+    for text in cases:
+        start = time.perf_counter()
+        split_math(text)
+        HTMLParser()._split_text_and_math(text)
+        elapsed = time.perf_counter() - start
+        assert elapsed < 2.0, (text[:10], elapsed)
+
+if __name__ == '__main__':
+    test_split()
+    test_fuzz()
+    test_parser_and_collector_agree()
+    test_worst_case_inputs()
+    print("OK")
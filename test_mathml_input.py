@@ -0,0 +1,114 @@
+"""MathMLの入力のテスト"""
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from docx import Document
+from docx.oxml.ns import qn
+
+from core import STYLE_CONFIG, HTMLParser, MathConverter, WordGenerator
+from core.math_cache import MathImageCache
+from core.mathml_converter import mathml_to_latex
+from core.omml_converter import OmmlConverter
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None,
+              math_prefetch=False, math_mode='image', math_plain_text=False)
+
+FRACTION = ('<math xmlns="http://www.w3.org/1998/Math/MathML"><mfrac>'
+            '<mrow><msup><mi>x</mi><mn>2</mn></msup><mo>-</mo><mn>1</mn></mrow>'
+            '<mrow><mi>x</mi><mo>+</mo><mn>1</mn></mrow></mfrac></math>')
+SUM = ('<math display="block"><munderover><mo>&sum;</mo>'
+       '<mrow><mi>k</mi><mo>=</mo><mn>1</mn></mrow><mi>n</mi></munderover>'
+       '<msup><mi>k</mi><mn>2</mn></msup><mo>=</mo>'
+       '<mfrac><mrow><mi>n</mi><mo>(</mo><mi>n</mi><mo>+</mo><mn>1</mn><mo>)</mo></mrow>'
+       '<mn>6</mn></mfrac></math>')
+# OMMLにできない要素（注釈のLaTeXで画像にする）
+MULTISCRIPTS = ('<math><semantics><mmultiscripts><mi>C</mi><mi>r</mi><none/><mprescripts/>'
+                '<mi>n</mi><none/></mmultiscripts>'
+                '<annotation encoding="application/x-tex">{}_n C_r</annotation></semantics></math>')
+TABLE = '<math><mtable><mtr><mtd><mi>a</mi></mtd></mtr></mtable></math>'
+
+HTML = f'''
+<div class="problem">
+<h2>問題1</h2>
+<p>次の式 {FRACTION} を簡単にせよ。組合せ {MULTISCRIPTS} と {TABLE}</p>
+<div class="math">{SUM}</div>
+<ol class="choices"><li><math><msqrt><mn>2</mn></msqrt></math></li><li>$\\pi$</li></ol>
+</div>
+'''
+
+def test_mathml_to_latex():
+    """注釈があればそれを使い、なければ構造からLaTeXを作る"""
+    assert mathml_to_latex(FRACTION) == r'\frac{x^2 - 1}{x + 1}'
+    assert mathml_to_latex(SUM.replace('&sum;', '∑')) == r'\sum_{k = 1}^n k^2 = \frac{n ( n + 1 )}{6}'
+    assert mathml_to_latex(MULTISCRIPTS) == '{}_n C_r'
+    assert mathml_to_latex('<math><mover><mi>v</mi><mo>→</mo></mover></math>') == r'\vec{v}'
+    assert mathml_to_latex('<math><mi>sin</mi><mo>&#x2061;</mo><mi>θ</mi></math>') == r'\sin \theta'
+    for markup in [TABLE, '<math><mi>x</mi>', '<div/>']:
+        try:
+            mathml_to_latex(markup)
+        except ValueError:
+            continue
+        raise AssertionError(markup)
+
+def test_parser_extracts_mathml():
+    """<math>要素を数式として取り出し、元のMathMLを残す"""
+    problem = HTMLParser(keep_raw_html=True).parse(HTML)[0]
+
+    assert problem['text'] == [
+        {'type': 'text', 'content': '次の式'},
+        {'type': 'math', 'content': r'\frac{x^2 - 1}{x + 1}'},
+        {'type': 'text', 'content': 'を簡単にせよ。組合せ'},
+        {'type': 'math', 'content': '{}_n C_r'},
+        {'type': 'text', 'content': 'と a'},
+    ]
+    assert problem['equations'] == [r'\sum_{k = 1}^n k^2 = \frac{n ( n + 1 )}{6}']
+    assert problem['choices'] == [r'\(\sqrt{2}\)', r'$\pi$']
+    assert set(problem['mathml']) == {r'\frac{x^2 - 1}{x + 1}', '{}_n C_r',
+                                      r'\sum_{k = 1}^n k^2 = \frac{n ( n + 1 )}{6}', r'\sqrt{2}'}
+    assert '<mfrac>' in problem['raw_html']
+
+def test_mathml_to_omml():
+    """MathMLの構造をそのままOMMLにする"""
+    converter = OmmlConverter()
+    omath = converter.convert_mathml(SUM.replace('&sum;', '∑'))
+    assert [child.tag for child in omath] == [qn('m:nary'), qn('m:r'), qn('m:f')]
+    nary = omath[0]
+    assert nary.find('.//' + qn('m:limLoc')).get(qn('m:val')) == 'undOvr'
+    assert nary.find(qn('m:e'))[0].tag == qn('m:sSup')
+
+    assert converter.convert_mathml(TABLE) is None
+    assert converter.convert_mathml(MULTISCRIPTS) is None
+    assert converter.convert_mathml('<math><mi>x') is None
+
+def test_document_without_rendering():
+    """MathMLの数式は画像モードでも描画せずWordの数式にする（できないものだけ画像）"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+    rendered = []
+    render_png = converter._render_png
+    def record(latex_str, *args, **kwargs):
+        rendered.append(latex_str)
+        return render_png(latex_str, *args, **kwargs)
+    converter._render_png = record
+
+    problems = HTMLParser().parse(HTML)
+    doc = WordGenerator(CONFIG, converter).create_document(problems)
+
+    # 画像になるのはOMMLにできないMathMLと、LaTeXで書かれた選択肢だけ
+    assert sorted(rendered) == sorted(['{}_nC_r', r'\pi'])
+    body = doc.element.body
+    assert len(body.findall('.//' + qn('m:oMath'))) == 3
+    assert len(body.findall('.//' + qn('m:oMathPara'))) == 1
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    Document(io.BytesIO(buf.getvalue()))
+
+if __name__ == '__main__':
+    test_mathml_to_latex()
+    test_parser_extracts_mathml()
+    test_mathml_to_omml()
+    test_document_without_rendering()
+    print("✓ MathML入力テスト完了")
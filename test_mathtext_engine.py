@@ -0,0 +1,73 @@
+"""mathtext直接描画エンジンのテスト"""
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from PIL import Image
+
+from core import STYLE_CONFIG, MathConverter
+from core.math_cache import MathImageCache
+from core.mathtext_renderer import MathtextRenderer
+from test_math_final import TEST_CASES
+
+CONFIG = dict(STYLE_CONFIG, math_engine='mathtext', math_store_path=None,
+              math_bundle_path=None)
+
+def test_final_formula_set():
+    """test_math_final.pyの数式がすべて変換できる"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+    for latex, description in TEST_CASES:
+        assert converter.test_conversion(latex), description
+
+def test_size_matches_png():
+    """返される寸法がPNGの寸法と一致する"""
+    renderer = MathtextRenderer()
+    png, size = renderer.render_with_size(r'\frac{a}{b}', 40, 'black', 100)
+
+    with Image.open(io.BytesIO(png)) as img:
+        assert img.mode == 'RGBA'
+        assert img.size == size
+
+        # 余白（0.1インチ）は透明
+        width, height = size
+        assert width > 20 and height > 20
+        assert img.getpixel((0, 0))[3] == 0
+
+def test_target_size_parses_once():
+    """目標の大きさに合わせても解析は1回で、上限より低い解像度の画像になる"""
+    renderer = MathtextRenderer()
+    parse = renderer._parser.parse
+    calls = []
+    def counting_parse(*args, **kwargs):
+        calls.append(kwargs.get('dpi'))
+        return parse(*args, **kwargs)
+    renderer._parser.parse = counting_parse
+
+    png, size = renderer.render_with_size(r'\frac{a}{b}', 40, 'black', 300, ('height', 60))
+    assert calls == [300]
+    full_png, full_size = renderer.render_with_size(r'\frac{a}{b}', 40, 'black', 300)
+    assert size[1] < full_size[1]
+    # 目標以上の大きさになる最小の刻みの解像度
+    assert 60 <= size[1] < 60 * 2 ** 0.25 + 2
+    with Image.open(io.BytesIO(png)) as img:
+        assert img.size == size
+
+def test_engine_in_cache_key():
+    """エンジンが異なれば別の画像として扱う"""
+    cache = MathImageCache()
+    figure = MathConverter(dict(CONFIG, math_engine='figure'), cache=cache)
+    mathtext = MathConverter(CONFIG, cache=cache)
+
+    assert figure.fingerprint != mathtext.fingerprint
+    figure.latex_to_image('x^2')
+    mathtext.latex_to_image('x^2')
+    assert cache.stats()['misses'] == 2
+
+if __name__ == '__main__':
+    test_final_formula_set()
+    test_size_matches_png()
+    test_target_size_parses_once()
+    test_engine_in_cache_key()
+    print("✓ mathtextエンジンテスト完了")
@@ -0,0 +1,128 @@
+"""LaTeX→OMML変換のテスト"""
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from docx import Document
+from docx.oxml.ns import qn
+
+from core import STYLE_CONFIG, MathConverter, WordGenerator
+from core.math_cache import MathImageCache
+from core.omml_converter import OmmlConverter
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None,
+              math_prefetch=False, math_mode='omml', math_plain_text=False)
+
+def _text(element):
+    return ''.join(t.text for t in element.iter(qn('m:t')))
+
+def _child_tags(element):
+    return [child.tag.split('}')[1] for child in element]
+
+def test_structures():
+    """分数・添字・根号・大型演算子・関数・括弧をOMMLの構造にする"""
+    converter = OmmlConverter()
+
+    omath = converter.convert(r'\frac{x^2 - y^2}{x + y} = x - y')
+    assert _child_tags(omath) == ['f', 'r']
+    fraction = omath[0]
+    assert _child_tags(fraction.find(qn('m:num'))) == ['sSup', 'r', 'sSup']
+    assert _text(fraction.find(qn('m:den'))) == 'x+y'
+    assert _text(omath[1]) == '=x−y'
+
+    omath = converter.convert(r'x = \frac{5 \pm \sqrt{1}}{2}')
+    radical = omath.find('.//' + qn('m:rad'))
+    assert radical.find(qn('m:radPr')) is not None and _text(radical) == '1'
+    assert _text(converter.convert(r'\sqrt[3]{8}').find('.//' + qn('m:deg'))) == '3'
+
+    omath = converter.convert(r'\sum_{k=1}^{n} k^2 = S_n')
+    nary = omath[0]
+    assert nary.find('.//' + qn('m:chr')).get(qn('m:val')) == '∑'
+    assert _text(nary.find(qn('m:sub'))) == 'k=1'
+    assert _text(nary.find(qn('m:e'))) == 'k2'
+    assert _child_tags(omath) == ['nary', 'r', 'sSub']
+
+    omath = converter.convert(r'\lim_{x \to 0} \frac{\sin x}{x} = 1')
+    name = omath.find(qn('m:func')).find(qn('m:fName'))
+    assert _child_tags(name) == ['limLow'] and _text(name) == 'limx→0'
+
+    omath = converter.convert(r'(x + y)^2 + \left(-\frac{b}{2a}, q\right)')
+    assert _child_tags(omath[0].find(qn('m:e'))) == ['d']
+    assert _text(omath) == 'x+y2+−b2a,q'
+
+    omath = converter.convert(r'\text{内分点の座標} = \alpha \cdot \beta \neq \theta')
+    assert omath[0].find('.//' + qn('m:nor')) is not None
+    assert _text(omath) == '内分点の座標=α⋅β≠θ'
+
+def test_unsupported_returns_none():
+    """対応していない記法や誤った数式は変換しない"""
+    converter = OmmlConverter()
+    for latex_str in [r'\frac{a}{', r'\begin{matrix}a\end{matrix}', 'a & b',
+                      r'\unknowncommand x', 'x^2^3', '']:
+        assert converter.convert(latex_str) is None, latex_str
+
+def test_display_and_copies():
+    """独立した数式はm:oMathParaで、変換結果は呼び出しごとに別の要素"""
+    converter = OmmlConverter()
+    para = converter.convert('x^2', display=True)
+    assert para.tag == qn('m:oMathPara')
+    assert para.find(qn('m:oMath')) is not None
+    assert converter.convert('x^2') is not converter.convert('x^2')
+
+def test_cache_is_bounded():
+    """変換結果は最近使ったものだけ保持する"""
+    converter = OmmlConverter(cache_size=2)
+    converter.convert('x^2')
+    converter.convert('y^2')
+    converter.convert('x^2')
+    converter.convert_mathml('<math><mi>z</mi></math>')
+    assert len(converter._cache) == 2
+    assert ('latex', 'x^2', False, None) in converter._cache
+    assert _text(converter.convert('y^2')) == 'y2'
+
+def test_document_falls_back_to_images():
+    """OMMLモードでは変換できる数式は描画せず、変換できない数式だけ画像にする"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+    rendered = []
+    render_png = converter._render_png
+    def record(latex_str, *args, **kwargs):
+        rendered.append(latex_str)
+        return render_png(latex_str, *args, **kwargs)
+    converter._render_png = record
+
+    problems = [{
+        'title': '問題1',
+        'text': [
+            {'type': 'text', 'content': '次の式'},
+            {'type': 'math', 'content': r'\frac{a}{b}'},
+            {'type': 'text', 'content': 'と'},
+            {'type': 'math', 'content': r'\begin{matrix}a\end{matrix}'},
+        ],
+        'equations': [r'\int_{0}^{1} x^2 dx'],
+        'choices': [r'\(\frac{\pi}{2}\) または $\pi$'],
+    }]
+    doc = WordGenerator(CONFIG, converter).create_document(problems)
+
+    assert rendered == [r'\begin{matrix}a\end{matrix}']
+    body = doc.element.body
+    assert len(body.findall('.//' + qn('m:oMath'))) == 4
+    assert len(body.findall('.//' + qn('m:oMathPara'))) == 1
+
+    # 文章と数式の順序が保たれる
+    paragraph = doc.paragraphs[1]._p
+    assert _child_tags(paragraph)[1:] == ['r', 'oMath', 'r', 'r']
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    reloaded = Document(io.BytesIO(buf.getvalue()))
+    assert len(reloaded.element.body.findall('.//' + qn('m:oMath'))) == 4
+
+if __name__ == '__main__':
+    test_structures()
+    test_unsupported_returns_none()
+    test_display_and_copies()
+    test_cache_is_bounded()
+    test_document_falls_back_to_images()
+    print("✓ OMML変換テスト完了")
@@ -0,0 +1,99 @@
+"""単純な数式の文字化のテスト"""
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from docx import Document
+
+from core import STYLE_CONFIG, MathConverter, WordGenerator
+from core.math_cache import MathImageCache
+from core.plain_math import PlainMathConverter
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None,
+              math_prefetch=False, math_plain_text=True, math_plain_commands=None)
+
+def _text(segments):
+    return ''.join(text for text, _ in segments)
+
+def test_classify():
+    """文字と記号だけの数式は文字に、それ以外は変換しない"""
+    converter = PlainMathConverter()
+
+    assert converter.convert('x') == [('x', True)]
+    assert converter.convert('x^2') == [('x', True), ('²', False)]
+    assert converter.convert('a_{n+1}') == [('a', True), ('ₙ₊₁', False)]
+    assert converter.convert('n+1') == [('n', True), (' + 1', False)]
+    assert _text(converter.convert('x = -1, -6')) == 'x = −1, −6'
+    assert _text(converter.convert(r'0 \leq x \leq 5')) == '0 ≤ x ≤ 5'
+    assert _text(converter.convert(r'\tan \theta')) == 'tan θ'
+    assert converter.convert(r'\pi') == [('π', True)]
+
+    for latex_str in [r'\frac{1}{2}', r'\sqrt{2}', 'x^{2k}', '{x}', 'x^', '^2',
+                      r'\int_0^1 x', r'\mathrm{d}x', '']:
+        assert converter.convert(latex_str) is None, latex_str
+
+def test_whitelist():
+    """許可したコマンドを含む数式だけを文字にする"""
+    converter = PlainMathConverter(commands=[r'\alpha'])
+    assert _text(converter.convert(r'2\alpha')) == '2α'
+    assert converter.convert(r'2\pi') is None
+    assert converter.convert('x + 1') is not None
+
+def test_cache_is_bounded():
+    """変換結果は最近使ったものだけ保持する"""
+    converter = PlainMathConverter(cache_size=2)
+    for latex_str in ('x', 'y', 'x', r'\frac{1}{2}'):
+        converter.convert(latex_str)
+    assert list(converter._cache) == ['x', r'\frac{1}{2}']
+    assert converter.convert('y') == [('y', True)]
+
+def test_document_uses_text_runs():
+    """インライン・選択肢の単純な数式は描画せず文字にし、件数を数える"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+    rendered = []
+    render_png = converter._render_png
+    def record(latex_str, *args, **kwargs):
+        rendered.append(latex_str)
+        return render_png(latex_str, *args, **kwargs)
+    converter._render_png = record
+
+    problems = [{
+        'title': '問題1',
+        'text': [
+            {'type': 'text', 'content': '関数'},
+            {'type': 'math', 'content': 'x^2 + 1'},
+            {'type': 'text', 'content': 'について'},
+            {'type': 'math', 'content': r'\frac{a}{b}'},
+        ],
+        'equations': ['x^2'],
+        'choices': ['$x > 0$', r'\(a_n\)'],
+    }]
+    generator = WordGenerator(CONFIG, converter)
+    doc = generator.create_document(problems)
+
+    # 独立した数式は従来どおり画像
+    assert sorted(rendered) == sorted([r'\frac{a}{b}', 'x^2'])
+    stats = generator.math_stats()
+    assert (stats['text'], stats['omml'], stats['image']) == (3, 0, 2)
+    # 同じWordGeneratorで次の文書を作ると件数は数え直す
+    generator.create_document(problems[:0])
+    assert generator.math_stats()['total'] == 0
+
+    runs = doc.paragraphs[1].runs
+    assert [run.text for run in runs[:3]] == ['関数', 'x', '² + 1']
+    assert runs[1].italic and not runs[2].italic
+    assert runs[1].font.name == CONFIG['math_text_font']
+    assert doc.paragraphs[3].runs[1].font.size.pt == CONFIG['choice_size']
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    assert 'x² + 1' in ''.join(p.text for p in Document(io.BytesIO(buf.getvalue())).paragraphs)
+
+if __name__ == '__main__':
+    test_classify()
+    test_whitelist()
+    test_cache_is_bounded()
+    test_document_uses_text_runs()
+    print("✓ 数式の文字化テスト完了")
@@ -0,0 +1,72 @@
+"""数式画像のPNGエンコーダーのテスト"""
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+from docx import Document
+from docx.shared import Pt
+from PIL import Image
+
+from core import STYLE_CONFIG, MathConverter
+from core.figure_renderer import TrimmedFigureRenderer
+from core.math_cache import MathImageCache
+from core.png_encoder import encode_png
+
+def _decode(data: bytes):
+    with Image.open(io.BytesIO(data)) as img:
+        return img.mode, np.asarray(img.convert('RGBA'))
+
+def _formula_rgba(color='black'):
+    return TrimmedFigureRenderer().render_rgba(r'\frac{x^2 + 1}{x - 1}', 40, color, 100)
+
+def test_palette_quality():
+    """パレット化しても色は保たれ、透明度の誤差は段階の幅の半分以内"""
+    rgba = _formula_rgba('#1f4e79')
+    ink = rgba[..., 3] > 0
+
+    for encoding, max_error in [('palette8', 0), ('palette4', 9)]:
+        mode, decoded = _decode(encode_png(rgba, 100, encoding))
+        assert mode == 'P'
+        error = np.abs(decoded[..., 3].astype(int) - rgba[..., 3].astype(int))
+        assert error.max() <= max_error, encoding
+        assert (decoded[..., :3][decoded[..., 3] > 0] == (0x1f, 0x4e, 0x79)).all()
+
+    mode, decoded = _decode(encode_png(rgba, 100, 'palette1'))
+    assert set(np.unique(decoded[..., 3])) <= {0, 255}
+    assert (decoded[..., 3] == 255).sum() == (rgba[..., 3] >= 128).sum()
+    assert not decoded[~ink][..., 3].any()
+
+def test_multicolor_stays_rgba():
+    """単色でない画像はRGBAのまま"""
+    rgba = _formula_rgba()
+    rgba[:2, :2] = (255, 0, 0, 255)
+
+    mode, decoded = _decode(encode_png(rgba, 100, 'palette4'))
+    assert mode == 'RGBA'
+    assert (decoded == rgba).all()
+
+def test_converter_output_smaller():
+    """既定の設定ではパレット画像になり、Word文書にも埋め込める"""
+    base = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None)
+    rgba = MathConverter(dict(base, math_png_encoding='rgba'), cache=MathImageCache())
+    palette = MathConverter(base, cache=MathImageCache())
+
+    latex_str = r'\frac{BP}{PC} \cdot \frac{CQ}{QA} = 1'
+    full = rgba.latex_to_image(latex_str, 'display').getvalue()
+    small = palette.latex_to_image(latex_str, 'display').getvalue()
+
+    assert len(small) < len(full)
+    with Image.open(io.BytesIO(small)) as img:
+        assert img.mode == 'P'
+
+    doc = Document()
+    doc.add_paragraph().add_run().add_picture(io.BytesIO(small), height=Pt(8))
+
+if __name__ == '__main__':
+    test_palette_quality()
+    test_multicolor_stays_rgba()
+    test_converter_output_smaller()
+    print("✓ PNGエンコーダーテスト完了")
@@ -0,0 +1,95 @@
+"""問題データの表現のテスト"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import core.problem
+from core import STYLE_CONFIG, HTMLParser, MathConverter, Problem, WordGenerator
+from core.formula_collector import iter_formulas_with_context
+from core.math_cache import MathImageCache
+from core.problem import as_problem
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None, math_prefetch=False)
+
+HTML = ''.join(
+    f'<div class="problem"><h2>問{i}</h2><p class="problem-text">式 $x^2 + {i % 2}$ を解け</p>'
+    '<div class="math">$$\\frac{a}{b}$$</div>'
+    '<ol class="choices"><li>\\(x = 1\\)</li><li>$ $ と \\$5</li></ol></div>'
+    for i in range(4)
+)
+
+DICT_PROBLEM = {
+    'title': '問1',
+    'text': [{'type': 'text', 'content': '式'}, {'type': 'math', 'content': 'x^2'}],
+    'equations': [r'\frac{a}{b}'],
+    'choices': [r'\(x = 1\)', '$ $ と \\$5'],
+    'mathml': {},
+}
+
+def test_dict_view():
+    """従来の辞書と同じように読み書きできる"""
+    problem = Problem.from_dict(DICT_PROBLEM)
+    assert problem == DICT_PROBLEM
+    assert dict(problem) == DICT_PROBLEM
+    assert problem.get('raw_html') is None and 'raw_html' not in problem
+    assert not hasattr(problem, '__dict__')
+
+    problem['title'] = '大問1'
+    assert problem['title'] == problem.title == '大問1'
+    problem['choices'] = ['$y$']
+    assert problem.choice_tokens == ((('math', 'y'),),)
+    try:
+        problem['unknown'] = 1
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("未知のキーを設定できてしまう")
+
+def test_parse_tokens():
+    """解析時に選択肢を分け、数式の文字列を共有する"""
+    problems = HTMLParser().parse(HTML)
+    first, second, third = problems[:3]
+    assert first.text == (('text', '式'), ('math', 'x^2 + 0'), ('text', 'を解け'))
+    # 空の数式は除き、\$ は文字にする
+    assert first.choice_tokens == ((('math', 'x = 1'),), (('text', ' と $5'),))
+    # 同じ数式は同じ文字列のオブジェクト
+    assert first.equations[0] is second.equations[0]
+    assert first.text[1][1] is third.text[1][1]
+    assert first.choice_tokens[0][0][1] is second.choice_tokens[0][0][1]
+
+def test_raw_html_optional():
+    """問題のHTMLは指定したときだけ残す"""
+    assert 'raw_html' not in HTMLParser().parse(HTML)[0]
+    problem = HTMLParser(keep_raw_html=True).parse(HTML)[0]
+    assert problem['raw_html'].startswith('<div class="problem">')
+
+def test_generation_does_not_retokenize():
+    """文書の生成と数式の収集では選択肢を分け直さない"""
+    problems = HTMLParser().parse(HTML)
+    dict_problems = [dict(problem) for problem in problems]
+
+    def fail(text):
+        raise AssertionError(f'選択肢を分け直しました: {text}')
+    split_math = core.problem.split_math
+    core.problem.split_math = fail
+    try:
+        formulas = list(iter_formulas_with_context(problems))
+        assert ('x = 1', 'choice') in formulas
+
+        generator = WordGenerator(CONFIG, MathConverter(CONFIG, cache=MathImageCache()))
+        generator.create_document(problems)
+        assert generator.problem_counter == len(problems)
+    finally:
+        core.problem.split_math = split_math
+
+    # 従来の辞書も受け付け、同じ数式が見つかる
+    assert list(iter_formulas_with_context(dict_problems)) == formulas
+    assert as_problem(dict_problems[0]) == problems[0]
+
+if __name__ == '__main__':
+    test_dict_view()
+    test_parse_tokens()
+    test_raw_html_optional()
+    test_generation_does_not_retokenize()
+    print("✓ 問題データのテスト完了")
@@ -0,0 +1,102 @@
+"""描画バックエンドの登録と自動選択のテスト"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core import STYLE_CONFIG, MathConverter, WordGenerator
+from core import render_backends
+from core.math_cache import MathImageCache
+from core.render_backends import (
+    AutoBackend, RenderBackend, backend_names, create_renderer, get_backend, register_backend
+)
+from core.style_config import style_fingerprint
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None,
+              math_prefetch=False, math_plain_text=False, math_engine='auto')
+
+def test_registry():
+    """組み込みのバックエンドが登録され、追加したものも名前で使える"""
+    assert backend_names()[:4] == ['figure', 'trim', 'mathtext', 'text']
+    assert 'batch' in get_backend('trim').capabilities
+    assert 'svg' not in get_backend('text').capabilities
+    assert not get_backend('text').supports(r'\frac{a}{b}')
+
+    rendered = []
+    class Recorder:
+        def render_png(self, latex_str, *args):
+            rendered.append(latex_str)
+            return get_backend('trim').render_png(latex_str, *args)
+    register_backend('recorder', lambda: RenderBackend('recorder', Recorder(), ['png'], (0, 0)))
+    try:
+        converter = MathConverter(dict(CONFIG, math_engine='recorder'), cache=MathImageCache())
+        converter.latex_to_image('x^2')
+        assert rendered == ['x^2']
+    finally:
+        render_backends._factories.pop('recorder')
+
+    try:
+        get_backend('unknown')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("存在しないエンジンが使えてしまう")
+
+def test_auto_choice():
+    """描画できるうち見積もりが最小のバックエンドを選ぶ"""
+    auto = create_renderer('auto')
+    assert auto.choose('x^2 + 1').name == 'text'
+    assert auto.choose(r'\frac{a}{b}').name == 'mathtext'
+    assert auto.choose('x^2', 'svg').name == 'mathtext'
+
+    # 計測結果で見積もりを差し替えられる
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'costs.json'
+        path.write_text(json.dumps({'costs': {'text': [100, 0], 'trim': [1, 0]}}))
+        auto = create_renderer('auto', {'math_backend_costs': str(path)})
+        assert auto.choose('x^2 + 1').name == 'trim'
+
+    auto = AutoBackend([get_backend('figure'), get_backend('text')])
+    assert auto.choose(r'\sqrt{2}').name == 'figure'
+
+def test_auto_render_many():
+    """まとめた描画はバックエンドごとに分けても入力順で返す"""
+    auto = create_renderer('auto')
+    args = (250, 'black', 300, ('height', 33.3), 'palette4')
+    latex_list = ['x + 1', r'\frac{a}{b}', r'\frac{a}{', 'y']
+    results = auto.render_many_png(latex_list, *args)
+
+    assert results[0] == get_backend('text').render_png('x + 1', *args)
+    assert results[1] == get_backend('mathtext').render_png(r'\frac{a}{b}', *args)
+    assert results[2] is None
+    assert results[3] == get_backend('text').render_png('y', *args)
+
+def test_auto_document():
+    """'auto'でもWordGeneratorは変わらず文書を作れる"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+    problems = [{'title': '問題1', 'text': [{'type': 'math', 'content': 'x^2 + 1'}],
+                 'equations': [r'\frac{a}{b}'], 'choices': ['$y$', r'\(\sqrt{2}\)']}]
+    doc = WordGenerator(CONFIG, converter).create_document(problems)
+    assert len(doc.inline_shapes) == 4
+
+def test_fingerprint():
+    """'auto'の候補は指紋に入り、他のエンジンの指紋は変わらない"""
+    assert style_fingerprint(dict(CONFIG, math_auto_engines=['trim'])) != style_fingerprint(CONFIG)
+    trim = dict(CONFIG, math_engine='trim')
+    assert style_fingerprint(dict(trim, math_auto_engines=['trim'])) == style_fingerprint(trim)
+
+    # 候補が異なれば、同じキャッシュでも別の画像として扱う
+    cache = MathImageCache()
+    MathConverter(CONFIG, cache=cache).latex_to_image('x^2')
+    MathConverter(dict(CONFIG, math_auto_engines=['figure']), cache=cache).latex_to_image('x^2')
+    assert cache.stats()['misses'] == 2
+
+if __name__ == '__main__':
+    test_registry()
+    test_auto_choice()
+    test_auto_render_many()
+    test_auto_document()
+    test_fingerprint()
+    print("✓ 描画バックエンドテスト完了")
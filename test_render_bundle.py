@@ -0,0 +1,60 @@
+"""数式バンドルと並列レンダリングのテスト"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core import STYLE_CONFIG, MathConverter
+from core.math_cache import MathImageCache
+from core.math_converter import RENDERER_VERSION
+from core.render_bundle import load_bundle, write_bundle
+from core.render_pool import RenderPool
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None)
+
+def test_render_pool():
+    """並列描画は逐次描画と同じ結果を返し、失敗は分離される"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+
+    with RenderPool(CONFIG, workers=2) as pool:
+        results = pool.render([r'\frac{a}{b}', 'x^2', r'\frac{a}{b}', r'\frac{'])
+
+    assert set(results) == {r'\frac{a}{b}', 'x^2', r'\frac{'}
+    assert results['x^2'] == converter._render_png('x^2')
+    assert results[r'\frac{'] is None
+
+def test_bundle_roundtrip():
+    """バンドルの画像を描画せずに使う"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'bundle.zip')
+        source = MathConverter(CONFIG, cache=MathImageCache())
+        data = source._render_png('x^2+1')
+        write_bundle(path, {source._store_key('x^2+1'): data},
+                     source.fingerprint, RENDERER_VERSION)
+
+        converter = MathConverter(dict(CONFIG, math_bundle_path=path),
+                                  cache=MathImageCache())
+
+        def fail(latex_str):
+            raise AssertionError('バンドルにあるはずの数式を再描画しました')
+        converter._render_png = fail
+
+        assert converter.bundle is not None
+        assert converter.latex_to_image('x^{2} + 1').getvalue() == data
+
+def test_stale_bundle_ignored():
+    """スタイル指紋が異なるバンドルは使わない"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'bundle.zip')
+        write_bundle(path, {}, 'old-fingerprint', RENDERER_VERSION)
+
+        assert load_bundle(path, 'new-fingerprint', RENDERER_VERSION) is None
+        converter = MathConverter(dict(CONFIG, math_bundle_path=path))
+        assert converter.bundle is None
+
+if __name__ == '__main__':
+    test_render_pool()
+    test_bundle_roundtrip()
+    test_stale_bundle_ignored()
+    print("✓ バンドルテスト完了")
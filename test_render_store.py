@@ -0,0 +1,106 @@
+"""数式画像の永続ストアのテスト"""
+import sys
+import tempfile
+from multiprocessing import Pool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core import STYLE_CONFIG, MathConverter
+from core.math_cache import MathImageCache
+from core.render_store import ACCESS_REFRESH_INTERVAL, RenderStore, make_store_key
+
+def _write_entries(args):
+    """別プロセスから同じストアに書き込む"""
+    path, worker = args
+    store = RenderStore(path)
+    for i in range(50):
+        key = make_store_key('formula', i % 20)
+        store.put(key, f'data-{i % 20}'.encode())
+        assert store.get(key) == f'data-{i % 20}'.encode()
+    return worker
+
+def test_put_get_and_gc():
+    """登録・取得と最終参照順のGC"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RenderStore(Path(tmp) / 'store.sqlite3', max_bytes=0)
+        for name in ('a', 'b', 'c'):
+            store.put(name, b'x' * 100)
+
+        # aを参照してbを最古にする
+        store.get('a')
+        store._connect().execute(
+            "UPDATE images SET last_access = 0 WHERE key = 'b'"
+        )
+
+        removed = store.gc(200)
+        assert removed == 1
+        assert store.get('b') is None
+        assert store.get('a') == b'x' * 100
+
+        stats = store.stats()
+        assert stats['entries'] == 2
+        assert stats['bytes'] == 200
+        store.close()
+
+def test_get_refreshes_access_only_when_stale():
+    """最終参照時刻は古くなった画像の取得時だけ更新する"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RenderStore(Path(tmp) / 'store.sqlite3')
+        store.put('a', b'x')
+        conn = store._connect()
+        last_access = lambda: conn.execute(
+            "SELECT last_access FROM images WHERE key = 'a'").fetchone()[0]
+
+        # 登録直後の取得では書き込まない
+        before = last_access()
+        changes = conn.total_changes
+        assert store.get('a') == b'x'
+        assert conn.total_changes == changes
+        assert last_access() == before
+
+        conn.execute("UPDATE images SET last_access = ? WHERE key = 'a'",
+                     (before - ACCESS_REFRESH_INTERVAL,))
+        assert store.get('a') == b'x'
+        assert last_access() >= before
+        store.close()
+
+def test_concurrent_processes():
+    """複数プロセスからの同時読み書き"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'store.sqlite3')
+        # 接続は循環参照のGCまで閉じないため、forkする前に閉じておく
+        RenderStore(path).close()
+
+        with Pool(4) as pool:
+            done = pool.map(_write_entries, [(path, i) for i in range(4)])
+
+        assert sorted(done) == [0, 1, 2, 3]
+        assert RenderStore(path).stats()['entries'] == 20
+
+def test_converter_reuses_store():
+    """別インスタンス（別実行相当）はストアから読み込む"""
+    with tempfile.TemporaryDirectory() as tmp:
+        config = dict(STYLE_CONFIG, math_store_path=str(Path(tmp) / 'store.sqlite3'))
+
+        first = MathConverter(config, cache=MathImageCache())
+        data = first.latex_to_image(r'\frac{x^2 + 1}{x - 1}').getvalue()
+
+        second = MathConverter(config, cache=MathImageCache())
+
+        def fail(latex_str):
+            raise AssertionError('ストアにあるはずの数式を再描画しました')
+        second._render_png = fail
+
+        assert second.latex_to_image(r'\frac{x^2 + 1}{x - 1}').getvalue() == data
+
+        # 数式の色が異なれば別の指紋
+        red = MathConverter(dict(config, math_color='red'), cache=MathImageCache())
+        assert red.fingerprint != first.fingerprint
+
+if __name__ == '__main__':
+    test_put_get_and_gc()
+    test_get_refreshes_access_only_when_stale()
+    test_concurrent_processes()
+    test_converter_reuses_store()
+    print("✓ 永続ストアテスト完了")
@@ -0,0 +1,100 @@
+"""数式のSVG埋め込みのテスト"""
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from docx import Document
+from docx.oxml.ns import qn
+from PIL import Image
+
+from core import STYLE_CONFIG, MathConverter, WordGenerator
+from core.math_cache import MathImageCache
+from core.svg_embed import ASVG_NAMESPACE, SVG_CONTENT_TYPE
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None,
+              math_prefetch=False, math_format='svg', math_plain_text=False)
+
+def _problems():
+    return [{
+        'title': '問題1',
+        'text': [
+            {'type': 'text', 'content': '次の式を計算しなさい。'},
+            {'type': 'math', 'content': 'x^2 + 1'},
+            {'type': 'math', 'content': r'\frac{a}{'},
+        ],
+        'equations': [r'\frac{BP}{PC} \cdot \frac{CQ}{QA} = 1', 'x^{2} + 1'],
+        'choices': [r'\(x^2 + 1\)', '$y$'],
+    }]
+
+def _svg_blips(doc):
+    return doc.element.body.findall(f'.//{{{ASVG_NAMESPACE}}}svgBlip')
+
+def _svg_parts(doc):
+    return {rel.target_part.partname: rel.target_part
+            for rel in doc.part.rels.values()
+            if rel.target_part.content_type == SVG_CONTENT_TYPE}
+
+def test_latex_to_svg():
+    """SVGは毎回同じ内容になり、変換できない数式はNone"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+    svg = converter.latex_to_svg(r'\frac{a}{b}')
+
+    assert b'<svg' in svg[:500]
+    assert MathConverter(CONFIG, cache=MathImageCache()).latex_to_svg(r'\frac{a}{b}') == svg
+    assert converter.latex_to_svg(r'\frac{a}{') is None
+
+def test_document_embeds_svg():
+    """各数式画像にSVGが添付され、同じ数式はパーツを共有する"""
+    converter = MathConverter(CONFIG, cache=MathImageCache())
+    doc = WordGenerator(CONFIG, converter).create_document(_problems())
+
+    # x^2 + 1（3回）, \frac{BP}{PC}..., y の3種類（\frac{a}{ は画像にならない）
+    blips = _svg_blips(doc)
+    assert len(blips) == 5
+    assert len(_svg_parts(doc)) == 3
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    reloaded = Document(io.BytesIO(buf.getvalue()))
+    assert len(_svg_blips(reloaded)) == 5
+    assert all(part.blob.lstrip().startswith(b'<?xml') for part in _svg_parts(reloaded).values())
+
+def test_png_mode_unchanged():
+    """PNGモードではSVGを添付しない"""
+    config = dict(CONFIG, math_format='png')
+    doc = WordGenerator(config, MathConverter(config, cache=MathImageCache())).create_document(_problems())
+
+    assert not _svg_blips(doc)
+    assert not _svg_parts(doc)
+
+def _image_blobs(doc):
+    return [rel.target_part.blob for rel in doc.part.rels.values()
+            if rel.target_part.content_type == 'image/png']
+
+def test_fallback_png_is_small():
+    """SVGモードの代替PNGはPNGモードの画像より粗く小さい"""
+    png_config = dict(CONFIG, math_format='png')
+    png_doc = WordGenerator(png_config, MathConverter(png_config, cache=MathImageCache())
+                            ).create_document(_problems())
+    svg_doc = WordGenerator(CONFIG, MathConverter(CONFIG, cache=MathImageCache())
+                            ).create_document(_problems())
+
+    png_images, svg_images = _image_blobs(png_doc), _image_blobs(svg_doc)
+    assert len(png_images) == len(svg_images)
+    assert sum(map(len, svg_images)) < sum(map(len, png_images))
+    # SVGを添付した画像（数式エラーの代替画像以外）は2値のパレット画像
+    for svg_blip in _svg_blips(svg_doc):
+        blip = svg_blip.getparent().getparent().getparent()
+        blob = svg_doc.part.related_parts[blip.get(qn('r:embed'))].blob
+        with Image.open(io.BytesIO(blob)) as img:
+            assert img.mode == 'P'
+            assert len(img.getpalette()) <= 2 * 3
+
+if __name__ == '__main__':
+    test_latex_to_svg()
+    test_document_embeds_svg()
+    test_png_mode_unchanged()
+    test_fallback_png_is_small()
+    print("✓ SVG埋め込みテスト完了")
@@ -0,0 +1,53 @@
+"""複数ファイルの統合変換のテスト"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from docx import Document
+
+from core import STYLE_CONFIG, HTMLParser
+from batch.unified_converter import UnifiedMathConverter
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None, math_prefetch=False)
+
+def _problems_html(titles) -> str:
+    return ''.join(f'<div class="problem"><h3>{title}</h3><p>$x$ を求めよ</p></div>'
+                   for title in titles)
+
+class BreakingParser(HTMLParser):
+    """broken.htmlだけ、1問返した後で解析に失敗する"""
+
+    def iter_problems(self, source, chunk_size=4096):
+        problems = super().iter_problems(source, chunk_size)
+        if not isinstance(source, str) or Path(source).name != 'broken.html':
+            yield from problems
+            return
+        yield next(problems)
+        raise ValueError("解析に失敗しました")
+
+def test_broken_file_is_dropped():
+    """途中で解析に失敗したファイルの問題は文書に入らない"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for name, titles in (('a.html', ['A1', 'A2']), ('broken.html', ['B1', 'B2']),
+                             ('c.html', ['C1'])):
+            path = Path(tmp) / name
+            path.write_text(_problems_html(titles), encoding='utf-8')
+            files.append(str(path))
+
+        converter = UnifiedMathConverter(CONFIG)
+        converter.parser = BreakingParser()
+        output_file = str(Path(tmp) / 'out.docx')
+        assert converter.convert_multiple_problems(files, output_file)
+        assert converter.problem_counter == 3
+
+        text = '\n'.join(paragraph.text for paragraph in Document(output_file).paragraphs)
+        for title in ('A1', 'A2', 'C1'):
+            assert title in text
+        assert 'B1' not in text
+
+if __name__ == '__main__':
+    test_broken_file_is_dropped()
+    print("✓ 統合変換テスト完了")
@@ -0,0 +1,55 @@
+"""描画エンジンのバックグラウンド準備のテスト"""
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core import STYLE_CONFIG, MathConverter
+from core.warmup import WARMUP_FORMULAS, RendererWarmup, start_warmup
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None)
+
+def test_warmup_fills_cache():
+    """準備した数式は以降の変換でキャッシュから返る"""
+    warmup = RendererWarmup(CONFIG).start()
+    assert warmup.wait(120)
+    assert warmup.error is None
+    assert warmup.rendered == len(WARMUP_FORMULAS)
+
+    converter = MathConverter(CONFIG)
+    for latex_str, context in WARMUP_FORMULAS:
+        assert converter.lookup(converter._preprocess_latex(latex_str), context) is not None
+
+def test_cancel():
+    """取り消すと残りの数式を描画せずに止まる"""
+    warmup = RendererWarmup(CONFIG)
+    warmup.cancel()
+    warmup.start()
+    assert warmup.wait(10)
+    assert warmup.rendered == 0
+
+    # 描画中に取り消す（描画中の1数式が終わった時点で止まる）
+    started = threading.Event()
+    formulas = [(f'x_{{{i}}} + {i}', 'inline') for i in range(200)]
+
+    class Tracked(RendererWarmup):
+        def _warm_up(self):
+            started.set()
+            super()._warm_up()
+
+    warmup = Tracked(CONFIG, formulas).start()
+    assert started.wait(10)
+    warmup.cancel(timeout=10)
+    assert warmup.wait(0)
+    assert warmup.rendered < len(formulas)
+
+def test_disabled():
+    """設定で無効にすると始めない"""
+    assert start_warmup(dict(CONFIG, math_warmup=False)) is None
+
+if __name__ == '__main__':
+    test_warmup_fills_cache()
+    test_cancel()
+    test_disabled()
+    print("✓ 描画エンジンの準備テスト完了")
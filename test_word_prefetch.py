@@ -0,0 +1,131 @@
+"""数式の並列プリフェッチのテスト"""
+import hashlib
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from core import STYLE_CONFIG, MathConverter, WordGenerator
+from core.figure_renderer import MATHTEXT_LOCK
+from core.math_cache import MathImageCache
+from core.render_pool import RenderPool
+
+CONFIG = dict(STYLE_CONFIG, math_store_path=None, math_bundle_path=None)
+
+def _sample_problems():
+    """数式を多く含む問題リスト"""
+    problems = []
+    for i in range(6):
+        problems.append({
+            'title': f'問題{i + 1}',
+            'text': [
+                {'type': 'text', 'content': '次の式を計算しなさい。'},
+                {'type': 'math', 'content': f'x^{{{i + 2}}} + {i}'},
+            ],
+            'equations': [rf'\frac{{{i}}}{{n+{i}}}', r'\frac{a}{b}'],
+            'choices': [rf'\({i}\)', f'${i}+1$ または ${i}-1$'],
+        })
+    return problems
+
+def _image_hashes(doc):
+    """文書に埋め込まれた画像のハッシュ"""
+    return sorted(
+        hashlib.sha1(rel.target_part.blob).hexdigest()
+        for rel in doc.part.rels.values()
+        if 'image' in rel.reltype
+    )
+
+def test_prefetch_matches_sequential():
+    """プリフェッチしても同じ画像の文書になる"""
+    problems = _sample_problems()
+
+    sequential = WordGenerator(
+        dict(CONFIG, math_prefetch=False),
+        MathConverter(CONFIG, cache=MathImageCache())
+    )
+    expected = _image_hashes(sequential.create_document(problems))
+
+    config = dict(CONFIG, math_prefetch=True, math_prefetch_workers=2,
+                  math_prefetch_min_formulas=1)
+    converter = MathConverter(config, cache=MathImageCache())
+    generator = WordGenerator(config, converter)
+
+    # 組み立て時の描画はすべてワーカーの結果で賄われる
+    def fail(latex_str):
+        raise AssertionError(f'組み立て中に描画しました: {latex_str}')
+    converter._render_png = fail
+
+    try:
+        doc = generator.create_document(problems)
+    finally:
+        generator.close()
+
+    assert _image_hashes(doc) == expected
+    assert generator._prefetched == {}
+
+def _paragraph_texts(doc):
+    return [paragraph.text for paragraph in doc.paragraphs]
+
+def test_iterator_matches_list():
+    """イテレーターで渡しても同じ文書になり、決まった問題数ずつしか読まない"""
+    problems = _sample_problems()
+    config = dict(CONFIG, math_prefetch=True, math_prefetch_window=2)
+
+    generator = WordGenerator(config, MathConverter(config, cache=MathImageCache()))
+    expected = generator.create_document(problems)
+
+    pulled = []
+    def stream():
+        for problem in problems:
+            pulled.append(problem)
+            yield problem
+
+    generator = WordGenerator(config, MathConverter(config, cache=MathImageCache()))
+    add_problem = generator._add_problem
+    def check_window(doc, problem):
+        # 書き込み中の問題の窓より先は読んでいない
+        assert len(pulled) <= -(-generator.problem_counter // 2) * 2
+        add_problem(doc, problem)
+    generator._add_problem = check_window
+
+    doc = generator.create_document(stream())
+    assert generator.problem_counter == len(problems)
+    assert _paragraph_texts(doc) == _paragraph_texts(expected)
+    assert _image_hashes(doc) == _image_hashes(expected)
+
+def test_shared_pool_outlives_generators():
+    """渡したプールは文書をまたいで使い回し、WordGeneratorのclose()では終了しない"""
+    config = dict(CONFIG, math_prefetch=True, math_prefetch_workers=1,
+                  math_prefetch_min_formulas=1)
+    with RenderPool(config, workers=1) as pool:
+        executors = []
+        for _ in range(2):
+            generator = WordGenerator(config, MathConverter(config, cache=MathImageCache()), pool)
+            generator.create_document(_sample_problems())
+            generator.close()
+            executors.append(pool._executor)
+        assert executors[0] is not None and executors[0] is executors[1]
+    assert pool._executor is None
+
+def test_pool_ignores_parent_locks():
+    """親プロセスのスレッドが描画中（ロックを保持）でもワーカーは止まらない"""
+    results = {}
+
+    def render():
+        with RenderPool(CONFIG, workers=1) as pool:
+            results.update(pool.render(['x^2'], 'inline'))
+
+    with MATHTEXT_LOCK:
+        thread = threading.Thread(target=render, daemon=True)
+        thread.start()
+        thread.join(60)
+    assert not thread.is_alive(), "ワーカーが親のロックで止まりました"
+    assert results['x^2'][:4] == b'\x89PNG'
+
+if __name__ == '__main__':
+    test_prefetch_matches_sequential()
+    test_iterator_matches_list()
+    test_shared_pool_outlives_generators()
+    test_pool_ignores_parent_locks()
+    print("✓ プリフェッチテスト完了")